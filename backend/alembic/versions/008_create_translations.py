@@ -0,0 +1,33 @@
+"""create translations table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'translations',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True, server_default=sa.text('uuid_generate_v4()')),
+        sa.Column('source_text', sa.Text(), nullable=False),
+        sa.Column('target_language', sa.String(10), nullable=False),
+        sa.Column('translated_text', sa.Text(), nullable=False),
+        sa.Column('backend', sa.String(50), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.UniqueConstraint('source_text', 'target_language', name='uq_translations_source_target')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('translations')
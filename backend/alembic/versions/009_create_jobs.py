@@ -0,0 +1,61 @@
+"""create jobs and job_events tables
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'jobs',
+        sa.Column('id', UUID(as_uuid=True), primary_key=True, server_default=sa.text('uuid_generate_v4()')),
+        sa.Column('job_type', sa.String(50), nullable=False),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('payload', JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column('result', JSONB(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('priority', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'),
+        sa.Column('run_after', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('lease_owner', sa.String(100), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')",
+            name='check_job_status'
+        )
+    )
+    op.create_index('ix_jobs_claim', 'jobs', ['status', 'priority', 'run_after'])
+
+    op.create_table(
+        'job_events',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('job_id', UUID(as_uuid=True), sa.ForeignKey('jobs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_type', sa.String(50), nullable=False),
+        sa.Column('data', JSONB(), nullable=False, server_default=sa.text("'{}'::jsonb")),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+    op.create_index('ix_job_events_job_id', 'job_events', ['job_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_job_events_job_id', table_name='job_events')
+    op.drop_table('job_events')
+    op.drop_index('ix_jobs_claim', table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,24 @@
+"""add renditions to creatives
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('creatives', sa.Column('renditions', JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('creatives', 'renditions')
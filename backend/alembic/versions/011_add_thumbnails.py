@@ -0,0 +1,26 @@
+"""add thumbnails to assets and creatives
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('assets', sa.Column('thumbnails', JSONB(), nullable=True))
+    op.add_column('creatives', sa.Column('thumbnails', JSONB(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('creatives', 'thumbnails')
+    op.drop_column('assets', 'thumbnails')
@@ -0,0 +1,25 @@
+"""add perceptual hash to creatives
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('creatives', sa.Column('perceptual_hash', sa.BigInteger(), nullable=True))
+    op.create_index('ix_creatives_perceptual_hash', 'creatives', ['perceptual_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_creatives_perceptual_hash', table_name='creatives')
+    op.drop_column('creatives', 'perceptual_hash')
@@ -0,0 +1,52 @@
+"""create provider_calls ledger table
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013'
+down_revision = '012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'provider_calls',
+        sa.Column('id', sa.BigInteger(), primary_key=True, autoincrement=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('kind', sa.String(10), nullable=False),
+        sa.Column('provider', sa.String(50), nullable=False),
+        sa.Column('model', sa.String(100), nullable=True),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('http_status', sa.Integer(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('flow', sa.String(100), nullable=True),
+        sa.Column('lane', sa.String(20), nullable=True),
+        sa.Column('queue_ms', sa.Float(), nullable=True),
+        sa.Column('connect_ms', sa.Float(), nullable=True),
+        sa.Column('ttfb_ms', sa.Float(), nullable=True),
+        sa.Column('download_ms', sa.Float(), nullable=True),
+        sa.Column('overlay_ms', sa.Float(), nullable=True),
+        sa.Column('total_ms', sa.Float(), nullable=True),
+        sa.Column('request_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('response_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('image_bytes', sa.BigInteger(), nullable=True),
+        sa.Column('images', sa.Integer(), nullable=True),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True)
+    )
+    op.create_index('ix_provider_calls_created_at', 'provider_calls', ['created_at'])
+    op.create_index('ix_provider_calls_provider_day', 'provider_calls', ['kind', 'provider', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_provider_calls_provider_day', table_name='provider_calls')
+    op.drop_index('ix_provider_calls_created_at', table_name='provider_calls')
+    op.drop_table('provider_calls')
@@ -0,0 +1,23 @@
+"""add error status to jobs
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014'
+down_revision = '013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('jobs', sa.Column('error_status', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('jobs', 'error_status')
@@ -0,0 +1,25 @@
+"""drop unused perceptual hash index
+
+Near-duplicates are found in Python among one idea's creatives, which are
+fetched through idx_creatives_idea; no query filters on the hash itself.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index('ix_creatives_perceptual_hash', table_name='creatives')
+
+
+def downgrade() -> None:
+    op.create_index('ix_creatives_perceptual_hash', 'creatives', ['perceptual_hash'])
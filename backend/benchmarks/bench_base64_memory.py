@@ -0,0 +1,121 @@
+"""
+Benchmark: peak memory while decoding 20 concurrent DALL-E-sized base64 responses.
+
+Compares the old path (buffer the body, response.json(), base64.b64decode, write)
+against streaming the base64 field straight to disk. Each mode runs in its own
+process against a local stand-in server so peak RSS is measured independently.
+Run from the backend directory: python benchmarks/bench_base64_memory.py
+"""
+import asyncio
+import base64
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+CONCURRENT = int(os.getenv("BENCH_CONCURRENT", "20"))
+# A 1792x1024 DALL-E 3 PNG is typically 3-4MB
+IMAGE_BYTES = int(float(os.getenv("BENCH_IMAGE_MB", "3.5")) * 1024 * 1024)
+
+
+def _body() -> bytes:
+    image = b"\x89PNG\r\n\x1a\n" + os.urandom(IMAGE_BYTES - 8)
+    return json.dumps({
+        "created": int(time.time()),
+        "data": [{"revised_prompt": "stand-in", "b64_json": base64.b64encode(image).decode()}]
+    }).encode()
+
+
+def _start_server(body: bytes) -> str:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("content-length", 0)))
+            self.send_response(200)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(body)))
+            self.end_headers()
+            view = memoryview(body)
+            for start in range(0, len(body), 256 * 1024):
+                self.wfile.write(view[start:start + 256 * 1024])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v1/images/generations"
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 if sys.platform != "darwin" else 1024 * 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+async def _buffered(client: httpx.AsyncClient, url: str, out_dir: Path):
+    """Previous behaviour: whole body, parsed JSON, decoded copy, then a file"""
+    response = await client.post(url, json={"prompt": "p"})
+    data = response.json()
+    image = base64.b64decode(data["data"][0]["b64_json"])
+    (out_dir / f"{id(image)}.png").write_bytes(image)
+
+
+async def _streaming(client: httpx.AsyncClient, url: str, out_dir: Path):
+    from src.services.base64_stream import stream_base64_field
+
+    async with client.stream("POST", url, json={"prompt": "p"}) as response:
+        await stream_base64_field(response, "b64_json", out_dir)
+
+
+async def _run_mode(mode: str):
+    url = _start_server(_body())
+    handler = _buffered if mode == "buffered" else _streaming
+    limits = httpx.Limits(max_connections=CONCURRENT)
+    with tempfile.TemporaryDirectory() as tmp:
+        async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+            await handler(client, url, Path(tmp))  # warm up
+            baseline = _max_rss_mb()
+            tracemalloc.start()
+            start = time.perf_counter()
+            await asyncio.gather(*(handler(client, url, Path(tmp)) for _ in range(CONCURRENT)))
+            elapsed = time.perf_counter() - start
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    print(json.dumps({
+        "mode": mode,
+        "wall_seconds": round(elapsed, 2),
+        "peak_rss_mb": round(_max_rss_mb(), 1),
+        "rss_growth_mb": round(_max_rss_mb() - baseline, 1),
+        "python_alloc_peak_mb": round(traced_peak / 1024 / 1024, 1)
+    }))
+
+
+def main():
+    print(f"{CONCURRENT} concurrent responses, {IMAGE_BYTES / 1024 / 1024:.1f}MB images "
+          f"({IMAGE_BYTES * 4 / 3 / 1024 / 1024:.1f}MB base64 each)")
+    for mode in ("buffered", "streaming"):
+        output = subprocess.run(
+            [sys.executable, __file__, mode], capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        result = json.loads(output)
+        print(f"{result['mode']:<10} wall={result['wall_seconds']:6.2f}s "
+              f"peak RSS={result['peak_rss_mb']:7.1f}MB (+{result['rss_growth_mb']:.1f}MB during run) "
+              f"python alloc peak={result['python_alloc_peak_mb']:.1f}MB")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        asyncio.run(_run_mode(sys.argv[1]))
+    else:
+        main()
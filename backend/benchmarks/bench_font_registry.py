@@ -0,0 +1,57 @@
+"""
+Benchmark: per-image font cost, probing and loading fonts every image vs the font registry.
+
+Run from the backend directory: python benchmarks/bench_font_registry.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageFont
+
+from src.services.font_registry import FontRegistry
+
+IMAGES = int(os.getenv("BENCH_IMAGES", "300"))
+# (width, height) of the three aspect ratios; each image needs a message and a brand font
+SIZES = [(1920, 1080), (1080, 1920), (1080, 1080)]
+
+
+def per_image_load(path: str):
+    """Old behaviour: probe and open the font file for every image"""
+    for i in range(IMAGES):
+        _, height = SIZES[i % len(SIZES)]
+        try:
+            ImageFont.truetype(path, int(height * 0.06))
+            ImageFont.truetype(path, int(height * 0.04))
+        except OSError:
+            ImageFont.load_default()
+            ImageFont.load_default()
+
+
+def registry_load(registry: FontRegistry):
+    for i in range(IMAGES):
+        _, height = SIZES[i % len(SIZES)]
+        registry.get_font("sans", height * 0.06)
+        registry.get_font("sans", height * 0.04)
+
+
+def _time(label: str, fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:9.2f}ms total  {elapsed / IMAGES * 1e6:9.1f}us/image")
+
+
+if __name__ == "__main__":
+    registry = FontRegistry()
+    path = next((p for p in registry._candidates("sans") if os.path.exists(p)), None)
+    if path is None:
+        sys.exit("No sans font file found; set OVERLAY_FONT_SANS")
+
+    _time("truetype() per image", per_image_load, path)
+    _time("missing file per image", per_image_load, "/System/Library/Fonts/Helvetica-missing.ttc")
+    _time("registry (cold)", registry_load, registry)
+    _time("registry (warm)", registry_load, registry)
+    print(f"registry font loads: {registry.loads}")
@@ -0,0 +1,79 @@
+"""
+Benchmark: event-loop latency while many 1920x1080 composites run.
+
+Compares compositing directly on the event loop against the image process pool.
+Run from the backend directory: python benchmarks/bench_overlay_event_loop.py
+"""
+import asyncio
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from src.services.image_processor import ImageProcessor, compose_overlays
+
+COMPOSITES = int(os.getenv("BENCH_COMPOSITES", "24"))
+TICK = 0.005
+
+
+def _base_image() -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((1920, 1080), 64).convert("RGB").save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def _measure_lag(stop: asyncio.Event) -> list:
+    """Sample how late a TICK-second sleep wakes up"""
+    lags = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+    return lags
+
+
+async def _run(label: str, composite):
+    image = _base_image()
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_measure_lag(stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(composite(image) for _ in range(COMPOSITES)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = sorted(await ticker)
+    p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+    print(f"{label:<12} composites={COMPOSITES} wall={elapsed:6.2f}s "
+          f"lag p50={statistics.median(lags) * 1000:7.2f}ms p99={p99 * 1000:7.2f}ms max={lags[-1] * 1000:7.2f}ms")
+
+
+async def main():
+    args = ("Summer Sale - Up to 50% off", "ACME", None, 1920, 1080)
+
+    async def inline(image):
+        # Old behaviour: PIL work directly on the event loop
+        compose_overlays(image, *args)
+
+    processor = ImageProcessor()
+
+    async def pooled(image):
+        await processor.run(compose_overlays, image, *args)
+
+    # Warm the pool so worker spawn time isn't counted
+    await processor.run(compose_overlays, _base_image(), *args)
+
+    await _run("event-loop", inline)
+    await _run(f"pool[{processor.max_workers}]", pooled)
+    print(f"pool stats: {processor.stats()}")
+    processor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
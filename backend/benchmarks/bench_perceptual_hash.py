@@ -0,0 +1,61 @@
+"""
+Benchmark: near-duplicate lookup over 1M creative hashes, linear scan vs HammingIndex.
+
+Measures the in-memory index alone. list_creatives builds one per request
+from the listed ideas' creatives only, so it never holds anywhere near 1M.
+
+Uniformly random hashes are the worst case for the index (real dHashes cluster,
+so buckets are smaller than here). Every query has a planted neighbour.
+
+Run from the backend directory: python benchmarks/bench_perceptual_hash.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.perceptual_hash import HammingIndex, hamming
+
+CREATIVES = int(os.getenv("BENCH_CREATIVES", "1000000"))
+QUERIES = int(os.getenv("BENCH_QUERIES", "1000"))
+MAX_DISTANCE = int(os.getenv("BENCH_MAX_DISTANCE", "6"))
+LINEAR_QUERIES = 5
+
+
+def _near(rng: random.Random, value: int, distance: int) -> int:
+    for bit in rng.sample(range(64), distance):
+        value ^= 1 << bit
+    return value
+
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    hashes = [rng.getrandbits(64) for _ in range(CREATIVES)]
+    queries = [_near(rng, rng.choice(hashes), rng.randint(0, MAX_DISTANCE)) for _ in range(QUERIES)]
+
+    index = HammingIndex()
+    start = time.perf_counter()
+    for position, value in enumerate(hashes):
+        index.add(value, position)
+    elapsed = time.perf_counter() - start
+    print(f"insert {CREATIVES:>9,} hashes        {elapsed:8.2f}s total  {elapsed / CREATIVES * 1e6:9.2f}us/insert")
+
+    start = time.perf_counter()
+    for query in queries[:LINEAR_QUERIES]:
+        [position for position, value in enumerate(hashes) if hamming(value, query) <= MAX_DISTANCE]
+    elapsed = time.perf_counter() - start
+    print(f"linear scan, d<={MAX_DISTANCE}              {elapsed * 1000:8.1f}ms total  {elapsed / LINEAR_QUERIES * 1e6:9.1f}us/query")
+
+    found = 0
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        found += bool(index.search(query, MAX_DISTANCE))
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    print(f"HammingIndex, d<={MAX_DISTANCE}             {sum(timings) * 1000:8.1f}ms total  {mean * 1e6:9.1f}us/query  p99 {p99 * 1e6:.1f}us")
+    print(f"queries with a match: {found}/{QUERIES}")
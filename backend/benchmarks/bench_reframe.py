@@ -0,0 +1,99 @@
+"""
+Benchmark: three provider generations per idea vs one master + local reframing.
+
+The provider is a local stand-in with BENCH_PROVIDER_LATENCY seconds per call
+(Firefly renders typically take 5-15s); overlays and reframing run for real in
+the image process pool.
+Run from the backend directory: python benchmarks/bench_reframe.py
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from PIL import Image
+
+from src.services import key_service as key_service_module
+from src.services.firefly_service import FireflyService
+from src.services.http_client import http_client
+from src.services.image_download import image_downloader
+from src.services.image_processor import image_processor
+from src.services.image_providers import provider_registry
+from src.services.provider_limiter import ProviderLimiter
+
+IDEAS = int(os.getenv("BENCH_IDEAS", "4"))
+PROVIDER_LATENCY = float(os.getenv("BENCH_PROVIDER_LATENCY", "2.0"))
+ASPECT_RATIOS = ["16:9", "9:16", "1:1"]
+
+
+def _render(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise((width, height), 64).convert("RGB").save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+class StandInProvider:
+    """Returns an image of the requested size after PROVIDER_LATENCY"""
+
+    def __init__(self):
+        self.calls = 0
+        self.images = {}
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "POST":
+            self.calls += 1
+            await asyncio.sleep(PROVIDER_LATENCY)
+            size = json.loads(request.content)["size"]
+            key = f"{size['width']}x{size['height']}"
+            if key not in self.images:
+                self.images[key] = _render(size["width"], size["height"])
+            return httpx.Response(200, json={"outputs": [{"image": {"url": f"https://storage.test/{key}.jpg"}}]})
+        key = request.url.path.strip("/").rsplit(".", 1)[0]
+        return httpx.Response(200, content=self.images[key], headers={"content-type": "image/jpeg"})
+
+
+async def _per_ratio(service: FireflyService):
+    await asyncio.gather(*(
+        service.generate_creative(None, "Idea", "Summer Sale - Up to 50% off", "US", "18-25", ratio, brand_name="ACME")
+        for ratio in ASPECT_RATIOS
+    ))
+
+
+async def _reframed(service: FireflyService):
+    await service.generate_reframed_creatives(
+        None, "Idea", "Summer Sale - Up to 50% off", "US", "18-25", ASPECT_RATIOS, brand_name="ACME"
+    )
+
+
+async def main():
+    settings = {"use_image_model": "Stable Diffusion", "Stable Diffusion": "bench-key"}
+    key_service_module.key_service.get_value = lambda db, key: settings.get(key)
+    provider_registry.get("Stable Diffusion").limiter = ProviderLimiter(1000, 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_downloader.download_dir = Path(tmp) / "downloads"
+        service = FireflyService()
+        service.output_dir = Path(tmp) / "creatives"
+        service.output_dir.mkdir()
+        await image_processor.run(_render, 16, 16)  # start the pool
+
+        print(f"{IDEAS} ideas x {len(ASPECT_RATIOS)} ratios, provider latency {PROVIDER_LATENCY:.1f}s")
+        for label, generate in (("per-ratio", _per_ratio), ("reframe", _reframed)):
+            provider = StandInProvider()
+            http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(provider))
+            start = time.perf_counter()
+            await asyncio.gather(*(generate(service) for _ in range(IDEAS)))
+            elapsed = time.perf_counter() - start
+            print(f"{label:<10} provider calls={provider.calls:3d} ({provider.calls / IDEAS:.0f}/idea) wall={elapsed:6.2f}s")
+    image_processor.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,6 +2,7 @@
 API endpoints for Asset management.
 """
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import uuid
@@ -12,6 +13,10 @@ from ..services.asset_service import asset_service
 from ..services.file_handler import file_handler
 from ..services.color_extractor import color_extractor
 from ..services.firefly_service import firefly_service
+from ..services.brand_kit_cache import brand_kit_cache
+from ..services.generation_scheduler import generation_scheduler, queue_reporter
+from ..services.job_queue import INTERACTIVE_PRIORITY, job_queue
+from ..services.job_worker import Emit, job_worker_pool
 
 router = APIRouter(prefix="/assets", tags=["assets"])
 
@@ -42,6 +47,7 @@ async def upload_brand_asset(
         file_size=file_size,
         brand_colors=brand_colors
     )
+    brand_kit_cache.invalidate()
     
     return asset
 
@@ -80,14 +86,10 @@ def list_assets(
     return assets
 
 
-@router.post("/{asset_id}/regenerate", response_model=AssetResponse)
-async def regenerate_asset(asset_id: uuid.UUID, db: Session = Depends(get_db)):
-    """Regenerate an auto-generated asset with new AI-generated image"""
-    # Get existing asset
-    asset = asset_service.get_asset_or_404(db, asset_id)
-    
-    if not asset.auto_generated:
-        raise HTTPException(status_code=400, detail="Can only regenerate auto-generated assets")
+@job_worker_pool.handler("regenerate_asset")
+async def run_regenerate_asset(db: Session, payload: dict, emit: Emit) -> dict:
+    """Replace an auto-generated asset's image with a new provider render"""
+    asset = asset_service.get_asset_or_404(db, uuid.UUID(str(payload["asset_id"])))
     
     # Extract brand and product name from filename
     parts = asset.filename.rsplit('_', 1)
@@ -101,31 +103,70 @@ async def regenerate_asset(asset_id: uuid.UUID, db: Session = Depends(get_db)):
             product_description = asset.brief_content if asset.brief_content else f"{name} product"
             prompt = f"Professional high-quality product photography. Product: {name}. Description: {product_description[:300]}. Studio lighting, clean white background, commercial advertising style. Show the product clearly with professional presentation. Make it photorealistic and appealing."
         
-        file_path, mime_type, file_size, _ = await firefly_service._call_firefly_api(
-            prompt=prompt,
-            aspect_ratio="1:1",
-            api_key=firefly_service._get_provider_config(db)[0],
-            api_url=firefly_service._get_provider_config(db)[1],
-            provider=firefly_service._get_provider_config(db)[2],
-            db=db
-        )
-        
-        # Delete old file
-        file_handler.delete_file(asset.file_path)
-        
-        # Update asset with new file
-        asset.file_path = file_path
-        asset.mime_type = mime_type
-        asset.file_size = file_size
-        db.commit()
-        db.refresh(asset)
-        
-        print(f"✅ Regenerated {asset.asset_type} asset: {file_path}")
-        return asset
-        
+        # Interactive lane: ahead of bulk generation
+        with generation_scheduler.context(flow=f"asset:{asset.id}", lane="interactive", on_queue=queue_reporter(emit)):
+            file_path, mime_type, file_size, _ = await firefly_service._call_firefly_api(
+                prompt=prompt,
+                aspect_ratio="1:1",
+                api_key=firefly_service._get_provider_config(db)[0],
+                api_url=firefly_service._get_provider_config(db)[1],
+                provider=firefly_service._get_provider_config(db)[2],
+                db=db,
+                use_cache=False
+            )
+    except HTTPException as e:
+        # Keep the provider's status (a 4xx rejection is not retried)
+        print(f"❌ Failed to regenerate asset: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=f"Failed to regenerate asset: {e.detail}") from e
     except Exception as e:
         print(f"❌ Failed to regenerate asset: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to regenerate asset: {str(e)}")
+    
+    # Delete old file
+    file_handler.delete_file(asset.file_path)
+    
+    # Update asset with new file
+    asset.file_path = file_path
+    asset.mime_type = mime_type
+    asset.file_size = file_size
+    asset.thumbnails = file_handler.thumbnails_for(file_path)
+    db.commit()
+    db.refresh(asset)
+    brand_kit_cache.invalidate()
+    
+    print(f"✅ Regenerated {asset.asset_type} asset: {file_path}")
+    return {'asset_id': str(asset.id)}
+
+
+@router.post("/{asset_id}/regenerate", response_model=AssetResponse)
+async def regenerate_asset(asset_id: uuid.UUID, wait: bool = True, db: Session = Depends(get_db)):
+    """
+    Regenerate an auto-generated asset with new AI-generated image.
+    With the job queue enabled this runs as a priority job; wait=false returns
+    202 with the job_id instead of waiting for the new image.
+    """
+    # Get existing asset
+    asset = asset_service.get_asset_or_404(db, asset_id)
+    
+    if not asset.auto_generated:
+        raise HTTPException(status_code=400, detail="Can only regenerate auto-generated assets")
+    
+    payload = {'asset_id': str(asset_id)}
+    if not job_queue.enabled:
+        await run_regenerate_asset(db, payload, job_queue.discard_event)
+    else:
+        job = job_queue.enqueue(db, "regenerate_asset", payload, priority=INTERACTIVE_PRIORITY)
+        job_worker_pool.wake()
+        if not wait:
+            return JSONResponse(status_code=202, content={'job_id': str(job.id)})
+        job = await job_queue.wait(job.id)
+        if job.status != "succeeded":
+            # Same status as the inline path (e.g. a provider's 429 or 403)
+            raise HTTPException(status_code=job.error_status or 500, detail=job.error or f"Regeneration {job.status}")
+        # The worker committed through its own session
+        db.expire_all()
+    
+    return asset_service.get_asset_or_404(db, asset_id)
 
 
 @router.delete("/{asset_id}", status_code=204)
@@ -139,5 +180,6 @@ def delete_asset(asset_id: uuid.UUID, db: Session = Depends(get_db)):
     
     # Delete from database
     asset_service.delete_asset(db, asset_id)
+    brand_kit_cache.invalidate()
     
     return None
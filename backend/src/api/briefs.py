@@ -16,9 +16,14 @@ from ..services.idea_service import idea_service
 from ..services.creative_service import creative_service
 from ..services.asset_service import asset_service
 from ..services.file_handler import file_handler
+from ..services.rendition_service import rendition_service
 from ..services.document_parser import document_parser
 from ..services.llm_service import llm_service
 from ..services.firefly_service import firefly_service
+from ..services.brand_kit_cache import brand_kit_cache
+from ..services.generation_scheduler import generation_scheduler, queue_reporter
+from ..services.job_queue import job_queue
+from ..services.job_worker import Emit, earlier_events, job_worker_pool
 
 router = APIRouter(prefix="/briefs", tags=["briefs"])
 
@@ -66,6 +71,7 @@ async def _generate_missing_assets(db: Session, brief):
                 auto_generated=True,
                 brief_content=brief.content
             )
+            brand_kit_cache.invalidate()
             print(f"✅ Generated brand logo: {file_path}")
         except Exception as e:
             print(f"⚠️  Failed to generate brand logo: {e}")
@@ -181,8 +187,9 @@ async def create_brief(
     # Create brief in database
     brief = brief_service.create_brief(db, brief_data)
     
-    # Auto-generate brand assets if they don't exist
-    await _generate_missing_assets(db, brief)
+    # Auto-generate brand assets if they don't exist (the user is waiting on this request)
+    with generation_scheduler.context(flow=f"brief:{brief.id}", lane="interactive"):
+        await _generate_missing_assets(db, brief)
     
     return brief
 @router.get("/{brief_id}", response_model=BriefResponse)
@@ -201,23 +208,36 @@ def delete_brief(brief_id: uuid.UUID, db: Session = Depends(get_db)):
     return None
 
 
-@router.post("/{brief_id}/execute")
-async def execute_brief(brief_id: uuid.UUID, db: Session = Depends(get_db)):
+def _brief_event(event_id: Optional[int], event_type: str, data: dict) -> str:
+    # id before data: clients read the data line, wherever it is in the message
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"data: {json.dumps({'type': event_type, **data})}\n\n"
+
+
+@job_worker_pool.handler("execute_brief")
+async def run_execute_brief(db: Session, payload: dict, emit: Emit) -> dict:
     """
-    Execute brief to generate creative ideas with streaming updates.
-    Generates one idea per region/demographic combination using LLM.
-    Deletes all existing creatives in the approval queue before generating new ideas.
-    Streams ideas as they are generated using Server-Sent Events.
+    Generate one idea per region/demographic, emitting init/idea/error events and
+    a final complete (or fatal_error) event.
     """
-    async def generate_ideas_stream():
+    brief_id = uuid.UUID(str(payload["brief_id"]))
+    # A retried job resumes: ideas an earlier attempt streamed are not generated
+    # again (one created but not yet streamed when the worker died is repeated)
+    resumed = bool(earlier_events("init"))
+    done = {(idea['region'], idea['demographic']) for idea in earlier_events("idea")}
+    created = len(done)
+    # Bulk lane: share the providers fairly with other briefs, behind regenerate clicks
+    with generation_scheduler.context(flow=f"brief:{brief_id}", lane="bulk", on_queue=queue_reporter(emit)):
         try:
-            # Delete all existing creatives to clear the approval queue
-            all_creatives = creative_service.list_creatives(db)
-            for creative in all_creatives:
-                # Delete the file first
-                file_handler.delete_file(creative.file_path)
-                # Delete from database (cascades to approval)
-                creative_service.delete_creative(db, creative.id)
+            if not resumed:
+                # Delete all existing creatives to clear the approval queue
+                all_creatives = creative_service.list_creatives(db)
+                for creative in all_creatives:
+                    # Delete the file first
+                    file_handler.delete_file(creative.file_path)
+                    rendition_service.delete(creative.file_path)
+                    # Delete from database (cascades to approval)
+                    creative_service.delete_creative(db, creative.id)
             
             # Get brief
             brief = brief_service.get_brief_or_404(db, brief_id)
@@ -227,11 +247,14 @@ async def execute_brief(brief_id: uuid.UUID, db: Session = Depends(get_db)):
             demographics = brief.demographics
             total_ideas = len(regions) * len(demographics)
             
-            yield f"data: {json.dumps({'type': 'init', 'regions': regions, 'demographics': demographics, 'total': total_ideas})}\n\n"
+            if not resumed:
+                await emit("init", {'regions': regions, 'demographics': demographics, 'total': total_ideas})
             
             # Generate ideas one at a time and stream each
             for region in regions:
                 for demographic in demographics:
+                    if (region, demographic) in done:
+                        continue
                     try:
                         # Generate single idea
                         idea_data = await llm_service._generate_single_idea(
@@ -252,10 +275,10 @@ async def execute_brief(brief_id: uuid.UUID, db: Session = Depends(get_db)):
                             content=idea_data["content"],
                             language_code=idea_data["language_code"]
                         )
+                        created += 1
                         
                         # Stream the generated idea
-                        idea_json = {
-                            'type': 'idea',
+                        await emit("idea", {
                             'id': str(idea.id),
                             'brief_id': str(idea.brief_id),
                             'region': idea.region,
@@ -264,32 +287,44 @@ async def execute_brief(brief_id: uuid.UUID, db: Session = Depends(get_db)):
                             'language_code': idea.language_code,
                             'generation_count': idea.generation_count,
                             'created_at': idea.created_at.isoformat()
-                        }
-                        yield f"data: {json.dumps(idea_json)}\n\n"
+                        })
                         
                     except Exception as e:
                         # Send error for this specific idea but continue
-                        error_json = {
-                            'type': 'error',
-                            'region': region,
-                            'demographic': demographic,
-                            'error': str(e)
-                        }
-                        yield f"data: {json.dumps(error_json)}\n\n"
+                        await emit("error", {'region': region, 'demographic': demographic, 'error': str(e)})
             
             # Send completion signal
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            await emit("complete", {})
             
         except Exception as e:
             # Send fatal error
-            yield f"data: {json.dumps({'type': 'fatal_error', 'error': str(e)})}\n\n"
+            await emit("fatal_error", {'error': str(e)})
+        return {'ideas_created': created}
+
+
+@router.post("/{brief_id}/execute")
+async def execute_brief(brief_id: uuid.UUID, db: Session = Depends(get_db)):
+    """
+    Execute brief to generate creative ideas with streaming updates.
+    Generates one idea per region/demographic combination using LLM.
+    Deletes all existing creatives in the approval queue before generating new ideas.
+    Streams ideas as they are generated using Server-Sent Events.
+    With the job queue enabled this runs as a background job; the first event
+    carries its job_id.
+    """
+    payload = {'brief_id': str(brief_id)}
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no"
+    }
+    if job_queue.enabled:
+        brief_service.get_brief_or_404(db, brief_id)
+        job = job_queue.enqueue(db, "execute_brief", payload)
+        job_worker_pool.wake()
+        stream = job_queue.subscribe(job.id, _brief_event)
+        headers["X-Job-Id"] = str(job.id)
+    else:
+        stream = job_queue.run_inline(run_execute_brief, db, payload, _brief_event)
     
-    return StreamingResponse(
-        generate_ideas_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"
-        }
-    )
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
@@ -1,9 +1,11 @@
 """
 API endpoints for Creative management.
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import os
 import uuid
 
 from ..db import get_db
@@ -11,9 +13,14 @@ from ..schemas.creative import CreativeResponse, CreativeWithApproval
 from ..services.creative_service import creative_service
 from ..services.idea_service import idea_service
 from ..services.brief_service import brief_service
-from ..services.asset_service import asset_service
+from ..services.brand_kit_cache import brand_kit_cache
 from ..services.firefly_service import firefly_service
 from ..services.file_handler import file_handler
+from ..services.rendition_service import rendition_service
+from ..services.perceptual_hash import perceptual_hash_service
+from ..services.generation_scheduler import generation_scheduler, queue_reporter
+from ..services.job_queue import INTERACTIVE_PRIORITY, job_queue
+from ..services.job_worker import Emit, job_worker_pool
 
 router = APIRouter(prefix="/creatives", tags=["creatives"])
 
@@ -23,17 +30,25 @@ def list_creatives(
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    collapse_duplicates: bool = False,
     db: Session = Depends(get_db)
 ):
     """
     List all creatives with approval status.
     Filter by status: pending, approved, deployed
+    Near-duplicates of an earlier creative for the same idea and aspect ratio
+    carry duplicate_of; collapse_duplicates=true leaves them out.
     """
     creatives = creative_service.list_creatives(db, status=status, skip=skip, limit=limit)
+    duplicates = creative_service.find_duplicates(db, creatives)
     # Add region, demographic from idea and brand, product_name from brief
     result = []
     for creative in creatives:
+        if collapse_duplicates and creative.id in duplicates:
+            continue
         creative_dict = CreativeWithApproval.model_validate(creative).model_dump(mode='json')
+        if creative.id in duplicates:
+            creative_dict['duplicate_of'] = str(duplicates[creative.id])
         if creative.idea:
             creative_dict['region'] = creative.idea.region
             creative_dict['demographic'] = creative.idea.demographic
@@ -52,52 +67,115 @@ def get_creative(creative_id: uuid.UUID, db: Session = Depends(get_db)):
     return creative
 
 
-@router.post("/{creative_id}/regenerate", response_model=CreativeResponse)
-async def regenerate_creative(creative_id: uuid.UUID, db: Session = Depends(get_db)):
-    """
-    Regenerate creative with new Firefly-generated image.
-    Resets all approvals to false - must re-approve before deploying.
-    """
+@job_worker_pool.handler("regenerate_creative")
+async def run_regenerate_creative(db: Session, payload: dict, emit: Emit) -> dict:
+    """Replace a creative's image with a new provider render (resets approvals)"""
+    creative_id = uuid.UUID(str(payload["creative_id"]))
+    
     # Get creative and idea
     creative = creative_service.get_creative_or_404(db, creative_id)
     idea = idea_service.get_idea_or_404(db, creative.idea_id)
     brief = brief_service.get_brief_or_404(db, idea.brief_id)
     
     # Get brand colors and logo
-    brand_assets = asset_service.list_assets(db, asset_type="brand")
-    brand_colors = brand_assets[0].brand_colors if brand_assets else None
-    brand_logo_path = brand_assets[0].file_path if brand_assets else None
+    brand_kit = brand_kit_cache.get_current(db)
+    brand_colors = brand_kit.brand_colors if brand_kit else None
+    brand_logo_path = brand_kit.file_path if brand_kit else None
     
-    # Generate new creative
+    # Generate new creative (interactive lane: ahead of bulk generation)
     try:
-        new_file_path, mime_type, new_file_size, firefly_job_id = await firefly_service.generate_creative(
-            db,
-            idea.content,
-            brief.campaign_message,
-            idea.region,
-            idea.demographic,
-            creative.aspect_ratio,
-            brand_colors,
-            idea.language_code,
-            brief.brand,
-            brand_logo_path
-        )
+        with generation_scheduler.context(flow=f"brief:{brief.id}", lane="interactive", on_queue=queue_reporter(emit)):
+            new_file_path, mime_type, new_file_size, firefly_job_id = await firefly_service.generate_creative(
+                db,
+                idea.content,
+                brief.campaign_message,
+                idea.region,
+                idea.demographic,
+                creative.aspect_ratio,
+                brand_colors,
+                idea.language_code,
+                brief.brand,
+                brand_logo_path,
+                use_cache=False  # Explicit regenerate always asks the provider for a new image
+            )
+    except HTTPException as e:
+        # Keep the provider's status (a 4xx rejection is not retried)
+        raise HTTPException(status_code=e.status_code, detail=f"Firefly generation failed: {e.detail}") from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Firefly generation failed: {str(e)}")
     
-    # Delete old file
+    # Delete old file and its renditions
     file_handler.delete_file(creative.file_path)
+    rendition_service.delete(creative.file_path)
     
     # Update creative in database (resets approvals)
-    updated_creative = creative_service.regenerate_creative(
+    creative_service.regenerate_creative(
         db,
         creative_id,
         new_file_path,
         new_file_size,
-        firefly_job_id
+        firefly_job_id,
+        await perceptual_hash_service.hash_file(new_file_path)
     )
     
-    return updated_creative
+    return {'creative_id': str(creative_id)}
+
+
+@router.get("/{creative_id}/media")
+def get_creative_media(
+    creative_id: uuid.UUID,
+    width: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Serve a creative's image in the best format the Accept header allows
+    (AVIF, WebP, then JPEG), at the smallest rendition at least `width` px wide.
+    Without a width, the full-size image is served.
+    """
+    creative = creative_service.get_creative_or_404(db, creative_id)
+    master = {"file_path": creative.file_path, "mime_type": creative.mime_type, "width": None}
+    chosen = rendition_service.choose(creative.renditions or [], master, accept, width)
+    
+    if not os.path.isfile(chosen["file_path"]):
+        if chosen is master:
+            raise HTTPException(status_code=404, detail="Creative image not found")
+        # Rendition cleaned up behind the record: fall back to the master
+        chosen = master
+    
+    return FileResponse(
+        chosen["file_path"],
+        media_type=chosen["mime_type"],
+        headers={"Vary": "Accept", "Cache-Control": "public, max-age=86400"}
+    )
+
+
+@router.post("/{creative_id}/regenerate", response_model=CreativeResponse)
+async def regenerate_creative(creative_id: uuid.UUID, wait: bool = True, db: Session = Depends(get_db)):
+    """
+    Regenerate creative with new Firefly-generated image.
+    Resets all approvals to false - must re-approve before deploying.
+    With the job queue enabled this runs as a priority job; wait=false returns
+    202 with the job_id instead of waiting for the new image.
+    """
+    creative_service.get_creative_or_404(db, creative_id)
+    payload = {'creative_id': str(creative_id)}
+    
+    if not job_queue.enabled:
+        await run_regenerate_creative(db, payload, job_queue.discard_event)
+    else:
+        job = job_queue.enqueue(db, "regenerate_creative", payload, priority=INTERACTIVE_PRIORITY)
+        job_worker_pool.wake()
+        if not wait:
+            return JSONResponse(status_code=202, content={'job_id': str(job.id)})
+        job = await job_queue.wait(job.id)
+        if job.status != "succeeded":
+            # Same status as the inline path (e.g. a provider's 429 or 403)
+            raise HTTPException(status_code=job.error_status or 500, detail=job.error or f"Regeneration {job.status}")
+        # The worker committed through its own session
+        db.expire_all()
+    
+    return creative_service.get_creative_or_404(db, creative_id)
 
 
 @router.delete("/{creative_id}", status_code=204)
@@ -105,6 +183,7 @@ def delete_creative(creative_id: uuid.UUID, db: Session = Depends(get_db)):
     """Delete a single creative by ID."""
     creative = creative_service.get_creative_or_404(db, creative_id)
     file_handler.delete_file(creative.file_path)
+    rendition_service.delete(creative.file_path)
     creative_service.delete_creative(db, creative_id)
     return None
 
@@ -126,6 +205,7 @@ def delete_creatives_by_idea(idea_id: uuid.UUID, db: Session = Depends(get_db)):
     # Delete files and database records
     for creative in creatives:
         file_handler.delete_file(creative.file_path)
+        rendition_service.delete(creative.file_path)
         creative_service.delete_creative(db, creative.id)
     
     return None
@@ -2,8 +2,12 @@
 API endpoints for Idea management.
 """
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import asyncio
+import json
 import uuid
+from typing import Optional
 
 from ..db import get_db
 from ..schemas.idea import IdeaResponse
@@ -11,9 +15,13 @@ from ..schemas.creative import CreativeResponse
 from ..services.idea_service import idea_service
 from ..services.creative_service import creative_service
 from ..services.brief_service import brief_service
-from ..services.asset_service import asset_service
+from ..services.brand_kit_cache import brand_kit_cache
 from ..services.llm_service import llm_service
 from ..services.firefly_service import firefly_service
+from ..services.perceptual_hash import perceptual_hash_service
+from ..services.generation_scheduler import generation_scheduler, queue_reporter
+from ..services.job_queue import job_queue
+from ..services.job_worker import Emit, earlier_events, job_worker_pool
 
 router = APIRouter(prefix="/ideas", tags=["ideas"])
 
@@ -37,15 +45,16 @@ async def regenerate_idea(idea_id: uuid.UUID, db: Session = Depends(get_db)):
     # Get parent brief for context
     brief = brief_service.get_brief_or_404(db, idea.brief_id)
     
-    # Generate new idea content
+    # Generate new idea content (interactive lane: ahead of bulk brief execution)
     try:
-        idea_data_list = await llm_service.generate_ideas(
-            db,
-            brief.content,
-            brief.campaign_message,
-            [idea.region],
-            [idea.demographic]
-        )
+        with generation_scheduler.context(flow=f"brief:{brief.id}", lane="interactive"):
+            idea_data_list = await llm_service.generate_ideas(
+                db,
+                brief.content,
+                brief.campaign_message,
+                [idea.region],
+                [idea.demographic]
+            )
         new_content = idea_data_list[0]["content"]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"LLM generation failed: {str(e)}")
@@ -56,98 +65,234 @@ async def regenerate_idea(idea_id: uuid.UUID, db: Session = Depends(get_db)):
     return updated_idea
 
 
-@router.post("/{idea_id}/generate-creative")
-async def generate_creative(idea_id: uuid.UUID, db: Session = Depends(get_db)):
+def _creative_event(event_id: Optional[int], event_type: str, data: dict) -> str:
+    # Lets EventSource resume from GET /jobs/{job_id}/events with Last-Event-ID
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+@job_worker_pool.handler("generate_creative")
+async def run_generate_creative(db: Session, payload: dict, emit: Emit) -> dict:
     """
-    Generate final creative assets from idea using Adobe Firefly with streaming.
-    Creates 3 versions: 16:9, 9:16, and 1:1 aspect ratios.
-    Includes campaign message and brand colors in the generated images.
-    Streams each creative as it's generated using Server-Sent Events.
+    Generate the creatives for one idea, emitting progress/creative/error events
+    and a final complete event. Runs as a queued job or inline in the request.
     """
-    from starlette.responses import StreamingResponse
-    import json
-    
-    async def generate_creatives_stream():
-        """Generator that yields SSE events for each creative"""
-        # Get idea and brief
-        idea = idea_service.get_idea_or_404(db, idea_id)
-        brief = brief_service.get_brief_or_404(db, idea.brief_id)
-        
-        # Get brand colors and logo from assets (if any)
-        brand_assets = asset_service.list_assets(db, asset_type="brand")
-        brand_colors = None
-        brand_logo_path = None
-        if brand_assets:
-            # Use colors and logo from first brand asset
-            brand_colors = brand_assets[0].brand_colors
-            brand_logo_path = brand_assets[0].file_path
-        
-        # Generate creatives for all 3 aspect ratios
-        aspect_ratios = ["16:9", "9:16", "1:1"]
+    idea_id = uuid.UUID(str(payload["idea_id"]))
+    variants = payload.get("variants", 1)
+    reframe = payload.get("reframe", False)
+    
+    # Get idea and brief
+    idea = idea_service.get_idea_or_404(db, idea_id)
+    brief = brief_service.get_brief_or_404(db, idea.brief_id)
+    
+    # Get brand colors and logo from the cached brand kit (if any)
+    brand_kit = brand_kit_cache.get_current(db)
+    brand_colors = brand_kit.brand_colors if brand_kit else None
+    brand_logo_path = brand_kit.file_path if brand_kit else None
+    
+    # Generate creatives for all 3 aspect ratios concurrently.
+    # Each ratio task emits a progress event when it starts and one
+    # creative event per variant (or an error) when it finishes, so
+    # events stream in completion order rather than submission order.
+    aspect_ratios = ["16:9", "9:16", "1:1"]
+    semaphore = asyncio.Semaphore(firefly_service.generation_concurrency)
+    
+    # A retried job resumes: creatives an earlier attempt streamed are kept and
+    # only the aspect ratios (or variants) still missing are generated
+    creative_ids = []
+    emitted = {}
+    for creative in earlier_events("creative"):
+        creative_ids.append(creative['id'])
+        emitted.setdefault(creative['aspect_ratio'], set()).add(creative.get('variant'))
+    pending = [ar for ar in aspect_ratios if len(emitted.get(ar, ())) < (1 if reframe else variants)]
+    started = len(aspect_ratios) - len(pending)
+    errors = 0
+    
+    async def emit_creative(aspect_ratio: str, result, variant=None):
+        file_path, mime_type, file_size, firefly_job_id = result
+        # Create creative in database (also creates approval record)
+        creative = creative_service.create_creative(
+            db,
+            idea_id=idea.id,
+            file_path=file_path,
+            mime_type=mime_type,
+            file_size=file_size,
+            aspect_ratio=aspect_ratio,
+            firefly_job_id=firefly_job_id,
+            perceptual_hash=await perceptual_hash_service.hash_file(file_path)
+        )
+        creative_ids.append(str(creative.id))
         
-        for i, aspect_ratio in enumerate(aspect_ratios):
+        creative_data = {
+            'id': str(creative.id),
+            'idea_id': str(creative.idea_id),
+            'file_path': creative.file_path,
+            'mime_type': creative.mime_type,
+            'file_size': creative.file_size,
+            'aspect_ratio': creative.aspect_ratio,
+            'firefly_job_id': creative.firefly_job_id,
+            'region': idea.region,
+            'demographic': idea.demographic,
+            'created_at': creative.created_at.isoformat(),
+            'updated_at': creative.updated_at.isoformat()
+        }
+        if variant is not None:
+            creative_data['variant'] = variant
+        await emit("creative", creative_data)
+    
+    async def generate_reframed():
+        """One master render, reframed locally to every aspect ratio"""
+        nonlocal started, errors
+        try:
+            for aspect_ratio in pending:
+                started += 1
+                await emit("progress", {'current': started, 'total': len(aspect_ratios), 'aspect_ratio': aspect_ratio})
+            results = await firefly_service.generate_reframed_creatives(
+                db,
+                idea.content,
+                brief.campaign_message,
+                idea.region,
+                idea.demographic,
+                pending,
+                brand_colors,
+                idea.language_code,
+                brief.brand,
+                brand_logo_path
+            )
+            for aspect_ratio, result in zip(pending, results):
+                await emit_creative(aspect_ratio, result)
+        except Exception as e:
+            import traceback
+            print(f"Reframed generation failed: {str(e)}\n{traceback.format_exc()}")
+            for aspect_ratio in pending:
+                errors += 1
+                await emit("error", {'error': str(e), 'aspect_ratio': aspect_ratio})
+    
+    async def generate_aspect_ratio(aspect_ratio: str):
+        nonlocal started, errors
+        async with semaphore:
+            started += 1
+            await emit("progress", {'current': started, 'total': len(aspect_ratios), 'aspect_ratio': aspect_ratio})
             try:
-                # Send progress event
-                yield f"event: progress\ndata: {json.dumps({'current': i + 1, 'total': 3, 'aspect_ratio': aspect_ratio})}\n\n"
-                
-                file_path, mime_type, file_size, firefly_job_id = await firefly_service.generate_creative(
-                    db,
-                    idea.content,
-                    brief.campaign_message,
-                    idea.region,
-                    idea.demographic,
-                    aspect_ratio,
-                    brand_colors,
-                    idea.language_code,  # Pass language for appropriate text
-                    brief.brand,  # Pass brand name for logo generation
-                    brand_logo_path  # Pass brand logo path for compositing
-                )
-                
-                # Create creative in database (also creates approval record)
-                creative = creative_service.create_creative(
-                    db,
-                    idea_id=idea.id,
-                    file_path=file_path,
-                    mime_type=mime_type,
-                    file_size=file_size,
-                    aspect_ratio=aspect_ratio,
-                    firefly_job_id=firefly_job_id
-                )
+                # (variant number or None, result) pairs
+                if variants == 1:
+                    results = [(None, await firefly_service.generate_creative(
+                        db,
+                        idea.content,
+                        brief.campaign_message,
+                        idea.region,
+                        idea.demographic,
+                        aspect_ratio,
+                        brand_colors,
+                        idea.language_code,  # Pass language for appropriate text
+                        brief.brand,  # Pass brand name for logo generation
+                        brand_logo_path  # Pass brand logo path for compositing
+                    ))]
+                else:
+                    # One provider call for the candidates of this ratio an earlier
+                    # attempt did not already store
+                    missing = [v for v in range(variants) if v not in emitted.get(aspect_ratio, ())]
+                    batch = await firefly_service.generate_creative_variants(
+                        db,
+                        idea.content,
+                        brief.campaign_message,
+                        idea.region,
+                        idea.demographic,
+                        aspect_ratio,
+                        brand_colors,
+                        idea.language_code,
+                        brief.brand,
+                        brand_logo_path,
+                        variants=len(missing)
+                    )
+                    results = list(zip(missing, batch))
                 
-                # Send creative event with the generated creative
-                creative_data = {
-                    'id': str(creative.id),
-                    'idea_id': str(creative.idea_id),
-                    'file_path': creative.file_path,
-                    'mime_type': creative.mime_type,
-                    'file_size': creative.file_size,
-                    'aspect_ratio': creative.aspect_ratio,
-                    'firefly_job_id': creative.firefly_job_id,
-                    'region': idea.region,
-                    'demographic': idea.demographic,
-                    'created_at': creative.created_at.isoformat(),
-                    'updated_at': creative.updated_at.isoformat()
-                }
-                yield f"event: creative\ndata: {json.dumps(creative_data)}\n\n"
+                for variant, result in results:
+                    await emit_creative(aspect_ratio, result, variant)
                 
             except Exception as e:
                 import traceback
                 error_details = f"Firefly generation failed for {aspect_ratio}: {str(e)}\n{traceback.format_exc()}"
                 print(error_details)  # Log to console
-                yield f"event: error\ndata: {json.dumps({'error': str(e), 'aspect_ratio': aspect_ratio})}\n\n"
-        
-        # Send complete event
-        yield f"event: complete\ndata: {json.dumps({'total': len(aspect_ratios)})}\n\n"
-    
-    return StreamingResponse(
-        generate_creatives_stream(),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no"  # Disable nginx buffering
-        }
-    )
+                errors += 1
+                await emit("error", {'error': str(e), 'aspect_ratio': aspect_ratio})
+    
+    # Tasks inherit the scheduling context they are created in: bulk lane, one
+    # fair-share flow per brief, provider queue position reported per ratio
+    tasks = []
+    with generation_scheduler.context(flow=f"brief:{idea.brief_id}", lane="bulk", on_queue=queue_reporter(emit)):
+        if reframe:
+            if pending:
+                tasks.append(asyncio.create_task(generate_reframed()))
+        else:
+            for ar in pending:
+                with generation_scheduler.context(on_queue=queue_reporter(emit, aspect_ratio=ar)):
+                    tasks.append(asyncio.create_task(generate_aspect_ratio(ar)))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # Job cancelled or inline stream closed early: stop outstanding work
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    
+    # Send complete event
+    complete = {'total': len(aspect_ratios)}
+    if variants > 1:
+        complete['variants'] = variants
+    if reframe:
+        complete['reframed'] = True
+    await emit("complete", complete)
+    return {'creative_ids': creative_ids, 'errors': errors}
+
+
+@router.post("/{idea_id}/generate-creative")
+async def generate_creative(
+    idea_id: uuid.UUID,
+    variants: int = 1,
+    reframe: Optional[bool] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Generate final creative assets from idea using Adobe Firefly with streaming.
+    Creates 3 versions: 16:9, 9:16, and 1:1 aspect ratios, generated concurrently
+    (bounded by FIREFLY_GENERATION_CONCURRENCY).
+    With variants > 1, each aspect ratio asks the provider for that many outputs in
+    one call and stores every output as a sibling Creative.
+    With reframe (default CREATIVE_REFRAME_MODE), one master image is generated and
+    the three ratios are cropped/padded from it locally: one provider call per idea.
+    Includes campaign message and brand colors in the generated images.
+    Streams each creative as it's generated using Server-Sent Events.
+    With the job queue enabled the work runs as a background job: the first event
+    carries its job_id, and closing the stream does not stop generation (resume
+    with GET /jobs/{job_id}/events).
+    """
+    if variants < 1 or variants > firefly_service.max_variants:
+        raise HTTPException(
+            status_code=400,
+            detail=f"variants must be between 1 and {firefly_service.max_variants}"
+        )
+    if reframe is None:
+        reframe = firefly_service.reframe_mode
+    if reframe and variants > 1:
+        raise HTTPException(status_code=400, detail="variants cannot be combined with reframe")
+    
+    payload = {'idea_id': str(idea_id), 'variants': variants, 'reframe': reframe}
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "X-Accel-Buffering": "no"  # Disable nginx buffering
+    }
+    if job_queue.enabled:
+        idea_service.get_idea_or_404(db, idea_id)
+        job = job_queue.enqueue(db, "generate_creative", payload)
+        job_worker_pool.wake()
+        stream = job_queue.subscribe(job.id, _creative_event)
+        headers["X-Job-Id"] = str(job.id)
+    else:
+        stream = job_queue.run_inline(run_generate_creative, db, payload, _creative_event)
+    
+    return StreamingResponse(stream, media_type="text/event-stream", headers=headers)
 
 
 @router.post("/{idea_id}/duplicate", response_model=IdeaResponse, status_code=201)
@@ -0,0 +1,58 @@
+"""
+API endpoints for background jobs.
+"""
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from typing import Optional
+import json
+import uuid
+
+from ..db import get_db
+from ..schemas.job import JobResponse
+from ..services.job_queue import job_queue
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _job_event(event_id: Optional[int], event_type: str, data: dict) -> str:
+    message = f"id: {event_id}\n" if event_id is not None else ""
+    return message + f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(job_id: uuid.UUID, db: Session = Depends(get_db)):
+    """Get a job's status, attempts and result"""
+    return job_queue.get_job_or_404(db, job_id)
+
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: uuid.UUID,
+    after: int = 0,
+    last_event_id: Optional[int] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream a job's progress events using Server-Sent Events until it finishes.
+    Replays from the start, or after the Last-Event-ID header / `after` query
+    parameter, so a client that disconnected can resume where it left off.
+    """
+    job_queue.get_job_or_404(db, job_id)
+    return StreamingResponse(
+        job_queue.stream(job_id, _job_event, after_id=last_event_id or after),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@router.post("/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(job_id: uuid.UUID, db: Session = Depends(get_db)):
+    """Cancel a queued or running job; a running job stops at its next heartbeat"""
+    job = job_queue.cancel(db, job_id)
+    job_queue.notify(job_id)
+    return job
@@ -0,0 +1,87 @@
+"""
+API endpoints for runtime metrics.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+
+from ..services.image_processor import image_processor
+from ..services.generation_cache import generation_cache
+from ..services.image_providers import provider_registry
+from ..services.firefly_jobs import firefly_job_poller
+from ..services.generation_scheduler import generation_scheduler
+from ..services.job_queue import job_queue
+from ..services.job_worker import job_worker_pool
+from ..services.provider_ledger import PHASES, provider_ledger
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("/image-processing")
+def get_image_processing_metrics():
+    """Image post-processing pool: workers, queue depth and completed jobs"""
+    return image_processor.stats()
+
+
+@router.get("/generation-cache")
+async def get_generation_cache_metrics():
+    """Generation cache: hit/miss/bypass counters, entries and disk usage"""
+    return await generation_cache.stats()
+
+
+@router.get("/providers")
+def get_provider_metrics():
+    """Per image provider: in-flight/waiting requests and rate-limit throttling"""
+    return provider_registry.stats()
+
+
+@router.get("/circuit-breakers")
+def get_circuit_breakers():
+    """Per image provider circuit breaker: state, failure counts and time to next trial"""
+    return provider_registry.breaker_stats()
+
+
+@router.get("/firefly-jobs")
+def get_firefly_job_metrics():
+    """Async Firefly jobs: outstanding jobs, polls and outcomes"""
+    return firefly_job_poller.stats()
+
+
+@router.get("/jobs")
+def get_job_metrics(db: Session = Depends(get_db)):
+    """Job queue: jobs per status, plus this process's workers and outcomes"""
+    return {"queue": job_queue.stats(db), "workers": job_worker_pool.stats()}
+
+
+@router.get("/scheduler")
+def get_scheduler_metrics():
+    """Fair-share provider scheduler: slots in use, waiting calls per lane, call durations"""
+    return generation_scheduler.stats()
+
+
+@router.get("/provider-calls")
+def get_provider_call_metrics(
+    days: int = 7,
+    kind: Optional[str] = None,
+    provider: Optional[str] = None,
+    phase: str = "total",
+    db: Session = Depends(get_db)
+):
+    """
+    Provider call ledger per provider per day: calls by status (incl. mock
+    fallbacks and cache hits), tokens/images/bytes, and p50/p95/p99 of one
+    timing phase (queue, connect, ttfb, download, overlay, total)
+    """
+    if phase not in PHASES:
+        raise HTTPException(status_code=400, detail=f"phase must be one of {', '.join(PHASES)}")
+    if days < 1:
+        raise HTTPException(status_code=400, detail="days must be at least 1")
+    return {
+        "days": days,
+        "phase": phase,
+        "providers": provider_ledger.daily_stats(db, days=days, kind=kind, provider=provider, phase=phase),
+        "writer": provider_ledger.stats()
+    }
@@ -7,6 +7,7 @@ from sqlalchemy.orm import Session
 from ..db import get_db
 from ..schemas.key import SettingsRequest, SettingsResponse
 from ..services.key_service import key_service
+from ..services.adobe_token_cache import adobe_token_cache
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
@@ -21,5 +22,14 @@ def get_settings(db: Session = Depends(get_db)):
 @router.post("", response_model=SettingsResponse)
 def update_settings(request: SettingsRequest, db: Session = Depends(get_db)):
     """Update multiple settings"""
+    # Cached Adobe tokens belong to the old credentials once these change
+    adobe_credentials_changed = any(
+        key in request.settings and request.settings[key] != key_service.get_value(db, key)
+        for key in ("adobe_client_id", "adobe_client_secret")
+    )
+    
     settings = key_service.set_multiple(db, request.settings)
+    
+    if adobe_credentials_changed:
+        adobe_token_cache.invalidate()
     return {"settings": settings}
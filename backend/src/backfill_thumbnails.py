@@ -0,0 +1,72 @@
+"""
+Backfill thumbnails for assets and creatives saved before they were generated.
+
+Thumbnails are written in parallel across the image process pool
+(IMAGE_PROCESS_WORKERS), then recorded on each row:
+
+    python -m src.backfill_thumbnails           # only rows missing thumbnails
+    python -m src.backfill_thumbnails --force   # rewrite every thumbnail
+"""
+import argparse
+import asyncio
+import time
+
+from .db import SessionLocal
+from .models.asset import Asset
+from .models.creative import Creative
+from .services.file_handler import file_handler
+from .services.image_processor import image_processor
+
+
+def _needs_thumbnails(row, force: bool) -> bool:
+    if force or not row.thumbnails:
+        return True
+    return file_handler.thumbnails_for(row.file_path) != row.thumbnails
+
+
+async def backfill(force: bool = False, batch_size: int = 200) -> dict:
+    """Create missing thumbnails; returns counts of rows updated, skipped and failed"""
+    counts = {"updated": 0, "skipped": 0, "failed": 0}
+    # Keep every pool worker busy without queueing the whole table at once
+    in_flight = asyncio.Semaphore(max(1, image_processor.max_workers) * 2)
+
+    async def process(row):
+        async with in_flight:
+            row.thumbnails = await file_handler.create_thumbnails(row.file_path)
+        counts["updated" if row.thumbnails else "failed"] += 1
+
+    db = SessionLocal()
+    try:
+        for model in (Asset, Creative):
+            offset = 0
+            while True:
+                rows = db.query(model).order_by(model.id).offset(offset).limit(batch_size).all()
+                if not rows:
+                    break
+                offset += len(rows)
+                pending = [row for row in rows if _needs_thumbnails(row, force)]
+                counts["skipped"] += len(rows) - len(pending)
+                await asyncio.gather(*(process(row) for row in pending))
+                db.commit()
+                print(f"🖼️ {model.__tablename__}: {offset} rows checked, {counts}")
+    finally:
+        db.close()
+    return counts
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--force", action="store_true", help="rewrite thumbnails that already exist")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        counts = await backfill(force=args.force, batch_size=args.batch_size)
+    finally:
+        await asyncio.to_thread(image_processor.shutdown)
+    print(f"✅ Thumbnail backfill done in {time.perf_counter() - started:.1f}s: {counts}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
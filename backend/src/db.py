@@ -15,11 +15,18 @@ DATABASE_URL = os.getenv(
     "postgresql://localhost:5432/adobe"
 )
 
+# Every job worker in this process holds a session while its handler runs
+# (defaults as in job_worker); the rest of the pool serves requests and the
+# short sessions for job claims, heartbeats, event writes and SSE polls
+_job_workers = int(os.getenv("JOB_WORKERS", "4")) + int(os.getenv("JOB_INTERACTIVE_WORKERS", "1"))
+
 # Create SQLAlchemy engine
 engine = create_engine(
     DATABASE_URL,
     echo=False,  # Disable SQL query logging
     pool_pre_ping=True,  # Verify connections before using them
+    pool_size=int(os.getenv("DB_POOL_SIZE", str(_job_workers + 10))),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
 )
 
 # Create session factory
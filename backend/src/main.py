@@ -1,6 +1,8 @@
 """
 FastAPI application initialization for Social Media Marketing Dashboard.
 """
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -9,7 +11,13 @@ from fastapi.staticfiles import StaticFiles
 import logging
 import time
 
-from .api import briefs, assets, ideas, creatives, approvals, settings
+from .api import briefs, assets, ideas, creatives, approvals, settings, metrics, jobs
+from .services.http_client import http_client
+from .services.image_processor import image_processor
+from .services.firefly_jobs import firefly_job_poller
+from .services.job_queue import job_queue
+from .services.job_worker import job_worker_pool
+from .services.provider_ledger import provider_ledger
 
 # Configure logging
 logging.basicConfig(
@@ -22,10 +30,31 @@ logging.getLogger('sqlalchemy.engine.Engine').setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared resources on startup and release them on shutdown"""
+    await http_client.start()
+    if job_queue.enabled:
+        await job_worker_pool.start()
+    try:
+        yield
+    finally:
+        # Release running jobs first so another process can pick them up
+        await job_worker_pool.stop()
+        await firefly_job_poller.stop()
+        # Write provider calls still buffered in the ledger
+        await provider_ledger.stop()
+        await http_client.close()
+        # Joining the pool workers blocks; keep it off the event loop
+        await asyncio.to_thread(image_processor.shutdown)
+
+
 app = FastAPI(
     title="Social Media Marketing Dashboard API",
     description="API for managing product briefs, assets, creative ideas, and social media content generation",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware - allow frontend on port 3001
@@ -89,6 +118,8 @@ app.include_router(ideas.router)
 app.include_router(creatives.router)
 app.include_router(approvals.router)
 app.include_router(settings.router)
+app.include_router(metrics.router)
+app.include_router(jobs.router)
 
 # Mount static file directories for serving uploaded files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -6,5 +6,8 @@ from .asset import Asset
 from .idea import Idea
 from .creative import Creative
 from .approval import Approval
+from .translation import Translation
+from .job import Job, JobEvent
+from .provider_call import ProviderCall
 
-__all__ = ["Brief", "Asset", "Idea", "Creative", "Approval"]
+__all__ = ["Brief", "Asset", "Idea", "Creative", "Approval", "Translation", "Job", "JobEvent", "ProviderCall"]
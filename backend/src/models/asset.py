@@ -24,6 +24,7 @@ class Asset(Base):
     brand_colors = Column(JSONB, nullable=True)
     auto_generated = Column(Boolean, default=False, nullable=False)
     brief_content = Column(String, nullable=True)  # Store brief content for regeneration
+    thumbnails = Column(JSONB, nullable=True)  # {"256": path, "512": path}
     created_at = Column(TIMESTAMP(timezone=True), default=datetime.utcnow)
     
     # Table constraints
@@ -1,8 +1,8 @@
 """
 SQLAlchemy model for Creative entity.
 """
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, CheckConstraint
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, BigInteger, DateTime, ForeignKey, CheckConstraint
+from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
 from datetime import datetime
@@ -22,6 +22,11 @@ class Creative(Base):
     firefly_job_id = Column(String, nullable=True)
     aspect_ratio = Column(String(10), nullable=False, default="1:1")
     generation_count = Column(Integer, default=1, nullable=False)
+    # Downscaled AVIF/WebP/JPEG copies: [{format, width, height, file_path, file_size, mime_type}]
+    renditions = Column(JSONB, nullable=True)
+    thumbnails = Column(JSONB, nullable=True)  # {"256": path, "512": path}
+    # 64-bit dHash (signed) for near-duplicate detection (compared in Python, not indexed)
+    perceptual_hash = Column(BigInteger, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
@@ -0,0 +1,68 @@
+"""
+SQLAlchemy models for the persistent background job queue.
+"""
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, CheckConstraint, Index
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import relationship
+import uuid
+from datetime import datetime
+
+from ..db import Base
+
+
+class Job(Base):
+    """Queued generation work (execute brief, generate/regenerate creative, regenerate asset)"""
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="queued")
+    payload = Column(JSONB, nullable=False, default=dict)
+    result = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    # HTTP status of the failure (e.g. a provider's 429), for callers waiting on the job
+    error_status = Column(Integer, nullable=True)
+    priority = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Lease held by the worker running the job; renewed by heartbeats
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Relationships
+    events = relationship("JobEvent", back_populates="job", cascade="all, delete-orphan", order_by="JobEvent.id")
+
+    # Table constraints
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')",
+            name='check_job_status'
+        ),
+        Index('ix_jobs_claim', 'status', 'priority', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f"<Job(id={self.id}, job_type={self.job_type}, status={self.status})>"
+
+
+class JobEvent(Base):
+    """Progress event emitted by a running job; SSE subscribers replay these in id order"""
+    __tablename__ = "job_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    event_type = Column(String(50), nullable=False)
+    data = Column(JSONB, nullable=False, default=dict)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Relationships
+    job = relationship("Job", back_populates="events")
+
+    def __repr__(self):
+        return f"<JobEvent(id={self.id}, job_id={self.job_id}, event_type={self.event_type})>"
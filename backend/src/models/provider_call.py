@@ -0,0 +1,49 @@
+"""
+SQLAlchemy model for the append-only provider call ledger.
+"""
+from sqlalchemy import Column, String, Text, Integer, BigInteger, Float, DateTime, Index
+from datetime import datetime
+
+from ..db import Base
+
+
+class ProviderCall(Base):
+    """One LLM or image provider call: outcome, timing phases and usage (rows are never updated)"""
+    __tablename__ = "provider_calls"
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    kind = Column(String(10), nullable=False)  # llm | image
+    provider = Column(String(50), nullable=False)
+    model = Column(String(100), nullable=True)
+    # success | error | timeout | rate_limited | unavailable | cancelled | mock | cache_hit
+    status = Column(String(20), nullable=False)
+    http_status = Column(Integer, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    # Scheduling flow (e.g. one brief) and lane the call ran in
+    flow = Column(String(100), nullable=True)
+    lane = Column(String(20), nullable=True)
+    # Phase durations in milliseconds; NULL when the phase did not happen
+    queue_ms = Column(Float, nullable=True)
+    connect_ms = Column(Float, nullable=True)
+    ttfb_ms = Column(Float, nullable=True)
+    download_ms = Column(Float, nullable=True)
+    overlay_ms = Column(Float, nullable=True)
+    total_ms = Column(Float, nullable=True)
+    request_bytes = Column(BigInteger, nullable=True)
+    response_bytes = Column(BigInteger, nullable=True)
+    image_bytes = Column(BigInteger, nullable=True)
+    images = Column(Integer, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+
+    # Table constraints
+    __table_args__ = (
+        Index('ix_provider_calls_created_at', 'created_at'),
+        Index('ix_provider_calls_provider_day', 'kind', 'provider', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ProviderCall(id={self.id}, provider={self.provider}, status={self.status})>"
@@ -0,0 +1,29 @@
+"""
+SQLAlchemy model for Translation entity (persistent campaign-message translation cache).
+"""
+from sqlalchemy import Column, String, Text, DateTime, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID
+import uuid
+from datetime import datetime
+
+from ..db import Base
+
+
+class Translation(Base):
+    """Cached translation of a source message into a target language"""
+    __tablename__ = "translations"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    source_text = Column(Text, nullable=False)
+    target_language = Column(String(10), nullable=False)
+    translated_text = Column(Text, nullable=False)
+    backend = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Table constraints
+    __table_args__ = (
+        UniqueConstraint('source_text', 'target_language', name='uq_translations_source_target'),
+    )
+    
+    def __repr__(self):
+        return f"<Translation(id={self.id}, target_language={self.target_language})>"
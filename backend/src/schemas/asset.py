@@ -2,7 +2,7 @@
 Pydantic schemas for Asset entity.
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import uuid as uuid_pkg
 
@@ -18,6 +18,7 @@ class AssetResponse(BaseModel):
     brand_colors: Optional[List[str]] = None
     auto_generated: bool = False
     brief_content: Optional[str] = None
+    thumbnails: Optional[Dict[str, str]] = None
     created_at: datetime
     
     class Config:
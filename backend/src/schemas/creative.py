@@ -2,13 +2,23 @@
 Pydantic schemas for Creative entity.
 """
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 import uuid
 
 from .approval import ApprovalResponse
 
 
+class CreativeRendition(BaseModel):
+    """A downscaled copy of a creative in one format"""
+    format: str
+    width: int
+    height: int
+    file_path: str
+    file_size: int
+    mime_type: str
+
+
 class CreativeResponse(BaseModel):
     """Response schema for Creative"""
     id: uuid.UUID
@@ -19,6 +29,8 @@ class CreativeResponse(BaseModel):
     firefly_job_id: Optional[str]
     aspect_ratio: str
     generation_count: int
+    renditions: Optional[List[CreativeRendition]] = None
+    thumbnails: Optional[Dict[str, str]] = None
     created_at: datetime
     updated_at: datetime
     
@@ -33,6 +45,8 @@ class CreativeWithApproval(CreativeResponse):
     demographic: Optional[str] = None
     brand: Optional[str] = None
     product_name: Optional[str] = None
+    # Earlier creative of the same idea and aspect ratio this one nearly duplicates
+    duplicate_of: Optional[uuid.UUID] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,29 @@
+"""
+Pydantic schemas for background jobs.
+"""
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from datetime import datetime
+import uuid as uuid_pkg
+
+
+class JobResponse(BaseModel):
+    """Schema for job status responses"""
+    id: uuid_pkg.UUID
+    job_type: str
+    status: str
+    payload: Dict[str, Any]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+    priority: int
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
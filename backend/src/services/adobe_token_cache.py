@@ -0,0 +1,119 @@
+"""
+Adobe IMS access-token cache with expiry-aware refresh and single-flight fetching.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from .http_client import http_client
+
+
+class _CachedToken:
+    """Access token plus the monotonic time at which it expires"""
+
+    def __init__(self, access_token: str, expires_at: float):
+        self.access_token = access_token
+        self.expires_at = expires_at
+
+
+# (client_id, sha256 of client_secret): a rotated secret misses in every
+# process, including workers the settings change never reached
+CacheKey = Tuple[str, str]
+
+
+def _cache_key(client_id: str, client_secret: str) -> CacheKey:
+    return client_id, hashlib.sha256((client_secret or "").encode("utf-8")).hexdigest()
+
+
+class AdobeTokenCache:
+    """
+    Caches Adobe IMS client-credentials tokens per client_id and secret.
+
+    Tokens are refreshed ahead of expiry, and concurrent callers that miss
+    the cache share one in-flight IMS request instead of each posting their own.
+    """
+
+    def __init__(self):
+        self.token_url = os.getenv("ADOBE_IMS_TOKEN_URL", "https://ims-na1.adobelogin.com/ims/token/v3")
+        self.scope = "openid,AdobeID,session,additional_info,read_organizations,firefly_api,ff_apis"
+        # Refresh this many seconds before the token actually expires
+        self.refresh_margin = float(os.getenv("ADOBE_TOKEN_REFRESH_MARGIN", "300"))
+        self._tokens: Dict[CacheKey, _CachedToken] = {}
+        self._in_flight: Dict[CacheKey, asyncio.Task] = {}
+        # Bumped on invalidate so refreshes started earlier don't repopulate the cache
+        self._generation = 0
+        self.request_count = 0
+
+    async def get_token(self, client_id: str, client_secret: str) -> Optional[str]:
+        """Return a valid access token for client_id, fetching one if needed"""
+        key = _cache_key(client_id, client_secret)
+        cached = self._tokens.get(key)
+        if cached and time.monotonic() < cached.expires_at - self.refresh_margin:
+            return cached.access_token
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._refresh(client_id, client_secret))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._forget_in_flight(key, t))
+
+        # Shield so one cancelled caller doesn't cancel the refresh for everyone
+        return await asyncio.shield(task)
+
+    def invalidate(self, client_id: Optional[str] = None):
+        """Drop cached tokens for one client_id, or all of them"""
+        self._generation += 1
+        if client_id is None:
+            self._tokens.clear()
+            self._in_flight.clear()
+        else:
+            for cache in (self._tokens, self._in_flight):
+                for key in [key for key in cache if key[0] == client_id]:
+                    del cache[key]
+        print(f"🔑 Adobe token cache invalidated ({client_id or 'all clients'})")
+
+    def _forget_in_flight(self, key: CacheKey, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+    async def _refresh(self, client_id: str, client_secret: str) -> Optional[str]:
+        """Request a new token from Adobe IMS and cache it"""
+        generation = self._generation
+        print(f"Generating Adobe access token with client_id: {client_id}")
+        self.request_count += 1
+
+        try:
+            response = await http_client.client.post(
+                self.token_url,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                data={
+                    "grant_type": "client_credentials",
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                    "scope": self.scope
+                },
+                timeout=http_client.timeout(read=10.0)
+            )
+
+            print(f"Adobe IMS response status: {response.status_code}")
+
+            if response.status_code == 200:
+                data = response.json()
+                access_token = data.get("access_token")
+                expires_in = float(data.get("expires_in") or 0)
+                print(f"✅ Got access token, expires in {expires_in} seconds")
+                if access_token and generation == self._generation:
+                    self._tokens[_cache_key(client_id, client_secret)] = _CachedToken(access_token, time.monotonic() + expires_in)
+                return access_token
+            else:
+                print(f"❌ Adobe IMS error: {response.text}")
+                return None
+        except Exception as e:
+            print(f"❌ Error getting Adobe access token: {e}")
+            return None
+
+
+# Singleton instance
+adobe_token_cache = AdobeTokenCache()
@@ -7,6 +7,7 @@ from typing import List, Optional
 import uuid
 
 from ..models.asset import Asset
+from .file_handler import file_handler
 
 
 class AssetService:
@@ -49,7 +50,8 @@ class AssetService:
             file_size=file_size,
             brand_colors=brand_colors,
             auto_generated=auto_generated,
-            brief_content=brief_content
+            brief_content=brief_content,
+            thumbnails=file_handler.thumbnails_for(file_path)
         )
         
         db.add(asset)
@@ -0,0 +1,171 @@
+"""
+Incremental extraction of a base64 image field from a streamed JSON response.
+
+DALL-E (`b64_json`) and Freepik (`base64`) return the image as one huge JSON
+string. Instead of parsing the whole body and decoding a second full copy,
+the field is located in the byte stream and decoded chunk by chunk straight
+into a file, so memory stays at roughly one network chunk per request.
+"""
+import binascii
+import uuid
+from pathlib import Path
+from typing import BinaryIO, List
+
+import httpx
+from fastapi import HTTPException
+
+_WHITESPACE = b" \t\r\n"
+
+
+class Base64FieldWriter:
+    """
+    Feed JSON bytes in; the first `"<field>": "<base64>"` value is decoded into out.
+
+    Only the JSON escapes a base64 string can contain are handled: `\\/` and
+    escaped line breaks from MIME-style encoders.
+    """
+
+    SEEK_KEY, SEEK_COLON, SEEK_QUOTE, IN_VALUE, DONE = range(5)
+
+    def __init__(self, field: str, out):
+        self._marker = f'"{field}"'.encode()
+        self._out = out
+        self._state = self.SEEK_KEY
+        self._carry = b""
+        self._pending = bytearray()
+        self.decoded = 0
+        self.head = b""
+
+    @property
+    def done(self) -> bool:
+        return self._state == self.DONE
+
+    @property
+    def partial(self) -> bool:
+        """True if a value was started but not finished"""
+        return self._state in (self.SEEK_QUOTE, self.IN_VALUE)
+
+    def restart(self, out):
+        """After done, decode the next occurrence of the field into out"""
+        self._out = out
+        self._state = self.SEEK_KEY
+        self._pending = bytearray()
+        self.decoded = 0
+        self.head = b""
+        self.feed(b"")
+
+    def feed(self, chunk: bytes):
+        data = self._carry + chunk
+        self._carry = b""
+        while data and self._state != self.DONE:
+            if self._state == self.SEEK_KEY:
+                index = data.find(self._marker)
+                if index < 0:
+                    # Keep enough bytes to match a marker split across chunks
+                    self._carry = data[-(len(self._marker) - 1):]
+                    return
+                data = data[index + len(self._marker):]
+                self._state = self.SEEK_COLON
+            elif self._state in (self.SEEK_COLON, self.SEEK_QUOTE):
+                data = data.lstrip(_WHITESPACE)
+                if not data:
+                    return
+                expected = b":" if self._state == self.SEEK_COLON else b'"'
+                if data[:1] != expected:
+                    if self._state == self.SEEK_QUOTE:
+                        raise ValueError("base64 field is not a string")
+                    # The marker was a string value, not a key; keep looking
+                    self._state = self.SEEK_KEY
+                    continue
+                data = data[1:]
+                self._state += 1
+            else:
+                end = data.find(b'"')
+                segment = data if end < 0 else data[:end]
+                if segment.endswith(b"\\"):
+                    # Escape split across chunks: finish it with the next chunk
+                    self._carry, segment = segment[-1:], segment[:-1]
+                if b"\\" in segment:
+                    segment = segment.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+                self._pending += segment
+                self._flush(final=end >= 0)
+                if end < 0:
+                    return
+                self._state = self.DONE
+                # Keep the rest of the body for restart() (multi-output responses)
+                self._carry = data[end + 1:]
+                return
+
+    def _flush(self, final: bool = False):
+        usable = len(self._pending) if final else len(self._pending) - len(self._pending) % 4
+        if not usable:
+            return
+        decoded = binascii.a2b_base64(bytes(self._pending[:usable]))
+        del self._pending[:usable]
+        if len(self.head) < 12:
+            self.head += decoded[:12 - len(self.head)]
+        self._out.write(decoded)
+        self.decoded += len(decoded)
+
+
+async def stream_base64_field(response: httpx.Response, field: str, dest_dir: Path, chunk_size: int = 64 * 1024) -> Path:
+    """
+    Decode `field` from a streaming JSON response into a new file under dest_dir.
+
+    Raises:
+        HTTPException: 500 if the field is missing, malformed or truncated
+    """
+    return (await stream_base64_fields(response, field, dest_dir, limit=1, chunk_size=chunk_size))[0]
+
+
+async def stream_base64_fields(response: httpx.Response, field: str, dest_dir: Path, limit: int = 1,
+                               chunk_size: int = 64 * 1024) -> List[Path]:
+    """
+    Decode up to `limit` occurrences of `field` (e.g. one per output in `data`) into files.
+
+    Raises:
+        HTTPException: 500 if no value was found, or one is malformed or truncated
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    paths: List[Path] = []
+    f = None
+
+    def open_next() -> BinaryIO:
+        path = dest_dir / f"{uuid.uuid4().hex}.download"
+        paths.append(path)
+        return open(path, "wb")
+
+    try:
+        f = open_next()
+        writer = Base64FieldWriter(field, f)
+        async for chunk in response.aiter_bytes(chunk_size):
+            writer.feed(chunk)
+            while writer.done and len(paths) < limit:
+                f.close()
+                f = open_next()
+                writer.restart(f)
+            if writer.done:
+                break
+        f.close()
+        if writer.partial:
+            raise HTTPException(status_code=500, detail=f"Response did not contain a complete '{field}' image")
+        if not writer.done:
+            # The last file was opened for a value that never came
+            paths.pop().unlink(missing_ok=True)
+        if not paths:
+            raise HTTPException(status_code=500, detail=f"Response did not contain a complete '{field}' image")
+        print(f"✅ Decoded {len(paths)} base64 '{field}' image(s)")
+        return paths
+    except (ValueError, binascii.Error) as e:
+        _discard(f, paths)
+        raise HTTPException(status_code=500, detail=f"Malformed base64 '{field}' in response: {e}")
+    except BaseException:
+        _discard(f, paths)
+        raise
+
+
+def _discard(f, paths: List[Path]):
+    if f is not None:
+        f.close()
+    for path in paths:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,134 @@
+"""
+Brand-kit cache: the active brand asset's colors and its logo decoded and
+pre-scaled once per output size, reused across every creative.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .asset_service import asset_service
+from .image_processor import image_processor, prepare_logo
+
+# (width, height, raw RGB bytes) of a logo already flattened onto white
+PreparedLogo = Tuple[int, int, bytes]
+
+
+class BrandKit:
+    """Snapshot of a brand asset, keyed by (asset_id, file mtime)"""
+
+    def __init__(self, asset_id: str, file_path: str, mtime: float, brand_colors):
+        self.asset_id = asset_id
+        self.file_path = file_path
+        self.mtime = mtime
+        self.brand_colors = brand_colors
+
+    @property
+    def key(self) -> Tuple[str, float]:
+        return self.asset_id, self.mtime
+
+
+def _mtime(file_path: Optional[str]) -> Optional[float]:
+    try:
+        return os.stat(file_path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+
+class BrandKitCache:
+    """
+    Caches the active brand kit and its prepared logos.
+
+    Invalidated explicitly when assets are uploaded, regenerated or deleted;
+    a changed file mtime also produces a fresh entry. Changes made by another
+    process (a worker, another API replica) are picked up by re-reading the
+    brand asset once the kit is BRAND_KIT_TTL_SECONDS old.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("BRAND_KIT_TTL_SECONDS", "30"))
+        self._current: Optional[BrandKit] = None
+        self._current_loaded = False
+        self._loaded_at = 0.0
+        # Logos are keyed by (file_path, mtime, max_size); file_path is unique per asset
+        self._logos: Dict[Tuple[str, float, int], Optional[PreparedLogo]] = {}
+        self._in_flight: Dict[Tuple[str, float, int], asyncio.Task] = {}
+        self.logo_decodes = 0
+
+    def get_current(self, db: Session) -> Optional[BrandKit]:
+        """Active brand kit (first brand asset), querying the DB after invalidation or the TTL"""
+        if self._current_loaded and time.monotonic() - self._loaded_at >= self.ttl:
+            self._current_loaded = False
+        if self._current_loaded and self._current is not None:
+            # Re-key if the logo file was replaced in place
+            mtime = _mtime(self._current.file_path)
+            if mtime is not None and mtime != self._current.mtime:
+                self._current = BrandKit(
+                    self._current.asset_id, self._current.file_path, mtime, self._current.brand_colors
+                )
+            return self._current
+        if self._current_loaded:
+            return None
+
+        brand_assets = asset_service.list_assets(db, asset_type="brand", limit=1)
+        if brand_assets:
+            asset = brand_assets[0]
+            kit = BrandKit(
+                str(asset.id), asset.file_path, _mtime(asset.file_path) or 0.0, asset.brand_colors
+            )
+            current = self._current
+            # Keep the existing snapshot when nothing changed
+            if current is None or (current.key, current.file_path, current.brand_colors) != (
+                kit.key, kit.file_path, kit.brand_colors
+            ):
+                self._current = kit
+        else:
+            self._current = None
+        self._current_loaded = True
+        self._loaded_at = time.monotonic()
+        return self._current
+
+    async def get_logo(self, file_path: Optional[str], max_size: int) -> Optional[PreparedLogo]:
+        """Decoded logo thumbnail for file_path, decoded/resized at most once per size"""
+        mtime = _mtime(file_path)
+        if mtime is None:
+            return None
+
+        key = (file_path, mtime, max_size)
+        if key in self._logos:
+            return self._logos[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._prepare(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _prepare(self, key: Tuple[str, float, int]) -> Optional[PreparedLogo]:
+        file_path, _, max_size = key
+        self.logo_decodes += 1
+        try:
+            logo = await image_processor.run(prepare_logo, file_path, max_size)
+        except Exception as e:
+            # Not cached: a transient read error or a logo fixed in place is retried next time
+            print(f"⚠️ Failed to prepare logo {file_path}: {e}")
+            return None
+        # Drop older versions of this file before caching the new one
+        for stale in [k for k in self._logos if k[0] == file_path and k[1] != key[1]]:
+            del self._logos[stale]
+        self._logos[key] = logo
+        return logo
+
+    def invalidate(self):
+        """Forget the active kit and all prepared logos (asset uploaded/regenerated/deleted)"""
+        self._current = None
+        self._current_loaded = False
+        self._logos.clear()
+        self._in_flight.clear()
+
+
+# Singleton instance
+brand_kit_cache = BrandKitCache()
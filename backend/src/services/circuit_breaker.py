@@ -0,0 +1,104 @@
+"""
+Per-provider circuit breaker: stop calling an image provider that keeps failing,
+then let a single trial request through after a cool-down.
+"""
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+
+
+class ProviderUnavailableError(HTTPException):
+    """Raised without calling the provider while its breaker is open"""
+
+    def __init__(self, provider: str, retry_in: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Image provider {provider} is unavailable (circuit open), retry in {retry_in:.0f}s"
+        )
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """
+    closed -> open after failure_threshold consecutive failures;
+    open -> half_open once recovery_timeout has passed, allowing one trial request;
+    half_open -> closed on success, back to open on failure.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._trial_started = 0.0
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until the next trial request is allowed"""
+        if self._state == self.OPEN:
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+        if self._state == self.HALF_OPEN:
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._trial_started))
+        return 0.0
+
+    def allow_request(self) -> bool:
+        """True if a request may be sent now (counts a rejection otherwise)"""
+        now = time.monotonic()
+        if self._state == self.CLOSED:
+            return True
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_started = now
+            return True
+        if self._state == self.HALF_OPEN and now - self._trial_started >= self.recovery_timeout:
+            # The previous trial never reported back; allow another one
+            self._trial_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._state = self.CLOSED
+
+    def record_failure(self, error: Optional[str] = None):
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        self.last_error = error
+        if self._state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+                print(f"🔌 Circuit opened for {self.name} after {self.consecutive_failures} failure(s)")
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+
+    def reset(self):
+        self.consecutive_failures = 0
+        self._state = self.CLOSED
+
+    def stats(self) -> dict:
+        return {
+            "state": self._state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "retry_in_seconds": round(self.retry_in(), 3),
+            "total_failures": self.total_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "last_error": self.last_error
+        }
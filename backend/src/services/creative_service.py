@@ -3,13 +3,16 @@ CRUD service for Creative entity with regeneration logic.
 """
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime
 
 from ..models.creative import Creative
 from ..models.approval import Approval
 from ..models.idea import Idea
+from .file_handler import file_handler
+from .perceptual_hash import perceptual_hash_service
+from .rendition_service import rendition_service
 
 
 class CreativeService:
@@ -23,7 +26,8 @@ class CreativeService:
         mime_type: str,
         file_size: int,
         aspect_ratio: str = "1:1",
-        firefly_job_id: Optional[str] = None
+        firefly_job_id: Optional[str] = None,
+        perceptual_hash: Optional[int] = None
     ) -> Creative:
         """
         Create a new creative and its associated approval record.
@@ -35,6 +39,7 @@ class CreativeService:
             mime_type: MIME type of image
             file_size: File size in bytes
             firefly_job_id: Optional Firefly job ID
+            perceptual_hash: Optional dHash of the image (near-duplicate detection)
         
         Returns:
             Created Creative instance with approval relationship
@@ -46,7 +51,10 @@ class CreativeService:
             file_size=file_size,
             aspect_ratio=aspect_ratio,
             firefly_job_id=firefly_job_id,
-            generation_count=1
+            generation_count=1,
+            renditions=rendition_service.collect(file_path),
+            thumbnails=file_handler.thumbnails_for(file_path),
+            perceptual_hash=perceptual_hash
         )
         
         db.add(creative)
@@ -111,13 +119,41 @@ class CreativeService:
         
         return query.order_by(Creative.created_at.desc()).offset(skip).limit(limit).all()
     
+    def find_duplicates(self, db: Session, creatives: List[Creative]) -> Dict[uuid.UUID, uuid.UUID]:
+        """
+        Near-duplicates among the given creatives.
+        
+        Compares each creative's perceptual hash with the other creatives of the
+        same idea and aspect ratio, including ones not in the list. The hashes of
+        the listed ideas' creatives are loaded and indexed per call, so the cost
+        grows with those ideas' creatives, not with the whole table.
+        
+        Returns:
+            {creative id: id of the earliest creative it nearly duplicates}
+        """
+        idea_ids = {creative.idea_id for creative in creatives if creative.perceptual_hash is not None}
+        if not idea_ids:
+            return {}
+        rows = (
+            db.query(Creative.id, Creative.idea_id, Creative.aspect_ratio, Creative.perceptual_hash)
+            .filter(Creative.idea_id.in_(idea_ids), Creative.perceptual_hash.isnot(None))
+            .order_by(Creative.created_at, Creative.id)
+            .all()
+        )
+        duplicates = perceptual_hash_service.find_duplicates(
+            [((row.idea_id, row.aspect_ratio), row.id, row.perceptual_hash) for row in rows]
+        )
+        listed = {creative.id for creative in creatives}
+        return {creative_id: original for creative_id, original in duplicates.items() if creative_id in listed}
+    
     def regenerate_creative(
         self,
         db: Session,
         creative_id: uuid.UUID,
         new_file_path: str,
         new_file_size: int,
-        new_firefly_job_id: Optional[str] = None
+        new_firefly_job_id: Optional[str] = None,
+        new_perceptual_hash: Optional[int] = None
     ) -> Creative:
         """
         Regenerate creative with new image.
@@ -129,6 +165,7 @@ class CreativeService:
             new_file_path: New filesystem path
             new_file_size: New file size
             new_firefly_job_id: Optional new Firefly job ID
+            new_perceptual_hash: Optional dHash of the new image
         
         Returns:
             Updated Creative instance
@@ -142,6 +179,9 @@ class CreativeService:
         creative.file_path = new_file_path
         creative.file_size = new_file_size
         creative.firefly_job_id = new_firefly_job_id
+        creative.renditions = rendition_service.collect(new_file_path)
+        creative.thumbnails = file_handler.thumbnails_for(new_file_path)
+        creative.perceptual_hash = new_perceptual_hash
         creative.generation_count += 1
         creative.updated_at = datetime.utcnow()
         
@@ -1,12 +1,16 @@
 """
 File handling service for upload, validation, and deletion operations.
 """
+import errno
 import os
+import shutil
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional
 from fastapi import UploadFile, HTTPException
 
+from .image_processor import image_processor, write_thumbnails
+
 
 class FileHandler:
     """Handles file upload, validation, and deletion operations"""
@@ -25,6 +29,10 @@ class FileHandler:
             "image/jpeg": "jpg",
             "image/png": "png"
         }
+        
+        # Thumbnail box sizes (px) written next to uploaded and generated images
+        sizes = os.getenv("THUMBNAIL_SIZES", "256,512")
+        self.thumbnail_sizes = tuple(sorted({int(s) for s in sizes.split(",") if s.strip()}))
     
     async def save_upload_file(
         self,
@@ -93,12 +101,112 @@ class FileHandler:
         return file_path, original_filename, file_size, source_type
     
     async def save_brand_asset(self, file: UploadFile) -> tuple[str, str, int]:
-        """Save brand asset image (JPG or PNG)"""
-        return await self.save_upload_file(file, "brand_assets", self.allowed_image_types)
+        """Save brand asset image (JPG or PNG) and its thumbnails"""
+        saved = await self.save_upload_file(file, "brand_assets", self.allowed_image_types)
+        await self.create_thumbnails(saved[0])
+        return saved
     
     async def save_product_asset(self, file: UploadFile) -> tuple[str, str, int]:
-        """Save product asset image (JPG or PNG)"""
-        return await self.save_upload_file(file, "product_assets", self.allowed_image_types)
+        """Save product asset image (JPG or PNG) and its thumbnails"""
+        saved = await self.save_upload_file(file, "product_assets", self.allowed_image_types)
+        await self.create_thumbnails(saved[0])
+        return saved
+    
+    def thumbnail_path(self, file_path: str, size: int) -> Path:
+        """thumbnails/<stem>_<size><ext> next to the original (PNG stays PNG for transparency)"""
+        path = Path(file_path)
+        extension = ".png" if path.suffix.lower() == ".png" else ".jpg"
+        return path.parent / "thumbnails" / f"{path.stem}_{size}{extension}"
+    
+    async def create_thumbnails(self, file_path: str) -> Optional[Dict[str, str]]:
+        """
+        Write the thumbnails of an image in the image process pool.
+        
+        Returns:
+            {size: thumbnail path}, or None if the image could not be read
+        """
+        if not self.thumbnail_sizes:
+            return None
+        targets = {size: str(self.thumbnail_path(file_path, size)) for size in self.thumbnail_sizes}
+        try:
+            await image_processor.run(write_thumbnails, str(file_path), targets)
+        except Exception as e:
+            print(f"⚠️  Could not create thumbnails for {file_path}: {e}")
+            self.delete_thumbnails(file_path)
+            return None
+        return self.thumbnails_for(file_path)
+    
+    def thumbnails_for(self, file_path: str) -> Optional[Dict[str, str]]:
+        """Existing thumbnails of a file as {size: path} (None when there are none)"""
+        thumbnails = {}
+        for size in self.thumbnail_sizes:
+            path = self.thumbnail_path(file_path, size)
+            if path.is_file():
+                thumbnails[str(size)] = str(path)
+        return thumbnails or None
+    
+    def delete_thumbnails(self, file_path: str):
+        """Remove a file's thumbnails"""
+        for size in self.thumbnail_sizes:
+            self.thumbnail_path(file_path, size).unlink(missing_ok=True)
+    
+    def write_bytes_atomic(self, file_path, content: bytes) -> int:
+        """
+        Write bytes so readers never see a partial file.
+        
+        Writes to a temporary name in the same directory, then renames it into
+        place. The temporary file is removed if anything fails.
+        
+        Returns:
+            Number of bytes written
+        """
+        path = Path(file_path)
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return len(content)
+    
+    def move_atomic(self, source_path, file_path) -> int:
+        """
+        Move a finished file (e.g. a streamed download) into place.
+        
+        Falls back to an atomic copy plus unlink when the source is on another
+        filesystem (e.g. a download dir on a different volume).
+        
+        Returns:
+            Size of the file in bytes
+        """
+        size = os.path.getsize(source_path)
+        try:
+            os.replace(source_path, file_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            size = self.copy_file_atomic(source_path, file_path)
+            Path(source_path).unlink(missing_ok=True)
+        return size
+    
+    def copy_file_atomic(self, source_path, file_path) -> int:
+        """
+        Copy a file so readers never see a partial copy.
+        
+        Returns:
+            Number of bytes copied
+        """
+        path = Path(file_path)
+        temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+        return os.path.getsize(path)
     
     def delete_file(self, file_path: str) -> bool:
         """
@@ -113,6 +221,7 @@ class FileHandler:
         try:
             print(f"🗑️  Attempting to delete file: {file_path}")
             path = Path(file_path)
+            self.delete_thumbnails(file_path)
             if path.exists():
                 path.unlink()
                 print(f"✅ File deleted successfully: {file_path}")
@@ -0,0 +1,211 @@
+"""
+Shared poller for asynchronous Firefly v3 generation jobs.
+
+Jobs submitted to `generate-async` are polled from a single background task
+with per-job adaptive intervals, so N outstanding generations cost one loop
+and a few pooled keep-alive connections instead of N long-held requests.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from .http_client import http_client
+from .provider_limiter import parse_retry_after
+
+
+class _Job:
+    """Polling state for one outstanding job"""
+
+    def __init__(self, job_id: str, status_url: str, headers: dict, future: asyncio.Future,
+                 interval: float, deadline: float):
+        self.job_id = job_id
+        self.status_url = status_url
+        self.headers = headers
+        self.future = future
+        self.interval = interval
+        self.next_poll = time.monotonic() + interval
+        self.deadline = deadline
+        self.polls = 0
+        # Status request in flight, if any
+        self.poll_task: Optional[asyncio.Task] = None
+
+
+class FireflyJobPoller:
+    """
+    Polls Firefly job status URLs until each job succeeds, fails or times out.
+
+    Each job starts at FIREFLY_POLL_INITIAL_INTERVAL and backs off by
+    FIREFLY_POLL_BACKOFF up to FIREFLY_POLL_MAX_INTERVAL; a Retry-After on a
+    status response overrides the next interval. Each status request runs as its
+    own task, so a slow one never delays the other jobs' polls.
+    """
+
+    def __init__(self):
+        self.initial_interval = float(os.getenv("FIREFLY_POLL_INITIAL_INTERVAL", "1.0"))
+        self.max_interval = float(os.getenv("FIREFLY_POLL_MAX_INTERVAL", "10"))
+        self.backoff = float(os.getenv("FIREFLY_POLL_BACKOFF", "1.5"))
+        self.job_timeout = float(os.getenv("FIREFLY_JOB_TIMEOUT", "300"))
+        self._jobs: Dict[str, _Job] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.polls = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.restarts = 0
+
+    async def wait(self, job_id: str, status_url: str, headers: dict) -> dict:
+        """Register a submitted job and wait for its result payload"""
+        future = asyncio.get_running_loop().create_future()
+        self._jobs[job_id] = _Job(
+            job_id, status_url, headers, future,
+            interval=self.initial_interval,
+            deadline=time.monotonic() + self.job_timeout
+        )
+        self._ensure_running()
+        try:
+            return await future
+        finally:
+            self._jobs.pop(job_id, None)
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Event and task are bound to the loop that created them
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._on_exit)
+        else:
+            self._wakeup.set()
+
+    def _on_exit(self, task: asyncio.Task):
+        # Restart a loop that died, so outstanding jobs are not left waiting forever
+        if task.cancelled() or task.exception() is None:
+            return
+        self.restarts += 1
+        print(f"⚠️ Firefly job poller stopped ({task.exception()!r}), restarting")
+        if self._jobs and task is self._task:
+            self._ensure_running()
+
+    async def _run(self):
+        while self._jobs:
+            now = time.monotonic()
+            waiting = [job for job in list(self._jobs.values()) if not job.future.done() and job.poll_task is None]
+            due = [job for job in waiting if job.next_poll <= now]
+            for job in due:
+                job.poll_task = asyncio.create_task(self._poll_job(job))
+            if due:
+                continue
+
+            if not waiting and not any(job.poll_task for job in self._jobs.values()):
+                # Only cancelled waiters left; they remove themselves
+                await asyncio.sleep(0)
+                continue
+            self._wakeup.clear()
+            # Sleep until the next poll is due or a status request finishes
+            timeout = max(0.0, min(job.next_poll for job in waiting) - now) if waiting else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll_job(self, job: _Job):
+        try:
+            await self._poll(job)
+        except Exception as e:
+            # Whatever went wrong belongs to this job alone
+            print(f"❌ Polling Firefly job {job.job_id} failed: {e!r}")
+            self._fail(job, 502, f"Firefly job {job.job_id} status check failed: {e}")
+        finally:
+            job.poll_task = None
+            self._wakeup.set()
+
+    def _reschedule(self, job: _Job, delay: Optional[float] = None):
+        if delay is None:
+            delay = job.interval
+            job.interval = min(self.max_interval, job.interval * self.backoff)
+        job.next_poll = time.monotonic() + delay
+
+    def _fail(self, job: _Job, status_code: int, detail: str):
+        self.failed += 1
+        if not job.future.done():
+            job.future.set_exception(HTTPException(status_code=status_code, detail=detail))
+
+    async def _poll(self, job: _Job):
+        if time.monotonic() > job.deadline:
+            self._fail(job, 504, f"Firefly job {job.job_id} did not finish within {self.job_timeout:.0f}s")
+            return
+
+        try:
+            response = await http_client.client.get(
+                job.status_url, headers=job.headers, timeout=http_client.timeout(read=30.0)
+            )
+        except httpx.TransportError as e:
+            print(f"⚠️ Polling Firefly job {job.job_id} failed ({type(e).__name__}), will retry")
+            self._reschedule(job)
+            return
+
+        self.polls += 1
+        job.polls += 1
+        if response.status_code == 429 or response.status_code >= 500:
+            self._reschedule(job, parse_retry_after(response.headers.get("Retry-After")))
+            return
+        if response.status_code >= 400:
+            self._fail(job, 502, f"Firefly job {job.job_id} status check failed: HTTP {response.status_code}")
+            return
+
+        try:
+            data = response.json()
+        except ValueError:  # json.JSONDecodeError and bad encodings
+            data = None
+        if not isinstance(data, dict):
+            # Fail just this job; the loop keeps polling the others
+            self._fail(job, 502, f"Firefly job {job.job_id} status check returned an invalid response")
+            return
+        status = str(data.get("status", "")).lower()
+        if status == "succeeded":
+            self.succeeded += 1
+            print(f"✅ Firefly job {job.job_id} succeeded after {job.polls} poll(s)")
+            if not job.future.done():
+                job.future.set_result(data.get("result", data))
+        elif status in ("failed", "canceled", "cancelled"):
+            error = data.get("error") or data.get("message") or status
+            self._fail(job, 502, f"Firefly job {job.job_id} {status}: {error}")
+        else:
+            self._reschedule(job, parse_retry_after(response.headers.get("Retry-After")))
+
+    def stats(self) -> dict:
+        return {
+            "outstanding": len(self._jobs),
+            "poller_running": self._task is not None and not self._task.done(),
+            "polls": self.polls,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "restarts": self.restarts
+        }
+
+    async def stop(self):
+        """Cancel the poller task (called from the FastAPI lifespan)"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for job in list(self._jobs.values()):
+            if job.poll_task is not None:
+                job.poll_task.cancel()
+            if not job.future.done():
+                job.future.cancel()
+        self._task = None
+
+
+# Singleton instance
+firefly_job_poller = FireflyJobPoller()
@@ -1,14 +1,68 @@
 """
 Adobe Firefly integration service for generating creative assets.
 """
+import asyncio
 import os
+import random
+import time
 import uuid
 import httpx
+from dataclasses import dataclass, replace
 from pathlib import Path
 from typing import Optional, List, Tuple
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
+from .adobe_token_cache import adobe_token_cache
+from .http_client import http_client
+from .image_processor import image_processor, compose_overlays, logo_max_size, reframe_to_jpeg
+from .brand_kit_cache import brand_kit_cache
+from .file_handler import file_handler
+from .generation_cache import generation_cache
+from .generation_scheduler import generation_scheduler
+from .image_providers import ImageProviderAdapter, ImageSource, provider_registry
+from .provider_ledger import CallRecord, provider_ledger
+from .provider_limiter import parse_retry_after
+from .rendition_service import rendition_service
+from .circuit_breaker import ProviderUnavailableError
+from .font_registry import font_registry
+from .translation_service import translation_service
+
+
+@dataclass(frozen=True)
+class GenerationContext:
+    """
+    Immutable per-call inputs for a single creative generation.
+    
+    Threaded through prompt building, the provider call and the overlay stage
+    so concurrent generations never share mutable state on the singleton.
+    """
+    idea_content: str = ""
+    campaign_message: str = ""
+    region: str = ""
+    demographic: str = ""
+    aspect_ratio: str = "1:1"
+    brand_colors: Tuple[str, ...] = ()
+    language_code: str = "en-US"
+    brand_name: Optional[str] = None
+    brand_logo_path: Optional[str] = None
+    # Campaign message in the target language, resolved before the overlay stage
+    translated_message: Optional[str] = None
+    # Base image is a master render to crop/pad to aspect_ratio before overlays
+    reframe_master: bool = False
+
+
+# Statuses worth retrying: rate limits and transient provider/gateway errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Credential headers, masked before request headers are logged
+SECRET_HEADERS = {"authorization", "x-api-key", "x-freepik-api-key"}
+
+
+def redact_headers(headers: dict) -> dict:
+    """Headers safe to log: credentials replaced with a placeholder"""
+    return {name: "<redacted>" if name.lower() in SECRET_HEADERS else value for name, value in headers.items()}
+
 
 class FireflyService:
     """Handles Adobe Firefly API integration for creative generation"""
@@ -18,11 +72,25 @@ class FireflyService:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.api_url = os.getenv("FIREFLY_API_URL", "https://firefly-api.adobe.io/v2/images/generate")
         self.timeout = 30.0
+        # Max aspect ratios generated in parallel for a single idea
+        self.generation_concurrency = max(1, int(os.getenv("FIREFLY_GENERATION_CONCURRENCY", "3")))
+        # Upper bound for candidate images per aspect ratio in variants mode
+        self.max_variants = max(1, int(os.getenv("CREATIVE_MAX_VARIANTS", "4")))
+        # Master + reframe: one provider render per idea, other ratios derived locally
+        self.reframe_mode = os.getenv("CREATIVE_REFRAME_MODE", "false").lower() == "true"
+        self.master_aspect_ratio = os.getenv("CREATIVE_MASTER_ASPECT_RATIO", "1:1")
+        self.master_size = int(os.getenv("CREATIVE_MASTER_SIZE", "2048"))
+        # Retries for timeouts and retryable statuses, with jittered exponential backoff
+        self.max_retries = max(0, int(os.getenv("IMAGE_PROVIDER_MAX_RETRIES", "3")))
+        self.retry_base_delay = float(os.getenv("IMAGE_PROVIDER_RETRY_BASE_DELAY", "1.0"))
+        self.retry_max_delay = float(os.getenv("IMAGE_PROVIDER_RETRY_MAX_DELAY", "30"))
+        # Serve a mock image when every provider fails (development only)
+        self.mock_on_failure = os.getenv("IMAGE_MOCK_ON_FAILURE", "false").lower() == "true"
         self.output_dir = Path("uploads/creatives")
         self.output_dir.mkdir(parents=True, exist_ok=True)
     
     async def _get_adobe_access_token(self, db: Session) -> Optional[str]:
-        """Generate Adobe access token from client credentials"""
+        """Get a (cached) Adobe access token from client credentials"""
         from .key_service import key_service
         
         client_id = key_service.get_value(db, "adobe_client_id")
@@ -32,35 +100,7 @@ class FireflyService:
             print("Missing Adobe client_id or client_secret")
             return None
         
-        print(f"Generating Adobe access token with client_id: {client_id}")
-        
-        try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.post(
-                    "https://ims-na1.adobelogin.com/ims/token/v3",
-                    headers={"Content-Type": "application/x-www-form-urlencoded"},
-                    data={
-                        "grant_type": "client_credentials",
-                        "client_id": client_id,
-                        "client_secret": client_secret,
-                        "scope": "openid,AdobeID,session,additional_info,read_organizations,firefly_api,ff_apis"
-                    }
-                )
-                
-                print(f"Adobe IMS response status: {response.status_code}")
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    access_token = data.get("access_token")
-                    expires_in = data.get("expires_in")
-                    print(f"✅ Got access token, expires in {expires_in} seconds")
-                    return access_token
-                else:
-                    print(f"❌ Adobe IMS error: {response.text}")
-                    return None
-        except Exception as e:
-            print(f"❌ Error getting Adobe access token: {e}")
-            return None
+        return await adobe_token_cache.get_token(client_id, client_secret)
     
     def _get_provider_config(self, db: Session):
         """Get image provider and API key from settings"""
@@ -78,17 +118,8 @@ class FireflyService:
             # e.g., if provider is "DALL-E", look up key="DALL-E" in keys table
             api_key = key_service.get_value(db, provider)
         
-        # Map provider to API URL
-        provider_configs = {
-            "Adobe Firefly": "https://firefly-api.adobe.io/v3/images/generate",
-            "Midjourney": "https://api.midjourney.com/v1/imagine",
-            "DALL-E": "https://api.openai.com/v1/images/generations",
-            "OpenAI": "https://api.openai.com/v1/images/generations",
-            "Stable Diffusion": "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image",
-            "Freepik": "https://api.freepik.com/v1/ai/text-to-image"
-        }
-        
-        api_url = provider_configs.get(provider, provider_configs["Adobe Firefly"])
+        # Each provider adapter knows its own endpoint
+        api_url = provider_registry.get(provider).api_url
         return api_key, api_url, provider
     
     async def generate_creative(
@@ -102,7 +133,8 @@ class FireflyService:
         brand_colors: Optional[List[str]] = None,
         language_code: str = "en-US",
         brand_name: str = None,
-        brand_logo_path: str = None
+        brand_logo_path: str = None,
+        use_cache: bool = True
     ) -> Tuple[str, str, int, Optional[str]]:
         """
         Generate creative asset using Adobe Firefly.
@@ -114,10 +146,60 @@ class FireflyService:
             demographic: Target demographic
             brand_colors: Optional list of brand colors (hex codes)
             brand_logo_path: Optional path to brand logo for compositing
+            use_cache: False bypasses the generation cache (explicit regenerate)
         
         Returns:
             Tuple of (file_path, mime_type, file_size, firefly_job_id)
         
+        Raises:
+            HTTPException: If generation fails
+        """
+        results = await self.generate_creative_variants(
+            db, idea_content, campaign_message, region, demographic, aspect_ratio,
+            brand_colors, language_code, brand_name, brand_logo_path,
+            use_cache=use_cache
+        )
+        return results[0]
+    
+    async def generate_creative_variants(
+        self,
+        db: Session,
+        idea_content: str,
+        campaign_message: str,
+        region: str,
+        demographic: str,
+        aspect_ratio: str = "1:1",
+        brand_colors: Optional[List[str]] = None,
+        language_code: str = "en-US",
+        brand_name: str = None,
+        brand_logo_path: str = None,
+        use_cache: bool = True,
+        variants: int = 1,
+        reframe_to: Tuple[str, ...] = ()
+    ) -> List[Tuple[str, str, int, Optional[str]]]:
+        """
+        Generate up to `variants` candidate creatives for one idea and aspect ratio.
+        
+        The provider is asked for several outputs per request (Firefly numVariations,
+        Freepik num_images), so the token fetch and request latency are paid once per
+        batch; overlays for the outputs run in parallel.
+        
+        With reframe_to, aspect_ratio is the master's ratio and one master render is
+        cropped/padded locally to each listed ratio instead (one result per ratio).
+        
+        Args:
+            idea_content: Creative idea text
+            campaign_message: Campaign message to include
+            region: Target region
+            demographic: Target demographic
+            brand_colors: Optional list of brand colors (hex codes)
+            brand_logo_path: Optional path to brand logo for compositing
+            use_cache: False bypasses the generation cache (explicit regenerate)
+        
+        Returns:
+            List of (file_path, mime_type, file_size, firefly_job_id), one per variant
+            (or per reframe_to ratio, in order)
+        
         Raises:
             HTTPException: If generation fails
         """
@@ -132,6 +214,7 @@ class FireflyService:
         print(f"API Key Present: {bool(api_key)}")
         print(f"API Key Length: {len(api_key) if api_key else 0}")
         print(f"Aspect Ratio: {aspect_ratio}")
+        print(f"Variants: {variants}")
         print(f"Region: {region}")
         print(f"Demographic: {demographic}")
         if api_key and len(api_key) > 50:
@@ -140,16 +223,21 @@ class FireflyService:
             print(f"API Key: {api_key}")
         print(f"{'='*80}\n")
         
-        # Build prompt for Firefly
-        prompt = self._build_firefly_prompt(
-            idea_content, campaign_message, region, demographic, brand_colors, language_code, brand_name
+        # Capture everything this request needs in an immutable context
+        context = GenerationContext(
+            idea_content=idea_content,
+            campaign_message=campaign_message,
+            region=region,
+            demographic=demographic,
+            aspect_ratio=aspect_ratio,
+            brand_colors=tuple(brand_colors or ()),
+            language_code=language_code,
+            brand_name=brand_name,
+            brand_logo_path=brand_logo_path
         )
         
-        # Store campaign message, language, and brand info for text overlay
-        self._temp_campaign_message = campaign_message
-        self._temp_language_code = language_code
-        self._temp_brand_name = brand_name
-        self._temp_brand_logo_path = brand_logo_path
+        # Build prompt for Firefly
+        prompt = self._build_firefly_prompt(context)
         
         # For Adobe Firefly, generate access token on-demand
         if provider == "Adobe Firefly" and api_key == "GENERATE_ON_DEMAND":
@@ -157,10 +245,12 @@ class FireflyService:
             api_key = await self._get_adobe_access_token(db)
             if not api_key:
                 print("❌ Using MOCK: Failed to generate Adobe access token")
-                file_path, file_size = self._create_mock_creative(prompt, aspect_ratio)
-                return file_path, "image/jpeg", file_size, None
+                return self._create_mock_variants(
+                    prompt, aspect_ratio, variants, reframe_to,
+                    provider=provider, reason="Adobe access token unavailable"
+                )
         
-        # Call Firefly API (mock if no API key or if API fails)
+        # Call the image API (mock if no API key is configured)
         if not api_key or api_key.strip() == "" or api_key == "your_firefly_api_key_here":
             # Mock creative generation for development
             print(f"\n{'='*80}")
@@ -170,21 +260,43 @@ class FireflyService:
             print(f"Reason: API key is empty or placeholder")
             print(f"Action: Generating mock creative image")
             print(f"{'='*80}\n")
-            file_path, file_size = self._create_mock_creative(prompt, aspect_ratio)
-            return file_path, "image/jpeg", file_size, None
+            return self._create_mock_variants(
+                prompt, aspect_ratio, variants, reframe_to,
+                provider=provider, reason="No API key configured"
+            )
         else:
             try:
                 print(f"🚀 Calling {provider} API...")
-                result = await self._call_firefly_api(
+                return await self._call_firefly_api_variants(
                     prompt, aspect_ratio, api_key, api_url, provider, db,
-                    campaign_message=self._temp_campaign_message,
-                    language_code=self._temp_language_code,
-                    brand_name=self._temp_brand_name,
-                    brand_logo_path=self._temp_brand_logo_path
+                    context=context,
+                    use_cache=use_cache,
+                    variants=variants,
+                    reframe_to=reframe_to
                 )
-                return result
             except Exception as e:
-                # Fall back to mock if API fails (403, invalid key, etc.)
+                print(f"❌ {provider} failed: {str(e) or type(e).__name__}")
+                
+                # Optionally fail over to a secondary provider while the primary is unhealthy
+                failover = await self._get_failover_config(db, provider)
+                if failover is not None:
+                    failover_key, failover_url, failover_provider = failover
+                    print(f"🔀 Failing over from {provider} to {failover_provider}...")
+                    try:
+                        return await self._call_firefly_api_variants(
+                            prompt, aspect_ratio, failover_key, failover_url, failover_provider, db,
+                            context=context,
+                            use_cache=use_cache,
+                            variants=variants,
+                            reframe_to=reframe_to
+                        )
+                    except Exception as failover_error:
+                        print(f"❌ Failover provider {failover_provider} failed: {str(failover_error) or type(failover_error).__name__}")
+                
+                if not self.mock_on_failure:
+                    raise
+                
+                # Development only: fall back to mock if every provider failed
                 print(f"\n{'='*80}")
                 print(f"❌ API CALL FAILED - FALLING BACK TO MOCK IMAGE")
                 print(f"{'='*80}")
@@ -194,258 +306,190 @@ class FireflyService:
                 print(f"Traceback:\n{traceback.format_exc()}")
                 print(f"Action: Generating mock creative image")
                 print(f"{'='*80}\n")
-                file_path, file_size = self._create_mock_creative(prompt, aspect_ratio)
-                return file_path, "image/jpeg", file_size, None
+                return self._create_mock_variants(
+                    prompt, aspect_ratio, variants, reframe_to,
+                    provider=provider, reason=f"Provider failed: {str(e) or type(e).__name__}"
+                )
     
-    def _build_firefly_prompt(
-        self, 
-        idea_content: str, 
-        campaign_message: str, 
-        region: str, 
-        demographic: str, 
+    async def generate_reframed_creatives(
+        self,
+        db: Session,
+        idea_content: str,
+        campaign_message: str,
+        region: str,
+        demographic: str,
+        aspect_ratios: List[str],
         brand_colors: Optional[List[str]] = None,
         language_code: str = "en-US",
-        brand_name: str = None
-    ) -> str:
+        brand_name: str = None,
+        brand_logo_path: str = None,
+        use_cache: bool = True
+    ) -> List[Tuple[str, str, int, Optional[str]]]:
+        """
+        Generate one master render and derive a creative per aspect ratio from it.
+        
+        The master is CREATIVE_MASTER_ASPECT_RATIO at CREATIVE_MASTER_SIZE on its long
+        side; each ratio is smart-cropped (or padded) locally before its overlays.
+        
+        Returns:
+            List of (file_path, mime_type, file_size, firefly_job_id), in aspect_ratios order
+        """
+        return await self.generate_creative_variants(
+            db, idea_content, campaign_message, region, demographic, self.master_aspect_ratio,
+            brand_colors, language_code, brand_name, brand_logo_path,
+            use_cache=use_cache,
+            reframe_to=tuple(aspect_ratios)
+        )
+    
+    async def _get_failover_config(self, db: Session, primary: str) -> Optional[Tuple[str, str, str]]:
+        """
+        Secondary provider (api_key, api_url, provider) from the image_provider_failover
+        setting or IMAGE_PROVIDER_FAILOVER, or None if unset or without credentials.
+        """
+        from .key_service import key_service
+        
+        provider = key_service.get_value(db, "image_provider_failover") or os.getenv("IMAGE_PROVIDER_FAILOVER")
+        if not provider or provider == primary:
+            return None
+        
+        if provider == "Adobe Firefly":
+            api_key = await self._get_adobe_access_token(db)
+        else:
+            api_key = key_service.get_value(db, provider)
+        if not api_key or not api_key.strip():
+            print(f"⚠️ Failover provider {provider} has no API key configured")
+            return None
+        
+        return api_key, provider_registry.get(provider).api_url, provider
+    
+    def _build_firefly_prompt(self, context: GenerationContext) -> str:
         """Build prompt for Firefly API with logo and text overlay requirements"""
         color_info = ""
-        if brand_colors:
-            color_info = f"\nUse brand colors: {', '.join(brand_colors)}"
+        if context.brand_colors:
+            color_info = f"\nUse brand colors: {', '.join(context.brand_colors)}"
         
         # Language for text overlay
-        language_instruction = f"\nText language: {language_code.split('-')[0].upper()}"
+        language_instruction = f"\nText language: {context.language_code.split('-')[0].upper()}"
         
         # Logo instruction
         logo_instruction = ""
-        if brand_name:
-            logo_instruction = f"\nInclude a professional logo in the corner with brand name '{brand_name}'"
+        if context.brand_name:
+            logo_instruction = f"\nInclude a professional logo in the corner with brand name '{context.brand_name}'"
         else:
             logo_instruction = "\nInclude a simple, elegant brand logo in the corner"
         
-        prompt = f"""Professional social media creative image: {idea_content}
+        prompt = f"""Professional social media creative image: {context.idea_content}
 
 REQUIRED TEXT OVERLAY:
-- Campaign message: "{campaign_message}"
+- Campaign message: "{context.campaign_message}"
 - Make the text prominent, readable, and professionally styled
 - Position text overlay strategically on the image{language_instruction}
 {logo_instruction}
-Target audience: {demographic} in {region}{color_info}
+Target audience: {context.demographic} in {context.region}{color_info}
 
 Style: High quality, professional marketing imagery with clear text overlay and branding elements."""
         
         return prompt
     
-    async def _call_firefly_api(self, prompt: str, aspect_ratio: str, api_key: str, api_url: str, provider: str, db: Session = None, campaign_message: str = None, language_code: str = "en-US", brand_name: str = None, brand_logo_path: str = None) -> Tuple[str, str, int, str]:
+    async def _call_firefly_api(self, prompt: str, aspect_ratio: str, api_key: str, api_url: str, provider: str, db: Session = None, context: Optional[GenerationContext] = None, use_cache: bool = True) -> Tuple[str, str, int, str]:
         """Call image generation API and add text overlays"""
-        from .key_service import key_service
+        results = await self._call_firefly_api_variants(
+            prompt, aspect_ratio, api_key, api_url, provider, db,
+            context=context,
+            use_cache=use_cache
+        )
+        return results[0]
+    
+    async def _call_firefly_api_variants(self, prompt: str, aspect_ratio: str, api_key: str, api_url: str, provider: str, db: Session = None, context: Optional[GenerationContext] = None, use_cache: bool = True, variants: int = 1, reframe_to: Tuple[str, ...] = ()) -> List[Tuple[str, str, int, Optional[str]]]:
+        """
+        Call image generation API for `variants` outputs and add text overlays to each.
+        
+        Variants are requested in batches of the adapter's max_variants. Outputs that
+        fail to download or overlay are dropped; raises only if none succeed.
+        With reframe_to, a single master render is reframed to every listed ratio and
+        any failure fails the whole set.
+        """
+        # Callers without a context (e.g. asset regeneration) get no overlays
+        if context is None:
+            context = GenerationContext(idea_content=prompt, aspect_ratio=aspect_ratio)
+        
+        adapter = provider_registry.get(provider)
         
         # Set headers based on provider
-        if provider == "Freepik":
-            headers = {
-                "x-freepik-api-key": api_key,
-                "Content-Type": "application/json"
-            }
-        elif provider == "Adobe Firefly":
-            # For Adobe Firefly, x-api-key should be the client_id, not the JWT
-            client_id = key_service.get_value(db, "adobe_client_id")
-            print(f"Using Adobe client_id for x-api-key: {client_id}")
-            headers = {
-                "Authorization": f"Bearer {api_key[:50]}...",
-                "Content-Type": "application/json",
-                "x-api-key": client_id if client_id else api_key
-            }
-        else:
-            # Default for other providers
-            headers = {
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json"
-            }
+        headers = adapter.build_headers(api_key, db)
         
-        print(f"Request headers: {headers}")
+        print(f"Request headers: {redact_headers(headers)}")
         
         # Determine dimensions based on aspect ratio
         dimensions = self._get_dimensions(aspect_ratio)
         
-        # Build payload based on provider
-        if provider in ["OpenAI", "DALL-E"]:
-            # OpenAI DALL-E format
-            size_map = {
-                "16:9": "1792x1024",  # DALL-E 3 landscape
-                "9:16": "1024x1792",  # DALL-E 3 portrait
-                "1:1": "1024x1024"    # DALL-E 3 square
-            }
-            payload = {
-                "model": "dall-e-3",
-                "prompt": prompt,
-                "n": 1,
-                "size": size_map.get(aspect_ratio, "1024x1024"),
-                "quality": "standard",
-                "response_format": "b64_json"  # Get base64 instead of URL to avoid Azure blob auth issues
-            }
-        elif provider == "Freepik":
-            # Freepik format
-            payload = {
-                "prompt": prompt,
-                "size": dimensions,
-                "contentClass": "photo"
-            }
-        else:
-            # Adobe Firefly and others
-            payload = {
-                "prompt": prompt,
-                "size": dimensions,
-                "contentClass": "photo",
-                "style": {
-                    "presets": ["professional", "vibrant"]
-                }
-            }
-        
+        images: List[Tuple[ImageSource, Optional[str]]] = []
+        # Provider calls are ledgered once their outputs' overlay time is known
+        calls = provider_ledger.hold()
         try:
-            print(f"Making POST request to: {api_url}")
-            print(f"Payload: {payload}")
-            
-            # Use longer timeout for base64 responses (DALL-E, Freepik)
-            # Base64 image data can be several MB and takes longer to transmit
-            timeout = 120.0 if provider in ["OpenAI", "DALL-E", "Freepik"] else self.timeout
-            print(f"Using timeout: {timeout}s")
-            
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(api_url, json=payload, headers=headers)
-                
-                print(f"Response status: {response.status_code}")
-                print(f"Response headers: {response.headers}")
-                
-                # Check for quota/rate limit errors BEFORE raising
-                if response.status_code == 429:
-                    print("\n" + "="*80)
-                    print("🚨 QUOTA/RATE LIMIT EXCEEDED 🚨")
-                    print("="*80)
-                    print(f"Provider: {provider}")
-                    print(f"Status: {response.status_code}")
-                    print(f"Response: {response.text}")
-                    print("="*80 + "\n")
-                    raise HTTPException(
-                        status_code=429,
-                        detail=f"Image API quota/rate limit exceeded for {provider}. Please wait or check your API limits."
+            # Translate once per context (cached/coalesced across ratios and ideas)
+            if context.campaign_message and context.translated_message is None:
+                context = replace(
+                    context,
+                    translated_message=await translation_service.translate(
+                        context.campaign_message, context.language_code
                     )
-                
-                if response.status_code == 403:
-                    print("\n" + "="*80)
-                    print("🚨 API ACCESS FORBIDDEN 🚨")
-                    print("="*80)
-                    print(f"Provider: {provider}")
-                    print(f"Status: {response.status_code}")
-                    print(f"Response: {response.text}")
-                    print("Possible reasons:")
-                    print("  - Invalid API key")
-                    print("  - Quota exceeded")
-                    print("  - Insufficient permissions")
-                    print("="*80 + "\n")
-                
-                if response.status_code >= 400:
-                    print("\n" + "="*80)
-                    print(f"🚨 IMAGE API ERROR: {response.status_code} 🚨")
-                    print("="*80)
-                    print(f"Provider: {provider}")
-                    print(f"URL: {api_url}")
-                    print(f"Status: {response.status_code}")
-                    print(f"Response: {response.text}")
-                    print("="*80 + "\n")
-                
-                response.raise_for_status()
-                
-                data = response.json()
-                print(f"Response data keys: {data.keys()}")
-                
-                # Handle different response formats
-                if provider == "Freepik":
-                    # Freepik returns base64 directly
-                    import base64
-                    job_id = None
-                    base64_data = data["data"][0]["base64"]
-                    image_content = base64.b64decode(base64_data)
-                    print(f"Decoded {len(image_content)} bytes from base64")
-                elif provider in ["OpenAI", "DALL-E"]:
-                    # OpenAI DALL-E returns base64 data directly
-                    import base64
-                    job_id = None
-                    base64_data = data["data"][0]["b64_json"]
-                    
-                    print(f"Decoding base64 image data...")
-                    
-                    image_content = base64.b64decode(base64_data)
-                    
-                    if len(image_content) == 0:
-                        print(f"❌ Decoded image is empty!")
-                        raise HTTPException(
-                            status_code=500,
-                            detail="Decoded image from DALL-E is empty"
-                        )
-                    
-                    print(f"✅ Decoded {len(image_content)} bytes from base64")
-                    
-                    # Verify it's a valid image format
-                    if not image_content.startswith(b'\xff\xd8\xff') and not image_content.startswith(b'\x89PNG'):
-                        print(f"❌ Decoded content is not a valid image!")
-                        print(f"Content preview: {image_content[:100]}")
-                        raise HTTPException(
-                            status_code=500,
-                            detail="Decoded content from DALL-E is not a valid image"
-                        )
-                else:
-                    # Adobe Firefly and others return URL in outputs
-                    job_id = data.get("id")
-                    image_url = data["outputs"][0]["image"]["url"]
-                    
-                    print(f"Downloading image from: {image_url}")
-                    
-                    # Download generated image
-                    image_response = await client.get(image_url)
-                    image_content = image_response.content
-                    
-                    print(f"Downloaded {len(image_content)} bytes")
-                
-                # Save initial image to temporary file
-                temp_filename = f"{uuid.uuid4()}_temp.jpg"
-                temp_file_path = self.output_dir / temp_filename
-                
-                with open(temp_file_path, "wb") as f:
-                    f.write(image_content)
-                
-                print(f"Saved base image to: {temp_file_path}")
-                
-                # Add text overlays (campaign message and brand logo text)
-                final_filename = f"{uuid.uuid4()}.jpg"
-                final_file_path = self.output_dir / final_filename
-                
-                dimensions = self._get_dimensions(aspect_ratio)
-                self._add_text_overlays(
-                    str(temp_file_path),
-                    str(final_file_path),
-                    campaign_message,
-                    language_code,
-                    brand_name,
-                    dimensions["width"],
-                    dimensions["height"],
-                    brand_logo_path
                 )
-                
-                # Delete temp file
-                temp_file_path.unlink()
-                
-                # Get final file size
-                final_file_size = final_file_path.stat().st_size
-                
-                print(f"\n{'='*80}")
-                print(f"✅ IMAGE GENERATION SUCCESS!")
-                print(f"{'='*80}")
-                print(f"Provider: {provider}")
+            
+            if reframe_to:
+                images.append(await self._get_base_image(
+                    adapter, provider, api_url, prompt, aspect_ratio,
+                    self._get_master_dimensions(aspect_ratio), headers, use_cache
+                ))
+                # Every ratio reads the same master; it is deleted once all are done
+                targets = [
+                    (images[0][0], replace(context, aspect_ratio=ratio, reframe_master=True), images[0][1])
+                    for ratio in reframe_to
+                ]
+            else:
+                if variants == 1:
+                    images.append(await self._get_base_image(
+                        adapter, provider, api_url, prompt, aspect_ratio, dimensions, headers, use_cache
+                    ))
+                else:
+                    images.extend(await self._get_base_image_variants(
+                        adapter, provider, api_url, prompt, aspect_ratio, dimensions, headers, variants
+                    ))
+                targets = [(image_content, context, job_id) for image_content, job_id in images]
+            
+            # Overlay every output in parallel (the image process pool bounds CPU use)
+            overlay_started = time.perf_counter()
+            finished = await asyncio.gather(
+                *(self._finalize_image(image_content, target_context) for image_content, target_context, _ in targets),
+                return_exceptions=True
+            )
+            calls.add_since("overlay", overlay_started)
+            errors = [outcome for outcome in finished if isinstance(outcome, BaseException)]
+            results = []
+            for (_, _, job_id), outcome in zip(targets, finished):
+                if isinstance(outcome, BaseException):
+                    print(f"⚠️ Dropping output after overlay failure: {str(outcome) or type(outcome).__name__}")
+                    continue
+                final_file_path, final_file_size = outcome
+                results.append((final_file_path, "image/jpeg", final_file_size, job_id))
+            if errors and (reframe_to or not results):
+                for final_file_path, _, _, _ in results:
+                    Path(final_file_path).unlink(missing_ok=True)
+                    file_handler.delete_thumbnails(final_file_path)
+                    rendition_service.delete(final_file_path)
+                raise errors[0]
+            
+            print(f"\n{'='*80}")
+            print(f"✅ IMAGE GENERATION SUCCESS!")
+            print(f"{'='*80}")
+            print(f"Provider: {provider}")
+            for final_file_path, _, final_file_size, job_id in results:
                 print(f"File Path: {final_file_path}")
                 print(f"File Size: {final_file_size} bytes")
                 print(f"Job ID: {job_id}")
-                print(f"{'='*80}\n")
-                
-                return str(final_file_path), "image/jpeg", final_file_size, job_id
+            print(f"{'='*80}\n")
+            
+            return results
         
         except httpx.HTTPError as e:
             print("\n" + "="*80)
@@ -464,6 +508,9 @@ Style: High quality, professional marketing imagery with clear text overlay and
                 status_code=500,
                 detail=f"Image API error ({provider}): {str(e)}"
             )
+        except HTTPException:
+            # Already describes the failure (e.g. 429 after exhausting retries)
+            raise
         except Exception as e:
             print("\n" + "="*80)
             print("🚨 UNEXPECTED IMAGE GENERATION ERROR 🚨")
@@ -478,167 +525,286 @@ Style: High quality, professional marketing imagery with clear text overlay and
                 status_code=500,
                 detail=f"Unexpected error in image generation ({provider}): {str(e)}"
             )
+        finally:
+            # Downloaded base images are temporary unless moved into place
+            self._discard_images([image_content for image_content, _ in images])
+            provider_ledger.release(calls)
     
-    def _add_text_overlays(
-        self,
-        input_path: str,
-        output_path: str,
-        campaign_message: str,
-        language_code: str,
-        brand_name: str,
-        width: int,
-        height: int,
-        brand_logo_path: str = None
-    ):
-        """Add text overlays and brand logo to the generated image"""
-        from PIL import Image, ImageDraw, ImageFont
-        import textwrap
+    async def _get_base_image(self, adapter: ImageProviderAdapter, provider: str, api_url: str, prompt: str, aspect_ratio: str, dimensions: dict, headers: dict, use_cache: bool) -> Tuple[ImageSource, Optional[str]]:
+        """One base image, from the generation cache when possible"""
+        payload = adapter.build_payload(prompt, aspect_ratio, dimensions)
+        
+        # Identical provider requests reuse the cached base image (opt-in)
+        cache_key = generation_cache.make_key(
+            provider,
+            payload.get("model"),
+            prompt,
+            payload["size"],
+            payload.get("style", {}).get("presets", ())
+        )
+        image_content = await generation_cache.get(cache_key, bypass=not use_cache)
+        if image_content is not None:
+            print(f"♻️ Generation cache hit ({provider}): skipping API call")
+            provider_ledger.event("image", provider, payload.get("model"), status="cache_hit", images=1)
+            return image_content, None
+        
+        image_contents, job_id = await self._request_base_image(
+            adapter, provider, api_url, payload, headers
+        )
+        image_content = image_contents[0]
+        self._discard_images(image_contents[1:])
+        await generation_cache.put(cache_key, image_content)
+        return image_content, job_id
+    
+    async def _get_base_image_variants(self, adapter: ImageProviderAdapter, provider: str, api_url: str, prompt: str, aspect_ratio: str, dimensions: dict, headers: dict, variants: int) -> List[Tuple[ImageSource, Optional[str]]]:
+        """
+        Several fresh base images, as few provider requests as the adapter allows.
         
-        # If no campaign message, just copy the file (for brand/product assets)
-        if not campaign_message:
-            import shutil
-            shutil.copy(input_path, output_path)
-            print(f"✅ No text overlay needed (brand/product asset)")
-            return
+        Variants are candidates, so the generation cache is not used.
+        """
+        batches = [
+            min(adapter.max_variants, variants - start)
+            for start in range(0, variants, adapter.max_variants)
+        ]
+        print(f"Requesting {variants} variants from {provider} in {len(batches)} request(s)")
+        responses = await asyncio.gather(
+            *(
+                self._request_base_image(
+                    adapter, provider, api_url,
+                    adapter.build_payload(prompt, aspect_ratio, dimensions, count),
+                    headers
+                )
+                for count in batches
+            ),
+            return_exceptions=True
+        )
+        images = []
+        for response in responses:
+            if isinstance(response, BaseException):
+                print(f"⚠️ Variant batch failed: {str(response) or type(response).__name__}")
+                continue
+            image_contents, job_id = response
+            images.extend((image_content, job_id) for image_content in image_contents)
+        if not images:
+            raise next(r for r in responses if isinstance(r, BaseException))
+        # Providers may return more outputs than asked for
+        self._discard_images([image_content for image_content, _ in images[variants:]])
+        return images[:variants]
+    
+    async def _finalize_image(self, image_content: ImageSource, context: GenerationContext) -> Tuple[str, int]:
+        """Add overlays to one base image and write it under output_dir"""
+        final_filename = f"{uuid.uuid4()}.jpg"
+        final_file_path = self.output_dir / final_filename
+        
+        # Overlay from the provider bytes or downloaded file and write the result once
+        final_content = await self._add_text_overlays(image_content, context)
+        if isinstance(final_content, Path):
+            final_file_size = file_handler.move_atomic(final_content, final_file_path)
+        else:
+            final_file_size = file_handler.write_bytes_atomic(final_file_path, final_content)
         
-        # Translate campaign message to appropriate language
-        translated_message = self._translate_campaign_message(campaign_message, language_code)
+        # Card-size previews for the approval queue and asset lists
+        await file_handler.create_thumbnails(str(final_file_path))
         
-        # Open the image
-        img = Image.open(input_path)
-        draw = ImageDraw.Draw(img)
+        # Responsive renditions for creatives (brand/product assets have no message)
+        if context.campaign_message:
+            try:
+                await rendition_service.generate(str(final_file_path))
+            except Exception as e:
+                # The master is still served; the media endpoint falls back to it
+                print(f"⚠️ Could not write renditions for {final_filename}: {e}")
+                rendition_service.delete(str(final_file_path))
+        return str(final_file_path), final_file_size
+    
+    @staticmethod
+    def _discard_images(images: List[ImageSource]):
+        for image_content in images:
+            if isinstance(image_content, Path):
+                image_content.unlink(missing_ok=True)
+    
+    async def _request_base_image(self, adapter: ImageProviderAdapter, provider: str, api_url: str, payload: dict, headers: dict) -> Tuple[List[ImageSource], Optional[str]]:
+        """
+        POST the generation request and return (raw images, provider job id).
         
-        # Try to load fonts
-        try:
-            # Campaign message font (large)
-            message_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", int(height * 0.06))
-            # Brand name font (medium)
-            brand_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", int(height * 0.04))
-        except:
-            message_font = ImageFont.load_default()
-            brand_font = ImageFont.load_default()
-        
-        # Add semi-transparent background for campaign message
-        message_lines = textwrap.wrap(translated_message, width=30)
-        message_text = "\n".join(message_lines)
-        
-        # Calculate text bounding box for campaign message
-        bbox = draw.textbbox((0, 0), message_text, font=message_font)
-        text_width = bbox[2] - bbox[0]
-        text_height = bbox[3] - bbox[1]
-        
-        # Position at bottom center
-        message_x = (width - text_width) // 2
-        message_y = height - text_height - int(height * 0.1)
-        
-        # Draw semi-transparent background
-        padding = int(height * 0.03)
-        draw.rectangle(
-            [message_x - padding, message_y - padding,
-             message_x + text_width + padding, message_y + text_height + padding],
-            fill=(0, 0, 0, 180)
-        )
+        Each raw image is bytes or a downloaded file the caller must move or delete.
         
-        # Draw campaign message text
-        draw.text((message_x, message_y), message_text, fill="white", font=message_font, align="center")
+        Requests go through the adapter's limiter and circuit breaker. Timeouts,
+        connection errors and retryable statuses are retried up to max_retries
+        times with jittered exponential backoff; a 429 pauses the whole provider
+        for its Retry-After.
         
-        # Add brand name in top-right corner
-        if brand_name:
-            brand_text = brand_name.upper()
-            brand_bbox = draw.textbbox((0, 0), brand_text, font=brand_font)
-            brand_width = brand_bbox[2] - brand_bbox[0]
-            brand_x = width - brand_width - int(width * 0.05)
-            brand_y = int(height * 0.05)
-            
-            # Draw semi-transparent background for brand
-            brand_padding = int(height * 0.02)
-            draw.rectangle(
-                [brand_x - brand_padding, brand_y - brand_padding,
-                 brand_x + brand_width + brand_padding, brand_y + (brand_bbox[3] - brand_bbox[1]) + brand_padding],
-                fill=(255, 255, 255, 200)
+        Every request (all its attempts) is one provider ledger record.
+        """
+        with provider_ledger.call("image", provider, payload.get("model")) as call:
+            image_contents, job_id = await self._send_generation_request(
+                adapter, provider, api_url, payload, headers, call
             )
+            call.images = len(image_contents)
+            call.image_bytes = sum(
+                image_content.stat().st_size if isinstance(image_content, Path) else len(image_content)
+                for image_content in image_contents
+            )
+            return image_contents, job_id
+    
+    async def _send_generation_request(self, adapter: ImageProviderAdapter, provider: str, api_url: str, payload: dict, headers: dict, call: CallRecord) -> Tuple[List[ImageSource], Optional[str]]:
+        """Retry loop behind _request_base_image; records phases and attempts on call"""
+        breaker = adapter.breaker
+        if not breaker.allow_request():
+            print(f"🔌 {provider} circuit is {breaker.state}, failing fast")
+            raise ProviderUnavailableError(provider, breaker.retry_in())
+        
+        print(f"Making POST request to: {api_url}")
+        print(f"Payload: {payload}")
+        
+        timeout = adapter.read_timeout
+        print(f"Using timeout: {timeout}s")
+        
+        client = http_client.client
+        for attempt in range(self.max_retries + 1):
+            body = None
+            call.start_attempt()
+            try:
+                # Provider limiter first (in-flight cap, rate tokens, Retry-After
+                # pauses), then a fair-share global slot only for the request
+                # itself, so a throttled provider does not sit on global slots
+                queued = time.perf_counter()
+                async with adapter.limiter.slot(), generation_scheduler.slot("image"):
+                    call.add_since("queue", queued)
+                    sent = time.perf_counter()
+                    async with client.stream(
+                        "POST", api_url, json=payload, headers=headers,
+                        timeout=http_client.timeout(read=timeout),
+                        extensions={"trace": call.trace}
+                    ) as response:
+                        call.response_started(sent)
+                        call.http_status = response.status_code
+                        with call.phase("download"):
+                            if response.status_code >= 400:
+                                # Error bodies are small; keep them for logging
+                                await response.aread()
+                            else:
+                                # Adapters consume the body incrementally (e.g. streaming base64 to disk)
+                                body = await adapter.read_body(response)
+                    call.request_bytes = int(response.request.headers.get("Content-Length", 0))
+                    call.response_bytes = response.num_bytes_downloaded
+            except httpx.TransportError as e:
+                if attempt == self.max_retries:
+                    breaker.record_failure(f"{type(e).__name__}: {e}")
+                    raise
+                delay = self._retry_delay(attempt)
+                print(f"⏳ {provider} request failed ({type(e).__name__}), retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(delay)
+                continue
             
-            # Draw brand name
-            draw.text((brand_x, brand_y), brand_text, fill="black", font=brand_font)
+            print(f"Response status: {response.status_code}")
+            print(f"Response headers: {response.headers}")
+            
+            if response.status_code not in RETRYABLE_STATUSES or attempt == self.max_retries:
+                break
+            
+            if response.status_code == 429:
+                # Back off the whole provider, not just this request
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+                if delay is None:
+                    delay = self._retry_delay(attempt)
+                adapter.limiter.pause(delay)
+            else:
+                delay = self._retry_delay(attempt)
+                await asyncio.sleep(delay)
+            print(f"⏳ {provider} returned {response.status_code}, retrying in {delay:.1f}s (attempt {attempt + 1}/{self.max_retries})")
         
-        # Composite brand logo if provided
-        if brand_logo_path:
-            try:
-                import os
-                if os.path.exists(brand_logo_path):
-                    logo = Image.open(brand_logo_path)
-                    
-                    # Resize logo to appropriate size (max 15% of image width/height)
-                    max_logo_size = int(min(width, height) * 0.15)
-                    logo.thumbnail((max_logo_size, max_logo_size), Image.Resampling.LANCZOS)
-                    
-                    # Position logo in top-left corner with padding
-                    logo_x = int(width * 0.05)
-                    logo_y = int(height * 0.05)
-                    
-                    # Handle transparency
-                    if logo.mode in ('RGBA', 'LA'):
-                        # Create a white background
-                        background = Image.new('RGB', logo.size, (255, 255, 255))
-                        background.paste(logo, mask=logo.split()[-1] if logo.mode == 'RGBA' else None)
-                        img.paste(background, (logo_x, logo_y))
-                    else:
-                        img.paste(logo, (logo_x, logo_y))
-                    
-                    print(f"✅ Composited brand logo from: {brand_logo_path}")
-            except Exception as e:
-                print(f"⚠️ Failed to composite logo: {e}")
+        # Only provider-side failures count against the breaker; a 4xx means it is up
+        if response.status_code in RETRYABLE_STATUSES:
+            breaker.record_failure(f"HTTP {response.status_code}")
+        else:
+            breaker.record_success()
+        
+        # Check for quota/rate limit errors BEFORE raising
+        if response.status_code == 429:
+            print("\n" + "="*80)
+            print("🚨 QUOTA/RATE LIMIT EXCEEDED 🚨")
+            print("="*80)
+            print(f"Provider: {provider}")
+            print(f"Status: {response.status_code}")
+            print(f"Response: {response.text}")
+            print("="*80 + "\n")
+            raise HTTPException(
+                status_code=429,
+                detail=f"Image API quota/rate limit exceeded for {provider}. Please wait or check your API limits."
+            )
+        
+        if response.status_code == 403:
+            print("\n" + "="*80)
+            print("🚨 API ACCESS FORBIDDEN 🚨")
+            print("="*80)
+            print(f"Provider: {provider}")
+            print(f"Status: {response.status_code}")
+            print(f"Response: {response.text}")
+            print("Possible reasons:")
+            print("  - Invalid API key")
+            print("  - Quota exceeded")
+            print("  - Insufficient permissions")
+            print("="*80 + "\n")
+        
+        if response.status_code >= 400:
+            print("\n" + "="*80)
+            print(f"🚨 IMAGE API ERROR: {response.status_code} 🚨")
+            print("="*80)
+            print(f"Provider: {provider}")
+            print(f"URL: {api_url}")
+            print(f"Status: {response.status_code}")
+            print(f"Response: {response.text}")
+            print("="*80 + "\n")
+        
+        response.raise_for_status()
         
-        # Save the image
-        img.save(output_path, 'JPEG', quality=95)
-        print(f"✅ Added text overlays: '{translated_message}' + brand '{brand_name}'")
+        # Each provider has its own response format
+        with call.phase("download"):
+            return await adapter.decode_response(body, client, headers)
     
-    def _translate_campaign_message(self, message: str, language_code: str) -> str:
+    def _retry_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given 0-based attempt"""
+        return random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+    
+    async def _add_text_overlays(self, image_content: ImageSource, context: GenerationContext) -> ImageSource:
         """
-        Translate campaign message to appropriate language using Google Translate.
+        Add text overlays and brand logo to the generated image.
+        
+        image_content is provider bytes or a downloaded file. Decode/draw/encode
+        runs in the image process pool; returns JPEG bytes.
         """
-        import httpx
-        
-        lang = language_code.split('-')[0].lower()
-        
-        if lang == "en":
-            return message
-        
-        # Language code mapping
-        lang_map = {
-            "ja": "ja",  # Japanese
-            "zh": "zh-CN",  # Chinese Simplified
-            "ko": "ko",  # Korean
-            "de": "de",  # German
-            "fr": "fr",  # French
-            "es": "es",  # Spanish
-            "it": "it",  # Italian
-            "pt": "pt",  # Portuguese
-        }
+        dimensions = self._get_dimensions(context.aspect_ratio)
+        source = str(image_content) if isinstance(image_content, Path) else image_content
         
-        target_lang = lang_map.get(lang, lang)
+        # If no campaign message, keep the provider image (for brand/product assets)
+        if not context.campaign_message:
+            print(f"✅ No text overlay needed (brand/product asset)")
+            if context.reframe_master:
+                return await image_processor.run(reframe_to_jpeg, source, dimensions["width"], dimensions["height"])
+            return image_content
         
-        try:
-            # Use Google Translate API (free tier)
-            url = "https://translate.googleapis.com/translate_a/single"
-            params = {
-                "client": "gtx",
-                "sl": "en",
-                "tl": target_lang,
-                "dt": "t",
-                "q": message
-            }
-            
-            response = httpx.get(url, params=params, timeout=5.0)
-            if response.status_code == 200:
-                result = response.json()
-                translated = result[0][0][0]
-                print(f"🌍 Translated '{message}' to {target_lang}: '{translated}'")
-                return translated
-        except Exception as e:
-            print(f"⚠️ Translation failed: {e}, using original message")
+        # Campaign message was translated upstream (see translation_service)
+        translated_message = context.translated_message or context.campaign_message
+        
+        # Logo is decoded and scaled once per brand kit and size, not per creative
+        logo = await brand_kit_cache.get_logo(
+            context.brand_logo_path,
+            logo_max_size(dimensions["width"], dimensions["height"])
+        )
         
-        return message
+        result = await image_processor.run(
+            compose_overlays,
+            source,
+            translated_message,
+            context.brand_name,
+            logo,
+            dimensions["width"],
+            dimensions["height"],
+            context.language_code,
+            context.reframe_master
+        )
+        print(f"✅ Added text overlays: '{translated_message}' + brand '{context.brand_name}'")
+        return result
     
     def _get_dimensions(self, aspect_ratio: str) -> dict:
         """Get image dimensions for aspect ratio"""
@@ -649,9 +815,29 @@ Style: High quality, professional marketing imagery with clear text overlay and
         }
         return dimensions_map.get(aspect_ratio, {"width": 1080, "height": 1080})
     
+    def _get_master_dimensions(self, aspect_ratio: str) -> dict:
+        """Master render size: the ratio's dimensions scaled to master_size on the long side"""
+        dimensions = self._get_dimensions(aspect_ratio)
+        scale = self.master_size / max(dimensions["width"], dimensions["height"])
+        return {
+            "width": round(dimensions["width"] * scale),
+            "height": round(dimensions["height"] * scale)
+        }
+    
+    def _create_mock_variants(self, prompt: str, aspect_ratio: str, variants: int, reframe_to: Tuple[str, ...] = (), provider: str = "mock", reason: Optional[str] = None) -> List[Tuple[str, str, int, Optional[str]]]:
+        results = []
+        # Ledgered as a mock call so fallbacks show up per provider
+        with provider_ledger.call("image", provider, status="mock", error=reason) as call:
+            for ratio in reframe_to or [aspect_ratio] * variants:
+                file_path, file_size = self._create_mock_creative(prompt, ratio)
+                results.append((file_path, "image/jpeg", file_size, None))
+            call.images = len(results)
+            call.image_bytes = sum(file_size for _, _, file_size, _ in results)
+        return results
+    
     def _create_mock_creative(self, prompt: str, aspect_ratio: str) -> Tuple[str, int]:
         """Create mock creative for development (simple image file)"""
-        from PIL import Image, ImageDraw, ImageFont
+        from PIL import Image, ImageDraw
         import textwrap
         
         # Create a simple placeholder image file
@@ -670,13 +856,9 @@ Style: High quality, professional marketing imagery with clear text overlay and
         # Add text overlay
         text = f"MOCK CREATIVE\n{aspect_ratio}\n\n{prompt[:100]}..."
         
-        # Try to use a font, fallback to default if not available
-        try:
-            font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 40)
-            small_font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 24)
-        except:
-            font = ImageFont.load_default()
-            small_font = ImageFont.load_default()
+        # Cached fonts (CJK-capable face if the prompt needs one)
+        font = font_registry.get_font("sans", 40)
+        small_font = font_registry.get_font(font_registry.family_for(text=prompt[:200]), 24)
         
         # Add aspect ratio text at top
         draw.text((width//2, 60), f"MOCK: {aspect_ratio}", fill='white', font=font, anchor='mm')
@@ -0,0 +1,112 @@
+"""
+Font registry for image overlays: loads font files once per process and caches
+FreeTypeFont objects by (family, size), with CJK-capable faces for ja/zh/ko captions.
+"""
+import io
+import os
+from typing import Dict, List, Optional, Tuple
+
+from PIL import ImageFont
+
+
+# Candidate font files per family, first existing file wins.
+# OVERLAY_FONT_<FAMILY> (e.g. OVERLAY_FONT_CJK) is tried before these.
+FONT_CANDIDATES: Dict[str, List[str]] = {
+    "sans": [
+        "/System/Library/Fonts/Helvetica.ttc",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+        "/usr/share/fonts/truetype/noto/NotoSans-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    ],
+    "cjk": [
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+        "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+        "/usr/share/fonts/noto-cjk/NotoSansCJK-Bold.ttc",
+        "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Bold.ttc",
+        "/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc",
+        "/System/Library/Fonts/PingFang.ttc",
+        "/System/Library/Fonts/Hiragino Sans GB.ttc",
+        "/System/Library/Fonts/AppleSDGothicNeo.ttc",
+    ],
+}
+
+# Language prefixes whose captions need a CJK-capable face
+CJK_LANGUAGES = {"ja", "zh", "ko"}
+
+
+def _contains_cjk(text: str) -> bool:
+    for char in text:
+        code = ord(char)
+        if (0x3040 <= code <= 0x30FF      # Hiragana, Katakana
+                or 0x3400 <= code <= 0x4DBF   # CJK Extension A
+                or 0x4E00 <= code <= 0x9FFF   # CJK Unified Ideographs
+                or 0xAC00 <= code <= 0xD7AF   # Hangul syllables
+                or 0xFF00 <= code <= 0xFFEF):  # Full-width forms
+            return True
+    return False
+
+
+class FontRegistry:
+    """Per-process cache of font file bytes and sized FreeTypeFont objects"""
+
+    def __init__(self):
+        self._font_data: Dict[str, Optional[bytes]] = {}
+        self._fonts: Dict[Tuple[str, int], ImageFont.ImageFont] = {}
+        self.loads = 0
+
+    def family_for(self, language_code: Optional[str] = None, text: str = "") -> str:
+        """Pick the font family for a caption language and/or its text"""
+        if language_code and language_code.split('-')[0].lower() in CJK_LANGUAGES:
+            return "cjk"
+        if text and _contains_cjk(text):
+            return "cjk"
+        return "sans"
+
+    def _candidates(self, family: str) -> List[str]:
+        configured = os.getenv(f"OVERLAY_FONT_{family.upper()}")
+        candidates = list(FONT_CANDIDATES.get(family, []))
+        return [configured] + candidates if configured else candidates
+
+    def _load_family(self, family: str) -> Optional[bytes]:
+        """Read the first available font file for family (probed once per process)"""
+        if family not in self._font_data:
+            data = None
+            for path in self._candidates(family):
+                if os.path.exists(path):
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    print(f"🔤 Loaded '{family}' font from: {path}")
+                    break
+            if data is None and family != "sans":
+                print(f"⚠️ No '{family}' font found, falling back to sans")
+                data = self._load_family("sans")
+            self._font_data[family] = data
+        return self._font_data[family]
+
+    def get_font(self, family: str, size: int) -> ImageFont.ImageFont:
+        """Cached font for (family, size); Pillow's default font if no file is available"""
+        size = max(1, int(size))
+        key = (family, size)
+        font = self._fonts.get(key)
+        if font is None:
+            self.loads += 1
+            data = self._load_family(family)
+            if data is not None:
+                font = ImageFont.truetype(io.BytesIO(data), size)
+            else:
+                try:
+                    font = ImageFont.load_default(size)
+                except TypeError:
+                    # Pillow builds without FreeType only ship the bitmap default
+                    font = ImageFont.load_default()
+            self._fonts[key] = font
+        return font
+
+    def clear(self):
+        self._font_data.clear()
+        self._fonts.clear()
+
+
+# Singleton instance (one per process, including image pool workers)
+font_registry = FontRegistry()
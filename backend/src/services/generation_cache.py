@@ -0,0 +1,194 @@
+"""
+Opt-in content-addressed cache of raw provider images.
+
+Keyed by a hash of (provider, model, prompt, size, style presets) so identical
+requests (regenerate, duplicate-then-generate, repeated runs) skip the paid
+provider call and only re-run the overlay stage. Entries live on disk with a
+TTL and size-based LRU eviction; get/put do their file I/O in a thread so
+cache traffic never blocks the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+from .file_handler import file_handler
+
+
+class GenerationCache:
+    """
+    Disk cache of base images.
+
+    Each entry is <key>.bin; the file mtime is its creation time (for the TTL)
+    and the atime is bumped on every hit (for LRU order).
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("GENERATION_CACHE_ENABLED", "false").lower() == "true"
+        self.cache_dir = Path(os.getenv("GENERATION_CACHE_DIR", "uploads/generation_cache"))
+        self.max_bytes = int(float(os.getenv("GENERATION_CACHE_MAX_MB", "500")) * 1024 * 1024)
+        self.ttl = float(os.getenv("GENERATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        # key -> file size, least recently used first (loaded lazily from disk)
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], prompt: str, size, style_presets: Iterable[str] = ()) -> str:
+        """Stable hash of everything that determines the provider's output"""
+        material = json.dumps(
+            [provider, model, prompt, size, sorted(style_presets)],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.bin"
+
+    def _scan(self) -> "OrderedDict[str, int]":
+        """Entries on disk, least recently used first"""
+        entries = []
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*.bin"):
+                stat = path.stat()
+                entries.append((stat.st_atime, path.stem, stat.st_size))
+        entries.sort()
+        return OrderedDict((key, size) for _, key, size in entries)
+
+    def _set_index(self, index: "OrderedDict[str, int]") -> "OrderedDict[str, int]":
+        # A concurrent first lookup may have loaded (and changed) it already
+        if self._index is None:
+            self._index = index
+            self._total_bytes = sum(index.values())
+        return self._index
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            self._set_index(self._scan())
+        return self._index
+
+    async def _load_index_async(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            self._set_index(await asyncio.to_thread(self._scan))
+        return self._index
+
+    def _forget(self, key: str) -> Path:
+        """Drop key from the index; the caller deletes the returned file"""
+        self._total_bytes -= self._load_index().pop(key, 0)
+        return self._path(key)
+
+    @staticmethod
+    def _unlink(*paths: Path):
+        for path in paths:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _remove(self, key: str):
+        self._unlink(self._forget(key))
+
+    def _read(self, path: Path) -> Optional[bytes]:
+        """Entry content with its atime bumped, or None once past the TTL"""
+        stat = path.stat()
+        if time.time() - stat.st_mtime > self.ttl:
+            return None
+        content = path.read_bytes()
+        # Record the hit on disk so LRU order survives a restart
+        os.utime(path, (time.time(), stat.st_mtime))
+        return content
+
+    def _write(self, path: Path, content: Union[bytes, Path]) -> int:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, Path):
+            return file_handler.copy_file_atomic(content, path)
+        return file_handler.write_bytes_atomic(path, content)
+
+    async def get(self, key: str, bypass: bool = False) -> Optional[bytes]:
+        """Cached base image for key, or None on miss/expiry/bypass"""
+        if not self.enabled:
+            return None
+        if bypass:
+            self.bypassed += 1
+            return None
+
+        index = await self._load_index_async()
+        if key not in index:
+            self.misses += 1
+            return None
+
+        path = self._path(key)
+        try:
+            content = await asyncio.to_thread(self._read, path)
+        except FileNotFoundError:
+            content = None
+        else:
+            if content is None:
+                self.expired += 1
+        if content is None:
+            self.misses += 1
+            await asyncio.to_thread(self._unlink, self._forget(key))
+            return None
+
+        # Move to the MRU end (unless evicted while the read ran)
+        if key in index:
+            index.move_to_end(key)
+        self.hits += 1
+        return content
+
+    async def put(self, key: str, content: Union[bytes, Path]):
+        """Store a base image (bytes or a file to copy), evicting LRU entries past max_bytes"""
+        if not self.enabled:
+            return
+        if isinstance(content, Path):
+            size = (await asyncio.to_thread(content.stat)).st_size
+        else:
+            size = len(content)
+        if not size or size > self.max_bytes:
+            return
+
+        index = await self._load_index_async()
+        size = await asyncio.to_thread(self._write, self._path(key), content)
+        # Replaces any earlier entry for key (including one from a concurrent put)
+        self._total_bytes -= index.pop(key, 0)
+        index[key] = size
+        self._total_bytes += size
+
+        evicted = []
+        while self._total_bytes > self.max_bytes and index:
+            evicted.append(self._forget(next(iter(index))))
+            self.evictions += 1
+        if evicted:
+            await asyncio.to_thread(self._unlink, *evicted)
+
+    async def stats(self) -> dict:
+        """Hit/miss counters and disk usage for the metrics endpoint"""
+        index = await self._load_index_async() if self.enabled else {}
+        return {
+            "enabled": self.enabled,
+            "entries": len(index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "expired": self.expired
+        }
+
+    def clear(self):
+        for key in list(self._load_index()):
+            self._remove(key)
+
+
+# Singleton instance
+generation_cache = GenerationCache()
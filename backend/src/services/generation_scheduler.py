@@ -0,0 +1,214 @@
+"""
+Fair-share scheduler in front of the LLM and image providers.
+
+Every provider call takes one of SCHEDULER_MAX_CONCURRENCY global slots once
+its provider limiter has let it through, and holds it only while the request
+is on the wire, so a throttled provider cannot starve the others. When the
+slots are busy, waiting calls are ordered by
+lane first - interactive (regenerate clicks) ahead of bulk (brief execution,
+creative generation) - then by weighted fair queuing across flows (one flow per
+brief), so a 10x10 brief gets its share of the providers without starving
+every other brief.
+
+Calls pick up their flow, lane and queue-position callback from the ambient
+scheduling context set by the job handler (a contextvar, inherited by the tasks
+it spawns), so provider code does not thread them through every signature.
+"""
+import asyncio
+import bisect
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Strict priority between lanes; fair queuing within a lane
+LANES = ("interactive", "bulk")
+
+# on_queue({"position", "eta_seconds", "lane", "stage"}) while a call waits for a slot
+QueueCallback = Callable[[dict], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class SchedulingContext:
+    flow: str = "default"
+    lane: str = "bulk"
+    weight: float = 1.0
+    on_queue: Optional[QueueCallback] = None
+
+
+_current: ContextVar[SchedulingContext] = ContextVar("generation_scheduling", default=SchedulingContext())
+
+
+class _Waiter:
+    __slots__ = ("key", "context", "kind", "start_tag", "granted", "changed", "reported")
+
+    def __init__(self, key: Tuple[int, float, int], context: SchedulingContext, kind: str, start_tag: float):
+        self.key = key
+        self.context = context
+        self.kind = kind
+        self.start_tag = start_tag
+        self.granted = False
+        self.changed = asyncio.Event()
+        self.reported: Optional[int] = None
+
+
+class GenerationScheduler:
+    """
+    Global provider concurrency cap with an interactive lane and start-time fair
+    queuing across flows.
+
+    Each waiting call gets a virtual finish tag of
+    max(lane virtual time, flow's last finish) + cost / weight, where cost is the
+    recent average duration of its kind of call; the smallest tag runs next. A
+    flow with many calls queued therefore interleaves with, rather than blocks,
+    a flow that has a few.
+    """
+
+    def __init__(self):
+        self.max_concurrency = max(1, int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "6")))
+        # Assumed call duration until real ones are measured (drives cost and ETA)
+        self.initial_service_seconds = float(os.getenv("SCHEDULER_INITIAL_SERVICE_SECONDS", "10"))
+        self.in_use = 0
+        self.granted = 0
+        self.waited = 0
+        self._queue: List[_Waiter] = []
+        self._virtual_time: Dict[str, float] = {lane: 0.0 for lane in LANES}
+        self._flow_finish: Dict[Tuple[str, str], float] = {}
+        self._service_seconds: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+    @contextmanager
+    def context(self, **overrides):
+        """Set flow/lane/weight/on_queue for provider calls made inside the block"""
+        lane = overrides.get("lane")
+        if lane is not None and lane not in LANES:
+            raise ValueError(f"Unknown scheduling lane: {lane}")
+        token = _current.set(replace(_current.get(), **overrides))
+        try:
+            yield
+        finally:
+            _current.reset(token)
+
+    def current(self) -> SchedulingContext:
+        """Scheduling context of the running task"""
+        return _current.get()
+
+    @asynccontextmanager
+    async def slot(self, kind: str):
+        """Hold a global provider slot for one call of the given kind ("llm", "image")"""
+        context = _current.get()
+        if not self._queue and self.in_use < self.max_concurrency:
+            self.in_use += 1
+        else:
+            await self._wait(context, kind)
+        self.granted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._record(kind, time.monotonic() - started)
+            self.in_use -= 1
+            self._dispatch()
+
+    async def _wait(self, context: SchedulingContext, kind: str):
+        flow_key = (context.lane, context.flow)
+        start_tag = max(self._virtual_time[context.lane], self._flow_finish.get(flow_key, 0.0))
+        finish_tag = start_tag + self._service_time(kind) / max(context.weight, 1e-6)
+        self._flow_finish[flow_key] = finish_tag
+        waiter = _Waiter((LANES.index(context.lane), finish_tag, next(self._seq)), context, kind, start_tag)
+        bisect.insort(self._queue, waiter, key=lambda w: w.key)
+        self.waited += 1
+        self._notify()
+        try:
+            while not waiter.granted:
+                if context.on_queue is not None:
+                    position = self._queue.index(waiter) + 1
+                    if position != waiter.reported:
+                        waiter.reported = position
+                        await context.on_queue({
+                            "position": position,
+                            "eta_seconds": self.eta(position),
+                            "lane": context.lane,
+                            "stage": "provider"
+                        })
+                        # The queue may have moved while the callback ran
+                        continue
+                waiter.changed.clear()
+                await waiter.changed.wait()
+        except BaseException:
+            if waiter.granted:
+                # Granted while being cancelled: pass the slot on
+                self.in_use -= 1
+                self._dispatch()
+            else:
+                self._queue.remove(waiter)
+                self._notify()
+            raise
+
+    def _dispatch(self):
+        dispatched = False
+        while self._queue and self.in_use < self.max_concurrency:
+            waiter = self._queue.pop(0)
+            lane = waiter.context.lane
+            self._virtual_time[lane] = max(self._virtual_time[lane], waiter.start_tag)
+            waiter.granted = True
+            waiter.changed.set()
+            self.in_use += 1
+            dispatched = True
+        if dispatched:
+            self._notify()
+            self._prune()
+
+    def _notify(self):
+        """Wake waiters that report their position so they can re-check it"""
+        for waiter in self._queue:
+            if waiter.context.on_queue is not None:
+                waiter.changed.set()
+
+    def _prune(self):
+        # Flows whose last finish tag is behind virtual time carry no credit
+        if len(self._flow_finish) > 256:
+            self._flow_finish = {
+                key: finish for key, finish in self._flow_finish.items()
+                if finish > self._virtual_time[key[0]]
+            }
+
+    def _service_time(self, kind: str) -> float:
+        return self._service_seconds.get(kind, self.initial_service_seconds)
+
+    def _record(self, kind: str, seconds: float):
+        previous = self._service_seconds.get(kind)
+        self._service_seconds[kind] = seconds if previous is None else 0.8 * previous + 0.2 * seconds
+
+    def eta(self, position: int) -> float:
+        """Estimated seconds until the call at `position` (1 = next) gets a slot"""
+        work = sum(self._service_time(waiter.kind) for waiter in self._queue[:position])
+        return round(work / self.max_concurrency, 1)
+
+    def stats(self) -> dict:
+        waiting = {lane: 0 for lane in LANES}
+        for waiter in self._queue:
+            waiting[waiter.context.lane] += 1
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_use": self.in_use,
+            "waiting": waiting,
+            "waiting_flows": len({(w.context.lane, w.context.flow) for w in self._queue}),
+            "granted": self.granted,
+            "waited": self.waited,
+            "avg_service_seconds": {kind: round(seconds, 2) for kind, seconds in self._service_seconds.items()}
+        }
+
+
+def queue_reporter(emit: Callable[[str, dict], Awaitable[None]], **extra) -> QueueCallback:
+    """on_queue callback that emits a job "queue" event (plus any extra fields)"""
+    async def report(position: dict):
+        await emit("queue", {**position, **extra})
+    return report
+
+
+# Singleton instance
+generation_scheduler = GenerationScheduler()
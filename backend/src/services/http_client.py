@@ -0,0 +1,153 @@
+"""
+Shared pooled HTTP client for all outbound provider traffic (LLM, image APIs, Adobe IMS).
+"""
+import asyncio
+import os
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class _HostLimitedStream(httpx.AsyncByteStream):
+    """Response stream that releases its per-host slot when closed"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _HostLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a transport and caps concurrent in-flight requests per host.
+
+    httpx only limits connections pool-wide, so a burst to one provider could
+    starve the others. The slot is held until the response body is closed.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, max_per_host: int):
+        self._transport = transport
+        self._max_per_host = max_per_host
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore_for(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._max_per_host)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        semaphore = self._semaphore_for(request.url.host)
+        await semaphore.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                semaphore.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+
+        # Pre-buffered responses are already closed and will never call aclose
+        if response.is_closed:
+            release()
+            return response
+
+        response.stream = _HostLimitedStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class HTTPClientPool:
+    """
+    Application-lifetime httpx.AsyncClient with keep-alive and optional HTTP/2.
+
+    Started and closed from the FastAPI lifespan. Code running outside the app
+    (scripts, tests) gets a lazily created client on first use.
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_connections_per_host = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+        self.max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "40"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.http2 = os.getenv("HTTP_ENABLE_HTTP2", "true").lower() == "true"
+        self.connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+        self.write_timeout = float(os.getenv("HTTP_WRITE_TIMEOUT", "30"))
+        self.pool_timeout = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def timeout(self, read: Optional[float] = None) -> httpx.Timeout:
+        """Build a timeout using the configured phases, optionally overriding read"""
+        return httpx.Timeout(
+            connect=self.connect_timeout,
+            read=read if read is not None else self.read_timeout,
+            write=self.write_timeout,
+            pool=self.pool_timeout
+        )
+
+    def _http2_available(self) -> bool:
+        if not self.http2:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            print("⚠️  HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            return False
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        http2 = self._http2_available()
+        transport = _HostLimitedTransport(
+            httpx.AsyncHTTPTransport(limits=limits, http2=http2),
+            self.max_connections_per_host
+        )
+        print(f"🌐 HTTP client pool started (http2={http2}, max_connections={self.max_connections}, "
+              f"per_host={self.max_connections_per_host})")
+        return httpx.AsyncClient(transport=transport, timeout=self.timeout())
+
+    async def start(self):
+        """Create the shared client (called from the FastAPI lifespan)"""
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self):
+        """Close the shared client and all pooled connections"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The shared client, created on first use if the lifespan has not started it"""
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+
+# Singleton instance
+http_client = HTTPClientPool()
@@ -0,0 +1,115 @@
+"""
+Streaming download of generated images (e.g. Firefly presigned URLs) to disk.
+
+The body is written in chunks so memory per download stays bounded regardless
+of image size. Downloads are checked for status, size, declared content type
+and magic bytes, and truncated transfers are retried.
+"""
+import os
+import uuid
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from .http_client import http_client
+
+# Content types accepted from the provider's storage (octet-stream is common on presigned URLs)
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "application/octet-stream", "binary/octet-stream"}
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """MIME type from an image's leading bytes, or None if not a supported image"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class TruncatedDownloadError(Exception):
+    """The connection ended before Content-Length bytes arrived"""
+
+
+class ImageDownloader:
+    """Streams image URLs into files under download_dir"""
+
+    def __init__(self):
+        self.download_dir = Path(os.getenv("IMAGE_DOWNLOAD_DIR", "uploads/downloads"))
+        self.max_bytes = int(float(os.getenv("IMAGE_DOWNLOAD_MAX_MB", "50")) * 1024 * 1024)
+        self.chunk_size = int(os.getenv("IMAGE_DOWNLOAD_CHUNK_SIZE", str(64 * 1024)))
+        self.retries = max(0, int(os.getenv("IMAGE_DOWNLOAD_RETRIES", "2")))
+        self.truncated = 0
+
+    async def download(self, url: str, timeout: float = 30.0) -> Path:
+        """
+        Stream url into a new file and return its path.
+
+        Raises:
+            HTTPException: 502 if the download fails, is not an image, exceeds
+            max_bytes or is still truncated after all retries
+        """
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        for attempt in range(self.retries + 1):
+            path = self.download_dir / f"{uuid.uuid4().hex}.download"
+            try:
+                await self._stream_to(url, path, timeout)
+                return path
+            except (TruncatedDownloadError, httpx.TransportError) as e:
+                path.unlink(missing_ok=True)
+                self.truncated += 1
+                if attempt == self.retries:
+                    raise HTTPException(status_code=502, detail=f"Image download failed: {e}")
+                print(f"⚠️ Image download interrupted ({e}), retrying ({attempt + 1}/{self.retries})")
+            except BaseException:
+                path.unlink(missing_ok=True)
+                raise
+
+    async def _stream_to(self, url: str, path: Path, timeout: float):
+        client = http_client.client
+        async with client.stream("GET", url, timeout=http_client.timeout(read=timeout)) as response:
+            if response.status_code >= 400:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Image download failed with status {response.status_code}"
+                )
+
+            content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+            if content_type and content_type not in ALLOWED_CONTENT_TYPES:
+                raise HTTPException(status_code=502, detail=f"Image download has unexpected content type {content_type}")
+
+            # Content-Length counts encoded bytes, so it is only comparable without Content-Encoding
+            expected = response.headers.get("content-length")
+            if response.headers.get("content-encoding") or not (expected and expected.isdigit()):
+                expected = None
+            else:
+                expected = int(expected)
+            if expected is not None and expected > self.max_bytes:
+                raise HTTPException(status_code=502, detail=f"Image download too large ({expected} bytes)")
+
+            received = 0
+            head = b""
+            with open(path, "wb") as f:
+                async for chunk in response.aiter_bytes(self.chunk_size):
+                    if len(head) < 12:
+                        head += chunk[:12 - len(head)]
+                        if len(head) >= 12 and sniff_image_type(head) is None:
+                            raise HTTPException(status_code=502, detail="Image download is not a JPEG/PNG/WebP image")
+                    received += len(chunk)
+                    if received > self.max_bytes:
+                        raise HTTPException(status_code=502, detail=f"Image download exceeded {self.max_bytes} bytes")
+                    f.write(chunk)
+
+            if expected is not None and received < expected:
+                raise TruncatedDownloadError(f"received {received} of {expected} bytes")
+            if sniff_image_type(head) is None:
+                raise HTTPException(status_code=502, detail="Image download is not a JPEG/PNG/WebP image")
+
+        print(f"Downloaded {received} bytes to {path}")
+
+
+# Singleton instance
+image_downloader = ImageDownloader()
@@ -0,0 +1,343 @@
+"""
+Process pool for CPU-bound image post-processing (decode, overlay, encode).
+
+Keeps PIL work off the event loop so SSE streams and other requests stay
+responsive while creatives are composited. Worker functions are module-level
+and take/return plain bytes so they pickle cheaply into the pool.
+"""
+import asyncio
+import functools
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple, Union
+
+from .font_registry import font_registry
+from .reframe import reframe
+from .text_layout import TextLayout, text_layout
+
+
+def prepare_logo(logo_path: str, max_size: int) -> Optional[Tuple[int, int, bytes]]:
+    """
+    Decode a logo file, fit it within max_size and flatten transparency onto white.
+
+    Returns (width, height, raw RGB bytes) so the result pickles cheaply and can be
+    pasted by compose_overlays without decoding the file again.
+    """
+    from PIL import Image
+
+    if not os.path.exists(logo_path):
+        return None
+
+    with Image.open(logo_path) as logo:
+        logo.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+        # Handle transparency
+        if logo.mode in ('RGBA', 'LA'):
+            # Create a white background
+            flattened = Image.new('RGB', logo.size, (255, 255, 255))
+            flattened.paste(logo, mask=logo.split()[-1])
+        else:
+            flattened = logo.convert('RGB')
+
+    return flattened.width, flattened.height, flattened.tobytes()
+
+
+def logo_max_size(width: int, height: int) -> int:
+    """Logo bounding box for an output size (max 15% of image width/height)"""
+    return int(min(width, height) * 0.15)
+
+
+def compose_overlays(
+    image_source: Union[bytes, str],
+    message: str,
+    brand_name: Optional[str],
+    logo: Optional[Tuple[int, int, bytes]],
+    width: int,
+    height: int,
+    language_code: str = "en-US",
+    reframe_master: bool = False
+) -> bytes:
+    """
+    Draw the campaign message, brand badge and logo onto an image.
+
+    image_source is encoded image bytes or a file path (read inside the worker).
+    logo is a prepare_logo() result, already sized for this output.
+    reframe_master crops/pads a master render to width x height first.
+    Runs inside a pool worker. Returns the composited image as JPEG bytes.
+    """
+    from PIL import Image
+
+    # Open the image
+    img = _open_rgb(image_source)
+    if reframe_master:
+        img = reframe(img, width, height)
+
+    # Caption and brand badge come from the worker's layer cache: every idea
+    # with the same message, brand and ratio reuses the same rendered patches
+    message_family = font_registry.family_for(language_code, message)
+    brand_family = font_registry.family_for(text=brand_name or "")
+    for position, patch in overlay_layer(message, brand_name, message_family, brand_family, width, height):
+        # The patch alpha blends it over the base (C-level "over" onto an opaque image)
+        img.paste(patch, position, patch)
+
+    # Composite brand logo if provided
+    if logo:
+        logo_width, logo_height, logo_data = logo
+        # Position logo in top-left corner with padding
+        img.paste(
+            Image.frombytes('RGB', (logo_width, logo_height), logo_data),
+            (int(width * 0.05), int(height * 0.05))
+        )
+
+    # Encode the image (progressive: browsers paint a full-size preview early)
+    output = io.BytesIO()
+    img.save(output, 'JPEG', quality=95, progressive=True, optimize=True)
+    return output.getvalue()
+
+
+@functools.lru_cache(maxsize=int(os.getenv("OVERLAY_LAYER_CACHE_SIZE", "32")))
+def overlay_layer(
+    message: str,
+    brand_name: Optional[str],
+    message_family: str,
+    brand_family: str,
+    width: int,
+    height: int
+) -> Tuple[Tuple[Tuple[int, int], "Image.Image"], ...]:
+    """
+    Render the caption and brand badge once as RGBA patches for a width x height
+    image. Returns ((x, y), patch) pairs; everything outside them is transparent.
+    """
+    # Campaign message on a translucent black box at bottom center: wrapped by
+    # pixel width and auto-sized (at most 6% of the height) to fit 84% x 30% of
+    # the frame, shrinking as far as 2% of the short side before splitting words
+    padding = int(height * 0.03)
+    message_layout = text_layout.fit(
+        message, message_family,
+        max_width=width * 0.84 - 2 * padding,
+        max_height=height * 0.3,
+        max_size=int(height * 0.06),
+        min_size=max(12, int(min(width, height) * 0.02))
+    )
+    message_x = (width - message_layout.width) // 2
+    message_y = height - message_layout.height - int(height * 0.1)
+    patches = [(
+        (message_x - padding, message_y - padding),
+        _text_patch(message_layout, padding, box=(0, 0, 0, 180), ink=(255, 255, 255))
+    )]
+
+    # Brand name on a translucent white badge in the top-right corner (one line)
+    if brand_name:
+        brand_padding = int(height * 0.02)
+        brand_layout = text_layout.fit(
+            brand_name.upper(), brand_family,
+            max_width=width * 0.4,
+            max_height=height * 0.08,
+            max_size=int(height * 0.04),
+            min_size=max(10, int(min(width, height) * 0.015)),
+            max_lines=1
+        )
+        brand_x = width - brand_layout.width - int(width * 0.05)
+        brand_y = int(height * 0.05)
+        patches.append((
+            (brand_x - brand_padding, brand_y - brand_padding),
+            _text_patch(brand_layout, brand_padding, box=(255, 255, 255, 200), ink=(0, 0, 0))
+        ))
+    return tuple(patches)
+
+
+def _text_patch(layout: TextLayout, padding: int, box, ink):
+    """RGBA patch: a translucent box with centered lines of opaque text alpha-composited over it"""
+    from PIL import Image, ImageDraw
+
+    size = (layout.width + 2 * padding, layout.height + 2 * padding)
+    patch = Image.new("RGBA", size, box)
+    # Text on its own transparent layer so glyph edges blend over the box, not replace it
+    text_layer = Image.new("RGBA", size, ink + (0,))
+    draw = ImageDraw.Draw(text_layer)
+    for index, (line, line_width) in enumerate(zip(layout.lines, layout.line_widths)):
+        x = padding + (layout.width - line_width) // 2
+        y = padding + index * layout.line_height
+        draw.text((x, y), line, fill=ink + (255,), font=layout.font)
+    return Image.alpha_composite(patch, text_layer)
+
+
+def reframe_to_jpeg(image_source: Union[bytes, str], width: int, height: int) -> bytes:
+    """Crop/pad a master render to width x height without overlays (pool worker)"""
+    output = io.BytesIO()
+    reframe(_open_rgb(image_source), width, height).save(output, 'JPEG', quality=95, progressive=True, optimize=True)
+    return output.getvalue()
+
+
+# Pillow save() arguments per rendition format
+RENDITION_ENCODERS = {
+    "avif": ("AVIF", {"quality": 60}),
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "progressive": True, "optimize": True}),
+}
+RENDITION_EXTENSIONS = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+
+def write_renditions(source_path: str, out_dir: str, widths: Tuple[int, ...], formats: Tuple[str, ...]) -> int:
+    """
+    Write downscaled copies of a finished creative as {width}x{height}.{ext} in
+    out_dir, one per width and format (pool worker). Widths at or above the
+    source size collapse to the source size, where the JPEG is skipped because
+    the master already is one. Returns the number of files written.
+    """
+    from PIL import Image
+
+    os.makedirs(out_dir, exist_ok=True)
+    img = _open_rgb(source_path)
+    written = 0
+    for width in sorted({min(w, img.width) for w in widths}):
+        height = max(1, round(img.height * width / img.width))
+        resized = img if width == img.width else img.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            if fmt == "jpeg" and width == img.width:
+                continue
+            pil_format, options = RENDITION_ENCODERS[fmt]
+            path = os.path.join(out_dir, f"{width}x{height}.{RENDITION_EXTENSIONS[fmt]}")
+            # Write under a temporary name so a reader never sees a partial file
+            temp_path = f"{path}.tmp"
+            resized.save(temp_path, pil_format, **options)
+            os.replace(temp_path, path)
+            written += 1
+    return written
+
+
+def write_thumbnails(source_path: str, targets: Dict[int, str]) -> int:
+    """
+    Write thumbnails of an image, each fitted inside a size x size box, to the
+    target path for its size (pool worker). PNG targets keep transparency; JPEG
+    ones are flattened. Returns the number of files written.
+    """
+    from PIL import Image
+
+    with Image.open(source_path) as opened:
+        # JPEG decodes straight to a reduced scale close to the largest thumbnail
+        largest = max(targets)
+        opened.draft("RGB", (largest, largest))
+        img = opened.convert("RGBA" if opened.mode in ("RGBA", "LA", "P") else "RGB")
+    written = 0
+    # Largest first so each smaller thumbnail is resampled from the previous one
+    for size in sorted(targets, reverse=True):
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        path = targets[size]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        if path.lower().endswith(".png"):
+            img.save(temp_path, "PNG", optimize=True)
+        else:
+            img.convert("RGB").save(temp_path, "JPEG", quality=82, progressive=True, optimize=True)
+        os.replace(temp_path, path)
+        written += 1
+    return written
+
+
+def _open_rgb(image_source: Union[bytes, str]):
+    from PIL import Image
+
+    source = io.BytesIO(image_source) if isinstance(image_source, bytes) else image_source
+    with Image.open(source) as opened:
+        return opened.convert("RGB")
+
+
+def _warm_worker():
+    """Pool initializer: read font files before the first composite arrives"""
+    font_registry.get_font("sans", 24)
+    font_registry.get_font("cjk", 24)
+
+
+class ImageProcessor:
+    """
+    Runs image post-processing functions in a process pool.
+
+    IMAGE_PROCESS_WORKERS=0 runs them in a thread instead (no extra processes),
+    which still keeps the event loop free but shares the GIL.
+    """
+
+    def __init__(self):
+        default_workers = min(4, os.cpu_count() or 1)
+        self.max_workers = int(os.getenv("IMAGE_PROCESS_WORKERS", str(default_workers)))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.queue_depth = 0
+        self.peak_queue_depth = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.max_workers <= 0:
+            return None
+        if self._executor is None:
+            # spawn: forking a process that already runs an event loop and threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker
+            )
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) in the pool and await its result"""
+        self.queue_depth += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            executor = self._get_executor()
+            if executor is None:
+                result = await asyncio.to_thread(fn, *args)
+            else:
+                loop = asyncio.get_running_loop()
+                try:
+                    result = await loop.run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    # A worker died (OOM, codec crash): replace the pool and retry once
+                    self._discard(executor)
+                    executor = self._get_executor()
+                    try:
+                        result = await loop.run_in_executor(executor, fn, *args)
+                    except BrokenProcessPool:
+                        # Leave a clean pool for the next call
+                        self._discard(executor)
+                        raise
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.queue_depth -= 1
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        # Only the first caller to see a broken pool replaces it
+        if self._executor is executor:
+            self._executor = None
+            self.restarts += 1
+            print("⚠️ Image process pool broke (a worker died), starting a new one")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Queue-depth and throughput counters for the metrics endpoint"""
+        return {
+            "workers": self.max_workers,
+            "mode": "process" if self.max_workers > 0 else "thread",
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts
+        }
+
+    def shutdown(self):
+        """Stop pool workers, waiting for them (async callers run this in a thread)"""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# Singleton instance
+image_processor = ImageProcessor()
@@ -0,0 +1,315 @@
+"""
+Image provider adapters.
+
+Each adapter owns one provider's request headers, payload format, response
+decoding and throttling limits. FireflyService looks adapters up by the
+configured provider name instead of branching on it.
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import httpx
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .base64_stream import stream_base64_fields
+from .firefly_jobs import firefly_job_poller
+from .image_download import image_downloader, sniff_image_type
+from .circuit_breaker import CircuitBreaker
+from .provider_limiter import ProviderLimiter
+
+
+# Provider output: in-memory bytes or a downloaded file
+ImageSource = Union[bytes, Path]
+
+
+class ImageProviderAdapter:
+    """
+    Base adapter: Bearer auth, Firefly-style payload and `outputs[0].image.url` responses.
+
+    Limits come from IMAGE_PROVIDER_<ENV_PREFIX>_MAX_IN_FLIGHT and
+    IMAGE_PROVIDER_<ENV_PREFIX>_RPM, falling back to the class defaults. Breaker
+    settings use IMAGE_PROVIDER_<ENV_PREFIX>_BREAKER_* or the shared
+    IMAGE_PROVIDER_BREAKER_* values. max_variants is how many outputs one request
+    may ask for (IMAGE_PROVIDER_<ENV_PREFIX>_MAX_VARIANTS).
+    """
+
+    names: Tuple[str, ...] = ()
+    api_url = ""
+    env_prefix = ""
+    default_max_in_flight = 4
+    default_rpm = 20.0
+    default_max_variants = 1
+    read_timeout = 30.0
+
+    def __init__(self, names: Optional[Tuple[str, ...]] = None, api_url: Optional[str] = None,
+                 env_prefix: Optional[str] = None):
+        self.names = names or self.names
+        self.api_url = api_url or self.api_url
+        self.env_prefix = env_prefix or self.env_prefix
+        max_in_flight = int(os.getenv(
+            f"IMAGE_PROVIDER_{self.env_prefix}_MAX_IN_FLIGHT", str(self.default_max_in_flight)
+        ))
+        rpm = float(os.getenv(f"IMAGE_PROVIDER_{self.env_prefix}_RPM", str(self.default_rpm)))
+        self.limiter = ProviderLimiter(max_in_flight, rpm)
+        self.max_variants = max(1, int(self._setting("MAX_VARIANTS", str(self.default_max_variants))))
+        self.breaker = CircuitBreaker(
+            self.name,
+            failure_threshold=int(self._setting("BREAKER_FAILURES", "5")),
+            recovery_timeout=float(self._setting("BREAKER_RESET_SECONDS", "60"))
+        )
+
+    def _setting(self, name: str, default: str) -> str:
+        return os.getenv(
+            f"IMAGE_PROVIDER_{self.env_prefix}_{name}",
+            os.getenv(f"IMAGE_PROVIDER_{name}", default)
+        )
+
+    @property
+    def name(self) -> str:
+        return self.names[0]
+
+    def build_headers(self, api_key: str, db: Session = None) -> dict:
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, prompt: str, aspect_ratio: str, dimensions: dict, variants: int = 1) -> dict:
+        payload = {
+            "prompt": prompt,
+            "size": dimensions,
+            "contentClass": "photo",
+            "style": {
+                "presets": ["professional", "vibrant"]
+            }
+        }
+        if variants > 1:
+            payload["numVariations"] = variants
+        return payload
+
+    async def read_body(self, response: httpx.Response):
+        """
+        Consume a successful streaming response while the request slot is held.
+
+        Default: parse the (small) JSON body.
+        """
+        await response.aread()
+        data = response.json()
+        print(f"Response data keys: {data.keys()}")
+        return data
+
+    async def decode_response(self, body, client: httpx.AsyncClient, headers: Optional[dict] = None) -> Tuple[List[ImageSource], Optional[str]]:
+        """
+        Turn read_body's result into (raw images, provider job id), one image per output.
+
+        Each image is either bytes or the Path of a file the caller takes ownership of.
+        headers are the request headers, for providers that make follow-up calls.
+        """
+        job_id = body.get("id")
+        image_urls = [output["image"]["url"] for output in body["outputs"]]
+
+        print(f"Downloading {len(image_urls)} image(s) from: {image_urls}")
+
+        # Stream the generated images to disk concurrently instead of buffering them
+        results = await asyncio.gather(
+            *(image_downloader.download(url, timeout=self.read_timeout) for url in image_urls),
+            return_exceptions=True
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            for result in results:
+                if isinstance(result, Path):
+                    result.unlink(missing_ok=True)
+            raise errors[0]
+        return results, job_id
+
+
+class FireflyAdapter(ImageProviderAdapter):
+    """Adobe Firefly v3: IMS bearer token plus the client id as x-api-key"""
+
+    names = ("Adobe Firefly",)
+    api_url = "https://firefly-api.adobe.io/v3/images/generate"
+    env_prefix = "FIREFLY"
+    default_max_variants = 4
+
+    def __init__(self):
+        super().__init__()
+        # Async job mode: submit to generate-async and let the shared poller wait for the result
+        self.async_jobs = os.getenv("FIREFLY_ASYNC_JOBS", "false").lower() == "true"
+        if self.async_jobs:
+            self.api_url = os.getenv(
+                "FIREFLY_ASYNC_API_URL", "https://firefly-api.adobe.io/v3/images/generate-async"
+            )
+
+    def build_headers(self, api_key: str, db: Session = None) -> dict:
+        from .key_service import key_service
+
+        # For Adobe Firefly, x-api-key should be the client_id, not the JWT
+        client_id = key_service.get_value(db, "adobe_client_id")
+        print(f"Using Adobe client_id for x-api-key: {client_id}")
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "x-api-key": client_id if client_id else api_key
+        }
+
+    async def decode_response(self, body, client: httpx.AsyncClient, headers: Optional[dict] = None) -> Tuple[List[ImageSource], Optional[str]]:
+        if "statusUrl" in body and "outputs" not in body:
+            job_id = body.get("jobId")
+            print(f"⏳ Firefly job {job_id} submitted, waiting for result...")
+            result = await firefly_job_poller.wait(job_id, body["statusUrl"], headers or {})
+            image_paths, _ = await super().decode_response(result, client, headers)
+            return image_paths, job_id
+        return await super().decode_response(body, client, headers)
+
+
+class OpenAIAdapter(ImageProviderAdapter):
+    """OpenAI DALL-E 3, returning base64 JSON"""
+
+    names = ("OpenAI", "DALL-E")
+    api_url = "https://api.openai.com/v1/images/generations"
+    env_prefix = "OPENAI"
+    default_max_in_flight = 5
+    default_rpm = 15.0
+    # Base64 image data can be several MB and takes longer to transmit
+    read_timeout = 120.0
+    # DALL-E 3 only accepts n=1; variants are requested as parallel calls
+    default_max_variants = 1
+
+    size_map = {
+        "16:9": "1792x1024",  # DALL-E 3 landscape
+        "9:16": "1024x1792",  # DALL-E 3 portrait
+        "1:1": "1024x1024"    # DALL-E 3 square
+    }
+
+    def build_payload(self, prompt: str, aspect_ratio: str, dimensions: dict, variants: int = 1) -> dict:
+        return {
+            "model": "dall-e-3",
+            "prompt": prompt,
+            "n": variants,
+            "size": self.size_map.get(aspect_ratio, "1024x1024"),
+            "quality": "standard",
+            "response_format": "b64_json"  # Get base64 instead of URL to avoid Azure blob auth issues
+        }
+
+    async def read_body(self, response: httpx.Response) -> List[Path]:
+        # Decode the base64 fields as they stream in rather than parsing the whole JSON body
+        return await stream_base64_fields(
+            response, "b64_json", image_downloader.download_dir, limit=self.max_variants
+        )
+
+    async def decode_response(self, body: List[Path], client: httpx.AsyncClient, headers: Optional[dict] = None) -> Tuple[List[ImageSource], Optional[str]]:
+        try:
+            for path in body:
+                self._validate(path)
+        except HTTPException:
+            for path in body:
+                path.unlink(missing_ok=True)
+            raise
+        return body, None
+
+    def _validate(self, path: Path):
+        size = path.stat().st_size
+        if size == 0:
+            print(f"❌ Decoded image is empty!")
+            raise HTTPException(
+                status_code=500,
+                detail="Decoded image from DALL-E is empty"
+            )
+
+        # Verify it's a valid image format
+        with open(path, "rb") as f:
+            head = f.read(12)
+        if sniff_image_type(head) not in ("image/jpeg", "image/png"):
+            print(f"❌ Decoded content is not a valid image!")
+            print(f"Content preview: {head}")
+            raise HTTPException(
+                status_code=500,
+                detail="Decoded content from DALL-E is not a valid image"
+            )
+
+
+class FreepikAdapter(ImageProviderAdapter):
+    """Freepik text-to-image, returning base64 JSON"""
+
+    names = ("Freepik",)
+    api_url = "https://api.freepik.com/v1/ai/text-to-image"
+    env_prefix = "FREEPIK"
+    default_rpm = 30.0
+    default_max_variants = 4
+    read_timeout = 120.0
+
+    def build_headers(self, api_key: str, db: Session = None) -> dict:
+        return {
+            "x-freepik-api-key": api_key,
+            "Content-Type": "application/json"
+        }
+
+    def build_payload(self, prompt: str, aspect_ratio: str, dimensions: dict, variants: int = 1) -> dict:
+        payload = {
+            "prompt": prompt,
+            "size": dimensions,
+            "contentClass": "photo"
+        }
+        if variants > 1:
+            payload["num_images"] = variants
+        return payload
+
+    async def read_body(self, response: httpx.Response) -> List[Path]:
+        return await stream_base64_fields(
+            response, "base64", image_downloader.download_dir, limit=self.max_variants
+        )
+
+    async def decode_response(self, body: List[Path], client: httpx.AsyncClient, headers: Optional[dict] = None) -> Tuple[List[ImageSource], Optional[str]]:
+        return body, None
+
+
+class ProviderRegistry:
+    """Adapters by provider name; unknown names use the Adobe Firefly adapter"""
+
+    default_provider = "Adobe Firefly"
+
+    def __init__(self):
+        self._adapters: Dict[str, ImageProviderAdapter] = {}
+
+    def register(self, adapter: ImageProviderAdapter):
+        for name in adapter.names:
+            self._adapters[name] = adapter
+
+    def get(self, provider: str) -> ImageProviderAdapter:
+        return self._adapters.get(provider) or self._adapters[self.default_provider]
+
+    def adapters(self) -> List[ImageProviderAdapter]:
+        unique = []
+        for adapter in self._adapters.values():
+            if adapter not in unique:
+                unique.append(adapter)
+        return unique
+
+    def stats(self) -> dict:
+        """Limiter and breaker state per adapter for the metrics endpoint"""
+        return {
+            adapter.name: {**adapter.limiter.stats(), "breaker": adapter.breaker.state}
+            for adapter in self.adapters()
+        }
+
+    def breaker_stats(self) -> dict:
+        return {adapter.name: adapter.breaker.stats() for adapter in self.adapters()}
+
+
+# Singleton registry with the built-in providers
+provider_registry = ProviderRegistry()
+provider_registry.register(FireflyAdapter())
+provider_registry.register(OpenAIAdapter())
+provider_registry.register(FreepikAdapter())
+provider_registry.register(ImageProviderAdapter(
+    names=("Midjourney",), api_url="https://api.midjourney.com/v1/imagine", env_prefix="MIDJOURNEY"
+))
+provider_registry.register(ImageProviderAdapter(
+    names=("Stable Diffusion",),
+    api_url="https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image",
+    env_prefix="STABLE_DIFFUSION"
+))
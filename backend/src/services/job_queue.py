@@ -0,0 +1,373 @@
+"""
+Persistent background job queue backed by the jobs and job_events tables.
+
+Endpoints enqueue work and stream the job's events to the client; workers
+(see job_worker) claim jobs with SELECT ... FOR UPDATE SKIP LOCKED, hold a
+lease they renew with heartbeats, and retry failures with backoff. A job whose
+worker died is reclaimed by another worker once its lease expires, so work
+survives closed browser tabs and server restarts (at-least-once delivery).
+"""
+import asyncio
+import math
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models.job import Job, JobEvent
+
+TERMINAL_STATUSES = {"succeeded", "failed", "cancelled"}
+
+# Someone is waiting on the result (regenerate buttons); bulk work uses 0
+INTERACTIVE_PRIORITY = 10
+
+# (event id or None, event type, data) -> one formatted SSE message
+EventFormatter = Callable[[Optional[int], str, dict], str]
+
+
+class JobQueue:
+    """Enqueue, claim, lease and complete jobs; record and stream their events"""
+
+    def __init__(self):
+        # False runs generation inline in the request, as before the queue existed
+        self.enabled = os.getenv("JOB_QUEUE_ENABLED", "true").lower() == "true"
+        self.lease_seconds = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+        self.max_attempts = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+        self.retry_base_delay = float(os.getenv("JOB_RETRY_BASE_DELAY", "5"))
+        self.event_poll_interval = float(os.getenv("JOB_EVENT_POLL_INTERVAL", "0.5"))
+        # Sessions for work done outside a request (workers, event writes, streams)
+        self.session_factory: Callable[[], Session] = SessionLocal
+        # In-process wakeups for streams whose job runs in this process
+        self._listeners: Dict[uuid.UUID, Set[asyncio.Event]] = {}
+
+    # Synchronous operations on a caller's session
+
+    def enqueue(self, db: Session, job_type: str, payload: dict, priority: int = 0,
+                max_attempts: Optional[int] = None) -> Job:
+        """Insert a queued job"""
+        job = Job(
+            job_type=job_type,
+            status="queued",
+            payload=payload,
+            priority=priority,
+            max_attempts=max_attempts or self.max_attempts,
+            run_after=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        print(f"📥 Enqueued {job_type} job {job.id}")
+        return job
+
+    def claim(self, db: Session, worker_id: str, job_types: Optional[Iterable[str]] = None,
+              min_priority: Optional[int] = None) -> Optional[Job]:
+        """
+        Lease the next runnable job, or None.
+
+        Runnable means queued and due, or running with an expired lease. Rows
+        locked by other workers' claims are skipped rather than waited on.
+        min_priority restricts the claim to e.g. interactive jobs.
+        """
+        while True:
+            now = datetime.utcnow()
+            query = db.query(Job).filter(
+                or_(
+                    and_(Job.status == "queued", Job.run_after <= now),
+                    and_(Job.status == "running", Job.lease_expires_at < now)
+                )
+            )
+            if job_types is not None:
+                query = query.filter(Job.job_type.in_(list(job_types)))
+            if min_priority is not None:
+                query = query.filter(Job.priority >= min_priority)
+            job = (
+                query.order_by(Job.priority.desc(), Job.created_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if job is None:
+                db.rollback()
+                return None
+
+            if job.status == "running":
+                print(f"♻️ Reclaiming job {job.id} from {job.lease_owner} (lease expired)")
+                if job.attempts >= job.max_attempts:
+                    self._finish(job, "failed", error=f"Worker lease expired on final attempt ({job.attempts})")
+                    # The dead worker never emitted it; subscribers still need to hear
+                    db.add(JobEvent(job_id=job.id, event_type="job_failed",
+                                    data={"error": job.error, "attempt": job.attempts}))
+                    db.commit()
+                    continue
+
+            job.status = "running"
+            job.attempts += 1
+            job.lease_owner = worker_id
+            job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+            job.heartbeat_at = now
+            job.started_at = job.started_at or now
+            db.commit()
+            db.refresh(job)
+            return job
+
+    def heartbeat(self, db: Session, job_id: uuid.UUID, worker_id: str) -> bool:
+        """Extend the lease; False if the job was reclaimed, cancelled or finished"""
+        now = datetime.utcnow()
+        updated = db.query(Job).filter(
+            Job.id == job_id, Job.lease_owner == worker_id, Job.status == "running"
+        ).update({
+            Job.lease_expires_at: now + timedelta(seconds=self.lease_seconds),
+            Job.heartbeat_at: now
+        }, synchronize_session=False)
+        db.commit()
+        return updated == 1
+
+    def complete(self, db: Session, job_id: uuid.UUID, worker_id: str, result: Optional[dict]) -> bool:
+        job = self._owned(db, job_id, worker_id)
+        if job is None:
+            return False
+        self._finish(job, "succeeded", result=result)
+        db.commit()
+        return True
+
+    def fail(self, db: Session, job_id: uuid.UUID, worker_id: str, error: str, retryable: bool = True,
+             status_code: Optional[int] = None) -> Optional[float]:
+        """
+        Record a failed attempt, with the HTTP status of the error if it had one.
+
+        Returns the retry delay in seconds if the job was re-queued, else None.
+        """
+        job = self._owned(db, job_id, worker_id)
+        if job is None:
+            return None
+        job.error = error
+        job.error_status = status_code
+        if retryable and job.attempts < job.max_attempts:
+            delay = self.retry_base_delay * 2 ** (job.attempts - 1)
+            job.status = "queued"
+            job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+            job.lease_owner = None
+            job.lease_expires_at = None
+            db.commit()
+            return delay
+        self._finish(job, "failed", error=error)
+        db.commit()
+        return None
+
+    def release(self, db: Session, job_id: uuid.UUID, worker_id: str):
+        """Hand a job back without counting the attempt (graceful worker shutdown)"""
+        job = self._owned(db, job_id, worker_id)
+        if job is None:
+            return
+        job.status = "queued"
+        job.attempts = max(0, job.attempts - 1)
+        job.lease_owner = None
+        job.lease_expires_at = None
+        db.commit()
+
+    def cancel(self, db: Session, job_id: uuid.UUID) -> Job:
+        """Cancel a queued or running job (a running worker stops at its next heartbeat)"""
+        job = self.get_job_or_404(db, job_id)
+        if job.status not in TERMINAL_STATUSES:
+            self._finish(job, "cancelled")
+            db.commit()
+            db.refresh(job)
+        return job
+
+    def get_job_or_404(self, db: Session, job_id: uuid.UUID) -> Job:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    def add_event(self, db: Session, job_id: uuid.UUID, event_type: str, data: dict) -> JobEvent:
+        event = JobEvent(job_id=job_id, event_type=event_type, data=data)
+        db.add(event)
+        db.commit()
+        return event
+
+    def events_after(self, db: Session, job_id: uuid.UUID, after_id: int = 0, limit: int = 200) -> List[JobEvent]:
+        return (
+            db.query(JobEvent)
+            .filter(JobEvent.job_id == job_id, JobEvent.id > after_id)
+            .order_by(JobEvent.id)
+            .limit(limit)
+            .all()
+        )
+
+    def events_by_type(self, db: Session, job_id: uuid.UUID) -> Dict[str, List[dict]]:
+        """Data of every event the job has recorded so far, by event type in id order"""
+        events: Dict[str, List[dict]] = {}
+        for event_type, data in (
+            db.query(JobEvent.event_type, JobEvent.data)
+            .filter(JobEvent.job_id == job_id)
+            .order_by(JobEvent.id)
+        ):
+            events.setdefault(event_type, []).append(data)
+        return events
+
+    def position(self, db: Session, job_id: uuid.UUID) -> Optional[dict]:
+        """
+        Queue position (1 = next) and ETA of a queued job, or None once it runs.
+
+        The ETA assumes the currently running jobs' worth of capacity and the
+        average duration of the last 20 successful jobs of the same type.
+        """
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job is None or job.status != "queued":
+            return None
+        ahead = db.query(func.count(Job.id)).filter(
+            Job.status == "queued",
+            Job.run_after <= datetime.utcnow(),
+            Job.id != job.id,
+            or_(
+                Job.priority > job.priority,
+                and_(Job.priority == job.priority, Job.created_at < job.created_at)
+            )
+        ).scalar()
+        running = db.query(func.count(Job.id)).filter(Job.status == "running").scalar()
+        recent = (
+            db.query(Job.started_at, Job.finished_at)
+            .filter(Job.job_type == job.job_type, Job.status == "succeeded", Job.started_at.isnot(None))
+            .order_by(Job.finished_at.desc())
+            .limit(20)
+            .all()
+        )
+        eta = None
+        if recent:
+            average = sum((finished - started).total_seconds() for started, finished in recent) / len(recent)
+            eta = round(math.ceil((ahead + 1) / max(1, running)) * average, 1)
+        return {"position": ahead + 1, "eta_seconds": eta, "stage": "job"}
+
+    def stats(self, db: Session) -> dict:
+        counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+        return {status: counts.get(status, 0) for status in ("queued", "running", "succeeded", "failed", "cancelled")}
+
+    def _owned(self, db: Session, job_id: uuid.UUID, worker_id: str) -> Optional[Job]:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job is None or job.lease_owner != worker_id or job.status != "running":
+            print(f"⚠️ Job {job_id} is no longer leased to {worker_id}")
+            db.rollback()
+            return None
+        return job
+
+    @staticmethod
+    def _finish(job: Job, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        job.status = status
+        if result is not None:
+            job.result = result
+        if error is not None:
+            job.error = error
+        job.finished_at = datetime.utcnow()
+        job.lease_owner = None
+        job.lease_expires_at = None
+
+    # Async helpers using session_factory (off the event loop)
+
+    async def record_event(self, job_id: uuid.UUID, event_type: str, data: dict):
+        """Persist a progress event and wake local subscribers"""
+        await asyncio.to_thread(self._with_session, self.add_event, job_id, event_type, data)
+        self.notify(job_id)
+
+    def notify(self, job_id: uuid.UUID):
+        for listener in self._listeners.get(job_id, ()):
+            listener.set()
+
+    async def stream(self, job_id: uuid.UUID, format_event: EventFormatter, after_id: int = 0) -> AsyncIterator[str]:
+        """
+        Yield a job's events (from after_id on) until it reaches a terminal status.
+
+        Events written by a worker in another process are picked up by polling
+        every JOB_EVENT_POLL_INTERVAL seconds; local ones wake the stream at once.
+        """
+        wakeup = asyncio.Event()
+        self._listeners.setdefault(job_id, set()).add(wakeup)
+        reported_position = None
+        try:
+            while True:
+                wakeup.clear()
+                events, status, position = await asyncio.to_thread(self._with_session, self._poll, job_id, after_id)
+                if position is not None and position["position"] != reported_position:
+                    # Still waiting for a worker: report where it stands
+                    reported_position = position["position"]
+                    yield format_event(None, "queue", position)
+                for event_id, event_type, data in events:
+                    after_id = event_id
+                    yield format_event(event_id, event_type, data)
+                if events:
+                    continue
+                if status is None or status in TERMINAL_STATUSES:
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=self.event_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listeners = self._listeners.get(job_id)
+            if listeners is not None:
+                listeners.discard(wakeup)
+                if not listeners:
+                    self._listeners.pop(job_id, None)
+
+    async def subscribe(self, job_id: uuid.UUID, format_event: EventFormatter) -> AsyncIterator[str]:
+        """Announce the job id to the client, then stream the job's events"""
+        yield format_event(None, "job", {"job_id": str(job_id)})
+        async for message in self.stream(job_id, format_event):
+            yield message
+
+    async def run_inline(self, handler, db: Session, payload: dict, format_event: EventFormatter) -> AsyncIterator[str]:
+        """
+        Run a job handler inside the request (queue disabled) and stream what it
+        emits. Closing the stream cancels the handler, as before the queue existed.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+
+        async def emit(event_type: str, data: dict):
+            await events.put((event_type, data))
+
+        task = asyncio.create_task(handler(db, payload, emit))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while (event := await events.get()) is not None:
+                yield format_event(None, *event)
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @staticmethod
+    async def discard_event(event_type: str, data: dict):
+        """emit() for a handler called directly, with nobody subscribed"""
+
+    async def wait(self, job_id: uuid.UUID) -> Job:
+        """Wait until the job finishes and return it"""
+        async for _ in self.stream(job_id, lambda *event: ""):
+            pass
+        return await asyncio.to_thread(self._with_session, self._load, job_id)
+
+    def _poll(self, db: Session, job_id: uuid.UUID, after_id: int) -> Tuple[List[Tuple[int, str, dict]], Optional[str], Optional[dict]]:
+        # Read the status first so no event written before a terminal status is missed
+        job = db.query(Job.status).filter(Job.id == job_id).first()
+        events = self.events_after(db, job_id, after_id)
+        position = self.position(db, job_id) if job and job.status == "queued" else None
+        return [(e.id, e.event_type, e.data) for e in events], (job.status if job else None), position
+
+    def _load(self, db: Session, job_id: uuid.UUID) -> Job:
+        job = self.get_job_or_404(db, job_id)
+        db.expunge(job)
+        return job
+
+    def _with_session(self, fn, *args):
+        db = self.session_factory()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+
+
+# Singleton instance
+job_queue = JobQueue()
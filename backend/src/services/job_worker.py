@@ -0,0 +1,210 @@
+"""
+Worker pool that runs jobs from the persistent job queue.
+
+Each worker is an asyncio task that claims one job at a time, runs its
+registered handler with a fresh DB session and renews the job's lease with
+heartbeats while it runs. JOB_WORKERS workers run inside every API process;
+more capacity comes from standalone worker processes (`python -m src.worker`),
+which claim from the same table with SKIP LOCKED.
+"""
+import asyncio
+import os
+import socket
+import uuid
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .job_queue import INTERACTIVE_PRIORITY, job_queue
+
+# emit(event_type, data): record a progress event for the job's subscribers
+Emit = Callable[[str, dict], Awaitable[None]]
+# handler(db, payload, emit) -> result stored on the job
+JobHandler = Callable[[Session, dict, Emit], Awaitable[Optional[dict]]]
+
+# Events that earlier attempts of the running job recorded, by type
+_earlier_events: ContextVar[Optional[Dict[str, List[dict]]]] = ContextVar("job_earlier_events", default=None)
+
+
+def earlier_events(event_type: str) -> List[dict]:
+    """
+    Data of the event_type events that earlier attempts of the running job
+    emitted (empty on a first attempt and outside workers). Handlers skip work
+    these show as done, so a retried or reclaimed job does not repeat it.
+    """
+    events = _earlier_events.get()
+    return list(events.get(event_type, ())) if events else []
+
+
+class JobWorkerPool:
+    """Claims and runs queued jobs with leases, heartbeats and retries"""
+
+    def __init__(self):
+        # Each running worker holds a DB session for its handler; the engine pool
+        # (db.py) is sized from this, provider concurrency by the generation scheduler
+        self.concurrency = max(0, int(os.getenv("JOB_WORKERS", "4")))
+        # Extra workers that only take interactive jobs, so regenerate clicks never
+        # wait for a worker behind long bulk jobs
+        self.interactive_concurrency = max(0, int(os.getenv("JOB_INTERACTIVE_WORKERS", "1")))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.heartbeat_interval = float(os.getenv("JOB_HEARTBEAT_SECONDS", "15"))
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.running = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def handler(self, job_type: str):
+        """Decorator registering the coroutine that runs jobs of job_type"""
+        def register(fn: JobHandler) -> JobHandler:
+            self._handlers[job_type] = fn
+            return fn
+        return register
+
+    def wake(self):
+        """Let idle workers in this process claim a just-enqueued job without waiting a poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self, concurrency: Optional[int] = None, interactive: Optional[int] = None):
+        concurrency = self.concurrency if concurrency is None else concurrency
+        interactive = self.interactive_concurrency if interactive is None else interactive
+        if self._tasks or concurrency + interactive == 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(f"{index}")) for index in range(concurrency)]
+        self._tasks += [
+            asyncio.create_task(self._worker(f"i{index}", INTERACTIVE_PRIORITY)) for index in range(interactive)
+        ]
+        print(f"👷 Started {concurrency} job worker(s) + {interactive} interactive for {sorted(self._handlers)}")
+
+    async def stop(self):
+        """Cancel workers; jobs they were running go back to the queue"""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        self._wakeup = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._tasks),
+            "running": self.running,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "retried": self.retried,
+            "job_types": sorted(self._handlers)
+        }
+
+    async def _worker(self, name: str, min_priority: Optional[int] = None):
+        worker_id = f"{self.worker_prefix}:{name}"
+        while True:
+            try:
+                job = await asyncio.to_thread(
+                    job_queue._with_session, job_queue.claim, worker_id, list(self._handlers), min_priority
+                )
+            except Exception as e:
+                print(f"⚠️ Job worker {worker_id} could not claim a job: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job.id, job.job_type, job.payload, worker_id, job.attempts)
+
+    async def run_job(self, job_id: uuid.UUID, job_type: str, payload: dict, worker_id: str, attempt: int = 1):
+        """Run one claimed job to completion, failure or lease loss"""
+        handler = self._handlers[job_type]
+        print(f"▶️ {worker_id} running {job_type} job {job_id} (attempt {attempt})")
+
+        async def emit(event_type: str, data: dict):
+            await job_queue.record_event(job_id, event_type, data)
+
+        # A retry or reclaimed lease resumes from what earlier attempts recorded
+        earlier = None
+        if attempt > 1:
+            earlier = await asyncio.to_thread(job_queue._with_session, job_queue.events_by_type, job_id)
+
+        lease_lost = asyncio.Event()
+        task = asyncio.create_task(self._call(handler, payload, emit, earlier))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, worker_id, task, lease_lost))
+        self.running += 1
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            task.cancel()
+            if lease_lost.is_set():
+                # Cancelled, or reclaimed by another worker after a missed heartbeat
+                print(f"⏹️ {worker_id} stopped job {job_id}: lease lost")
+                return
+            # This worker is shutting down: give the job back without spending an attempt
+            await asyncio.to_thread(job_queue._with_session, job_queue.release, job_id, worker_id)
+            raise
+        except Exception as e:
+            error = str(getattr(e, "detail", None) or e) or type(e).__name__
+            # Provider and request failures surface as HTTPException: the provider
+            # client already retried them, and a 4xx (content rejected, creative
+            # deleted meanwhile) will not succeed on retry. Only infrastructure
+            # errors (database, filesystem) re-run the job.
+            retryable = not isinstance(e, HTTPException)
+            status_code = e.status_code if isinstance(e, HTTPException) else None
+            delay = await asyncio.to_thread(
+                job_queue._with_session, job_queue.fail, job_id, worker_id, error, retryable, status_code
+            )
+            if delay is not None:
+                self.retried += 1
+                print(f"🔁 {job_type} job {job_id} failed ({error}), retrying in {delay:.0f}s")
+                await emit("job_retry", {"error": error, "attempt": attempt, "retry_in": delay})
+            else:
+                self.failed += 1
+                print(f"❌ {job_type} job {job_id} failed: {error}")
+                await emit("job_failed", {"error": error, "attempt": attempt})
+            # Wake subscribers waiting on the status change
+            job_queue.notify(job_id)
+        else:
+            await asyncio.to_thread(job_queue._with_session, job_queue.complete, job_id, worker_id, result)
+            self.succeeded += 1
+            job_queue.notify(job_id)
+            print(f"✅ {job_type} job {job_id} succeeded")
+        finally:
+            self.running -= 1
+            heartbeat.cancel()
+
+    async def _call(self, handler: JobHandler, payload: dict, emit: Emit,
+                    earlier: Optional[Dict[str, List[dict]]] = None) -> Optional[dict]:
+        _earlier_events.set(earlier)
+        db = job_queue.session_factory()
+        try:
+            return await handler(db, payload, emit)
+        finally:
+            db.close()
+
+    async def _heartbeat(self, job_id: uuid.UUID, worker_id: str, task: asyncio.Task, lease_lost: asyncio.Event):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                still_ours = await asyncio.to_thread(job_queue._with_session, job_queue.heartbeat, job_id, worker_id)
+            except Exception as e:
+                # Keep running; the lease only lapses if heartbeats keep failing
+                print(f"⚠️ Heartbeat for job {job_id} failed: {e}")
+                continue
+            if not still_ours:
+                lease_lost.set()
+                task.cancel()
+                return
+
+
+# Singleton instance
+job_worker_pool = JobWorkerPool()
@@ -2,11 +2,16 @@
 LLM integration service for generating creative ideas.
 """
 import os
+import time
 import httpx
 from typing import List, Dict
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
+from .http_client import http_client
+from .generation_scheduler import generation_scheduler
+from .provider_ledger import provider_ledger
+
 
 class LLMService:
     """Handles LLM API integration for idea generation"""
@@ -132,6 +137,9 @@ class LLMService:
             print(f"Reason: API key is empty or placeholder")
             print(f"Action: Generating mock creative idea")
             print(f"{'='*80}\n")
+            provider_ledger.event(
+                "llm", self._provider_name(api_url), model, status="mock", error="No API key configured"
+            )
             content = self._get_mock_idea(region, demographic, campaign_message, language_code)
         else:
             # Use actual LLM API
@@ -218,20 +226,24 @@ Generate a creative concept that:
 
 Creative Idea:"""
     
-    async def _call_llm_api(self, prompt: str, api_key: str, api_url: str, model: str) -> str:
-        """Call LLM API to generate content"""
-        # Determine provider from model/url
-        provider = "Unknown"
+    @staticmethod
+    def _provider_name(api_url: str) -> str:
+        """Determine provider from the API URL"""
         if "openai" in api_url:
-            provider = "OpenAI"
+            return "OpenAI"
         elif "anthropic" in api_url:
-            provider = "Anthropic"
+            return "Anthropic"
         elif "x.ai" in api_url:
-            provider = "Grok"
+            return "Grok"
         elif "deepseek" in api_url:
-            provider = "DeepSeek"
+            return "DeepSeek"
         elif "generativelanguage.googleapis.com" in api_url:
-            provider = "Gemini"
+            return "Gemini"
+        return "Unknown"
+    
+    async def _call_llm_api(self, prompt: str, api_key: str, api_url: str, model: str) -> str:
+        """Call LLM API to generate content (one provider ledger record per call)"""
+        provider = self._provider_name(api_url)
         
         print(f"\n{'='*80}")
         print(f"🤖 LLM API REQUEST")
@@ -262,9 +274,25 @@ Creative Idea:"""
             "temperature": 0.8
         }
         
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(api_url, json=payload, headers=headers)
+        with provider_ledger.call("llm", provider, model) as call:
+            try:
+                client = http_client.client
+                call.start_attempt()
+                queued = time.perf_counter()
+                async with generation_scheduler.slot("llm"):
+                    call.add_since("queue", queued)
+                    sent = time.perf_counter()
+                    async with client.stream(
+                        "POST", api_url, json=payload, headers=headers,
+                        timeout=http_client.timeout(read=self.timeout),
+                        extensions={"trace": call.trace}
+                    ) as response:
+                        call.response_started(sent)
+                        with call.phase("download"):
+                            await response.aread()
+                call.http_status = response.status_code
+                call.request_bytes = int(response.request.headers.get("Content-Length", 0))
+                call.response_bytes = response.num_bytes_downloaded
                 
                 print(f"LLM Response status: {response.status_code}")
                 
@@ -326,6 +354,9 @@ Creative Idea:"""
                 
                 data = response.json()
                 content = data["choices"][0]["message"]["content"].strip()
+                usage = data.get("usage") or {}
+                call.prompt_tokens = usage.get("prompt_tokens")
+                call.completion_tokens = usage.get("completion_tokens")
                 
                 print(f"\n{'='*80}")
                 print(f"✅ LLM API SUCCESS!")
@@ -336,40 +367,40 @@ Creative Idea:"""
                 print(f"{'='*80}\n")
                 
                 return content
-        
-        except httpx.HTTPError as e:
-            print("\n" + "="*80)
-            print("🚨 LLM API HTTP ERROR 🚨")
-            print("="*80)
-            print(f"Provider: {provider}")
-            print(f"Model: {model}")
-            print(f"Error: {e}")
-            if hasattr(e, 'response'):
-                print(f"Status Code: {e.response.status_code}")
-                print(f"Response Text: {e.response.text}")
-                print(f"Response Headers: {e.response.headers}")
-            else:
-                print("No response available")
-            print("="*80 + "\n")
-            raise HTTPException(
-                status_code=500,
-                detail=f"LLM API error ({provider}): {str(e)}"
-            ) from e
-        except Exception as e:
-            print("\n" + "="*80)
-            print("🚨 UNEXPECTED LLM ERROR 🚨")
-            print("="*80)
-            print(f"Provider: {provider}")
-            print(f"Model: {model}")
-            print(f"Error Type: {type(e).__name__}")
-            print(f"Error: {str(e)}")
-            import traceback
-            print(f"Traceback:\n{traceback.format_exc()}")
-            print("="*80 + "\n")
-            raise HTTPException(
-                status_code=500,
-                detail=f"Unexpected error in LLM generation ({provider}): {str(e)}"
-            )
+            
+            except httpx.HTTPError as e:
+                print("\n" + "="*80)
+                print("🚨 LLM API HTTP ERROR 🚨")
+                print("="*80)
+                print(f"Provider: {provider}")
+                print(f"Model: {model}")
+                print(f"Error: {e}")
+                if hasattr(e, 'response'):
+                    print(f"Status Code: {e.response.status_code}")
+                    print(f"Response Text: {e.response.text}")
+                    print(f"Response Headers: {e.response.headers}")
+                else:
+                    print("No response available")
+                print("="*80 + "\n")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"LLM API error ({provider}): {str(e)}"
+                ) from e
+            except Exception as e:
+                print("\n" + "="*80)
+                print("🚨 UNEXPECTED LLM ERROR 🚨")
+                print("="*80)
+                print(f"Provider: {provider}")
+                print(f"Model: {model}")
+                print(f"Error Type: {type(e).__name__}")
+                print(f"Error: {str(e)}")
+                import traceback
+                print(f"Traceback:\n{traceback.format_exc()}")
+                print("="*80 + "\n")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Unexpected error in LLM generation ({provider}): {str(e)}"
+                )
     
     def _get_language_for_region(self, region: str) -> str:
         """Map region to language code"""
@@ -0,0 +1,159 @@
+"""
+Perceptual hashes for spotting near-duplicate creatives.
+
+Each creative gets a 64-bit difference hash (dHash): the image is shrunk to 9x8
+grayscale and every bit records whether a pixel is brighter than its right-hand
+neighbour. Re-encodes, small crops and colour shifts barely change it, so two
+creatives a few bits apart are near-duplicates (provider retries, mock
+fallbacks).
+
+HammingIndex finds every hash within a distance d without scanning: hashes are
+split into three slices with per-slice radii r1 + r2 + r3 = d - 2. If two
+hashes differed by more than r_i bits in every slice they would be at least
+d + 1 apart, so a query only checks the buckets within r_i bit flips of each of
+its slices (generalised pigeonhole, as in multi-index hashing).
+"""
+import itertools
+import os
+from typing import Dict, Generic, List, Optional, Tuple, TypeVar
+
+from .file_handler import file_handler
+from .image_processor import image_processor
+
+HASH_BITS = 64
+_MASK = (1 << HASH_BITS) - 1
+# (shift, width) of the 22/21/21-bit slices
+_SLICES = ((0, 22), (22, 21), (43, 21))
+
+T = TypeVar("T")
+
+
+def dhash(source_path: str) -> int:
+    """64-bit difference hash of an image, as a signed int for a BIGINT column (pool worker)"""
+    from PIL import Image
+
+    with Image.open(source_path) as opened:
+        opened.draft("L", (64, 64))
+        pixels = list(opened.convert("L").resize((9, 8), Image.Resampling.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def hamming(a: int, b: int) -> int:
+    """Bits that differ between two hashes (signed or unsigned)"""
+    return ((a ^ b) & _MASK).bit_count()
+
+
+def _flip_masks(width: int, radius: int) -> Tuple[int, ...]:
+    """XOR masks reaching every `width`-bit slice value within `radius` bit flips"""
+    masks = _FLIP_MASKS.get((width, radius))
+    if masks is None:
+        masks = tuple(
+            sum(1 << bit for bit in bits)
+            for count in range(radius + 1)
+            for bits in itertools.combinations(range(width), count)
+        )
+        _FLIP_MASKS[(width, radius)] = masks
+    return masks
+
+
+_FLIP_MASKS: Dict[Tuple[int, int], Tuple[int, ...]] = {}
+
+
+def _radii(max_distance: int) -> List[int]:
+    """Per-slice search radii summing to max_distance - (slices - 1); narrow slices take the extra bit"""
+    budget = max(0, max_distance - len(_SLICES) + 1)
+    base, extra = divmod(budget, len(_SLICES))
+    return [base + (index >= len(_SLICES) - extra) for index in range(len(_SLICES))]
+
+
+class HammingIndex(Generic[T]):
+    """Multi-index hashing over 64-bit hashes: radius queries in a handful of bucket probes"""
+
+    def __init__(self):
+        self._hashes: List[int] = []
+        self._items: List[T] = []
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in _SLICES]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, value: int, item: T):
+        value &= _MASK
+        position = len(self._hashes)
+        self._hashes.append(value)
+        self._items.append(item)
+        for (shift, width), table in zip(_SLICES, self._tables):
+            key = (value >> shift) & ((1 << width) - 1)
+            bucket = table.get(key)
+            if bucket is None:
+                table[key] = [position]
+            else:
+                bucket.append(position)
+
+    def search(self, value: int, max_distance: int) -> List[Tuple[int, T]]:
+        """(distance, item) for every hash within max_distance, closest first"""
+        value &= _MASK
+        hashes = self._hashes
+        matches: Dict[int, int] = {}
+        for (shift, width), radius, table in zip(_SLICES, _radii(max_distance), self._tables):
+            key = (value >> shift) & ((1 << width) - 1)
+            for mask in _flip_masks(width, radius):
+                bucket = table.get(key ^ mask)
+                if bucket is None:
+                    continue
+                # Verify in place: far fewer hashes match than are probed
+                for position in bucket:
+                    distance = (hashes[position] ^ value).bit_count()
+                    if distance <= max_distance:
+                        matches[position] = distance
+        ordered = sorted((distance, position) for position, distance in matches.items())
+        return [(distance, self._items[position]) for distance, position in ordered]
+
+
+class PerceptualHashService:
+    """Hashes creatives and flags near-duplicates within a group"""
+
+    def __init__(self):
+        # dHash bits that may differ for two creatives to count as near-duplicates
+        self.max_distance = int(os.getenv("DUPLICATE_MAX_DISTANCE", "6"))
+
+    async def hash_file(self, file_path: str) -> Optional[int]:
+        """dHash of an image (its smallest thumbnail when there is one), None if unreadable"""
+        thumbnails = file_handler.thumbnails_for(file_path)
+        source = thumbnails[min(thumbnails, key=int)] if thumbnails else file_path
+        if not os.path.isfile(source):
+            return None
+        try:
+            return await image_processor.run(dhash, str(source))
+        except Exception as e:
+            print(f"⚠️  Could not hash {file_path}: {e}")
+            return None
+
+    def find_duplicates(self, entries: List[Tuple[object, T, Optional[int]]]) -> Dict[T, T]:
+        """
+        Map each near-duplicate to the earliest entry it matches in its group.
+
+        entries are (group, item, hash) in creation order; entries without a hash
+        are never flagged.
+        """
+        indexes: Dict[object, HammingIndex] = {}
+        duplicates: Dict[T, T] = {}
+        for group, item, value in entries:
+            if value is None:
+                continue
+            index = indexes.setdefault(group, HammingIndex())
+            matches = index.search(value, self.max_distance)
+            if matches:
+                # Only originals are indexed, so the closest match is one
+                duplicates[item] = matches[0][1]
+            else:
+                index.add(value, item)
+        return duplicates
+
+
+# Singleton instance
+perceptual_hash_service = PerceptualHashService()
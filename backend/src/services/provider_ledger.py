@@ -0,0 +1,440 @@
+"""
+Append-only ledger of every LLM and image provider call.
+
+Each call records its outcome (success, error, rate limit, mock fallback,
+cache hit...), the provider and model that served it, per-phase timings and
+usage (bytes, images, tokens). Provider code only appends records to an
+in-memory buffer; a background task writes them in batches off the event
+loop, so the ledger never adds a DB round trip to a generation. When the
+buffer is full (DB down or slow) new records are dropped and counted.
+
+Timing phases, in milliseconds:
+    queue     waiting for the scheduler slot and provider limiter (and 429 pauses)
+    connect   TCP connect + TLS handshake (0 on a reused keep-alive connection)
+    ttfb      request sent to response headers received (last attempt)
+    download  reading and decoding the response body, including image downloads
+              (and waiting for Firefly async jobs)
+    overlay   text/logo overlay stage for the call's outputs (after the call)
+    total     the provider call itself, including retries and backoff
+
+daily_stats aggregates p50/p95/p99 per provider per day for choosing providers
+and setting timeouts from data.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models.provider_call import ProviderCall
+from .circuit_breaker import ProviderUnavailableError
+from .generation_scheduler import generation_scheduler
+
+PHASES = ("queue", "connect", "ttfb", "download", "overlay", "total")
+QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+# Outcomes that never reached the provider; left out of latency percentiles
+NO_PROVIDER_STATUSES = ("mock", "cache_hit", "unavailable")
+_CONNECT_EVENTS = ("connection.connect_tcp", "connection.start_tls", "connection.connect_unix_socket")
+_MAX_ERROR_LENGTH = 500
+
+
+def _elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """q-quantile of sorted values, interpolated like PostgreSQL percentile_cont"""
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower, upper = math.floor(position), math.ceil(position)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+@dataclass
+class CallRecord:
+    """One provider call being measured; becomes a provider_calls row"""
+    kind: str
+    provider: str
+    model: Optional[str] = None
+    status: str = "success"
+    http_status: Optional[int] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    flow: Optional[str] = None
+    lane: Optional[str] = None
+    phases: Dict[str, float] = field(default_factory=dict)
+    request_bytes: Optional[int] = None
+    response_bytes: Optional[int] = None
+    image_bytes: Optional[int] = None
+    images: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    _marks: Dict[str, float] = field(default_factory=dict, repr=False)
+    _ttfb_traced: bool = field(default=False, repr=False)
+
+    def add(self, name: str, ms: float):
+        """Add ms to a phase (phases repeated across retries accumulate)"""
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def add_since(self, name: str, started: float):
+        """Add the time since a time.perf_counter() reading to a phase"""
+        self.add(name, _elapsed_ms(started))
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_since(name, started)
+
+    def start_attempt(self):
+        self.attempts += 1
+        self._ttfb_traced = False
+
+    def response_started(self, sent_at: float):
+        """Headers received; TTFB from sent_at unless httpcore tracing measured it"""
+        if not self._ttfb_traced:
+            self.phases["ttfb"] = _elapsed_ms(sent_at)
+
+    async def trace(self, event_name: str, info: dict):
+        """
+        httpcore trace hook, passed as extensions={"trace": record.trace}.
+
+        Splits connection setup (connect/TLS) from time to first byte.
+        """
+        now = time.perf_counter()
+        name, _, stage = event_name.rpartition(".")
+        if stage == "started":
+            self._marks[name] = now
+            return
+        started = self._marks.pop(name, None)
+        if started is None:
+            return
+        if name in _CONNECT_EVENTS:
+            self.add("connect", (now - started) * 1000)
+        elif name.endswith(".send_request_headers"):
+            self._marks["request_sent"] = started
+        elif name.endswith(".receive_response_headers") and stage == "complete":
+            sent = self._marks.pop("request_sent", started)
+            self.phases["ttfb"] = (now - sent) * 1000
+            self._ttfb_traced = True
+
+    def fail(self, error: BaseException):
+        """Classify the exception that ended the call (or the one it wraps)"""
+        cause = error.__cause__ or error
+        if isinstance(error, asyncio.CancelledError):
+            self.status = "cancelled"
+        elif isinstance(error, ProviderUnavailableError):
+            self.status = "unavailable"
+        elif isinstance(cause, httpx.TimeoutException):
+            self.status = "timeout"
+        else:
+            if isinstance(cause, httpx.HTTPStatusError):
+                self.http_status = cause.response.status_code
+            rate_limited = 429 in (getattr(error, "status_code", None), self.http_status)
+            self.status = "rate_limited" if rate_limited else "error"
+        self.error = (str(getattr(error, "detail", "") or error) or type(error).__name__)[:_MAX_ERROR_LENGTH]
+
+    def to_row(self) -> dict:
+        row = {
+            "created_at": self.created_at,
+            "kind": self.kind,
+            "provider": self.provider,
+            "model": self.model,
+            "status": self.status,
+            "http_status": self.http_status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "flow": self.flow,
+            "lane": self.lane,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+            "image_bytes": self.image_bytes,
+            "images": self.images,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens
+        }
+        for name in PHASES:
+            value = self.phases.get(name)
+            row[f"{name}_ms"] = None if value is None else round(value, 3)
+        return row
+
+
+class CallGroup:
+    """Records held back until a later stage (overlays) has added its timing"""
+
+    def __init__(self):
+        self.records: List[CallRecord] = []
+        self.token = None
+
+    def add_since(self, name: str, started: float):
+        for record in self.records:
+            record.add_since(name, started)
+
+
+_group: ContextVar[Optional[CallGroup]] = ContextVar("provider_ledger_group", default=None)
+
+
+class ProviderLedger:
+    """Buffers provider call records and writes them to provider_calls in batches"""
+
+    def __init__(self):
+        self.enabled = os.getenv("PROVIDER_LEDGER_ENABLED", "true").lower() == "true"
+        self.batch_size = max(1, int(os.getenv("PROVIDER_LEDGER_BATCH_SIZE", "100")))
+        self.flush_interval = float(os.getenv("PROVIDER_LEDGER_FLUSH_SECONDS", "2.0"))
+        # Records buffered beyond this are dropped rather than growing without bound
+        self.max_pending = max(1, int(os.getenv("PROVIDER_LEDGER_MAX_PENDING", "10000")))
+        self.session_factory: Callable[[], Session] = SessionLocal
+        self._pending: List[dict] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @contextmanager
+    def call(self, kind: str, provider: str, model: Optional[str] = None, **fields):
+        """
+        Measure one provider call; the block fills in phases and usage.
+
+        An exception leaving the block sets the status (error, timeout,
+        rate_limited, unavailable, cancelled). The record is written when the
+        block exits, or on release() of a group held around it.
+        """
+        context = generation_scheduler.current()
+        record = CallRecord(kind=kind, provider=provider, model=model, flow=context.flow, lane=context.lane, **fields)
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record.fail(e)
+            raise
+        finally:
+            record.phases["total"] = _elapsed_ms(started)
+            group = _group.get()
+            if group is not None:
+                group.records.append(record)
+            else:
+                self.record(record)
+
+    def event(self, kind: str, provider: str, model: Optional[str] = None, **fields):
+        """Record an outcome that needed no provider request (e.g. a cache hit)"""
+        with self.call(kind, provider, model, **fields):
+            pass
+
+    def hold(self) -> CallGroup:
+        """
+        Hold back calls made from here on (including in tasks spawned from here)
+        until release(), so a later stage can add its phase to them.
+        """
+        group = CallGroup()
+        group.token = _group.set(group)
+        return group
+
+    def release(self, group: CallGroup):
+        """Stop holding and buffer the group's records (call from the task that called hold)"""
+        _group.reset(group.token)
+        for record in group.records:
+            self.record(record)
+
+    def record(self, record: CallRecord):
+        """Buffer a finished record for the background writer (never blocks)"""
+        if not self.enabled:
+            return
+        self.recorded += 1
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        self._pending.append(record.to_row())
+        try:
+            self._ensure_running()
+        except RuntimeError:
+            # No running loop: the next record or stop() flushes it
+            pass
+
+    def _ensure_running(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Event and task are bound to the loop that created them
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = None
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        elif len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self._pending:
+            if len(self._pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write buffered records now; returns how many were written"""
+        written = 0
+        while self._pending:
+            rows = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            try:
+                await asyncio.to_thread(self._insert, rows)
+            except Exception as e:
+                # The ledger is diagnostics: losing a batch must not fail generations
+                self.failed += len(rows)
+                print(f"⚠️  Provider ledger: could not write {len(rows)} record(s): {e}")
+                continue
+            self.batches += 1
+            self.written += len(rows)
+            written += len(rows)
+        return written
+
+    def _insert(self, rows: List[dict]):
+        db = self.session_factory()
+        try:
+            db.execute(insert(ProviderCall), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    async def stop(self):
+        """Stop the writer and flush what is still buffered"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+    # Aggregates
+
+    def daily_stats(
+        self,
+        db: Session,
+        days: int = 7,
+        kind: Optional[str] = None,
+        provider: Optional[str] = None,
+        phase: str = "total"
+    ) -> List[dict]:
+        """
+        Per provider per day: call counts by status, usage totals and
+        p50/p95/p99 of one phase (calls that never reached the provider excluded).
+        """
+        if phase not in PHASES:
+            raise ValueError(f"Unknown phase: {phase}")
+        day = func.date(ProviderCall.created_at)
+        filters = [ProviderCall.created_at >= datetime.utcnow() - timedelta(days=days)]
+        if kind:
+            filters.append(ProviderCall.kind == kind)
+        if provider:
+            filters.append(ProviderCall.provider == provider)
+
+        groups: Dict[tuple, dict] = {}
+        rows = (
+            db.query(
+                day, ProviderCall.kind, ProviderCall.provider, ProviderCall.status,
+                func.count(ProviderCall.id),
+                func.sum(ProviderCall.images),
+                func.sum(ProviderCall.prompt_tokens),
+                func.sum(ProviderCall.completion_tokens),
+                func.sum(ProviderCall.request_bytes),
+                func.sum(ProviderCall.response_bytes),
+                func.sum(ProviderCall.image_bytes)
+            )
+            .filter(*filters)
+            .group_by(day, ProviderCall.kind, ProviderCall.provider, ProviderCall.status)
+        )
+        for row_day, row_kind, row_provider, status, calls, *usage in rows:
+            key = (str(row_day), row_kind, row_provider)
+            entry = groups.setdefault(key, {
+                "day": key[0],
+                "kind": row_kind,
+                "provider": row_provider,
+                "calls": 0,
+                "statuses": {},
+                "images": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "request_bytes": 0,
+                "response_bytes": 0,
+                "image_bytes": 0,
+                "phase": phase,
+                **{f"{name}_ms": None for name, _ in QUANTILES}
+            })
+            entry["calls"] += calls
+            entry["statuses"][status] = calls
+            for name, value in zip(
+                ("images", "prompt_tokens", "completion_tokens", "request_bytes", "response_bytes", "image_bytes"),
+                usage
+            ):
+                entry[name] += int(value or 0)
+
+        column = getattr(ProviderCall, f"{phase}_ms")
+        latency_filters = filters + [column.isnot(None), ProviderCall.status.notin_(NO_PROVIDER_STATUSES)]
+        for key, quantiles in self._quantiles(db, day, column, latency_filters).items():
+            if key in groups:
+                groups[key].update(quantiles)
+        return [groups[key] for key in sorted(groups)]
+
+    @staticmethod
+    def _quantiles(db: Session, day, column, filters) -> Dict[tuple, dict]:
+        """p50/p95/p99 of column per (day, kind, provider)"""
+        keys = (day, ProviderCall.kind, ProviderCall.provider)
+        if db.get_bind().dialect.name == "postgresql":
+            rows = (
+                db.query(*keys, *(func.percentile_cont(q).within_group(column) for _, q in QUANTILES))
+                .filter(*filters)
+                .group_by(*keys)
+            )
+            return {
+                (str(row_day), row_kind, row_provider): {
+                    f"{name}_ms": round(value, 1) for (name, _), value in zip(QUANTILES, values)
+                }
+                for row_day, row_kind, row_provider, *values in rows
+            }
+
+        # Other databases (SQLite in development): sort in Python
+        values: Dict[tuple, List[float]] = defaultdict(list)
+        for row_day, row_kind, row_provider, value in db.query(*keys, column).filter(*filters):
+            values[(str(row_day), row_kind, row_provider)].append(value)
+        quantiles = {}
+        for key, samples in values.items():
+            samples.sort()
+            quantiles[key] = {f"{name}_ms": round(percentile(samples, q), 1) for name, q in QUANTILES}
+        return quantiles
+
+
+# Singleton instance
+provider_ledger = ProviderLedger()
@@ -0,0 +1,110 @@
+"""
+Async per-provider throttling: a cap on in-flight requests plus a
+requests-per-minute token bucket, with pauses requested via Retry-After.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class ProviderLimiter:
+    """
+    Limits one provider to max_in_flight concurrent requests and
+    requests_per_minute starts (0 = no rate limit).
+
+    The bucket holds up to max_in_flight tokens so a burst can fill every slot,
+    then refills at requests_per_minute / 60 tokens per second.
+    """
+
+    def __init__(self, max_in_flight: int, requests_per_minute: float):
+        self.max_in_flight = max(1, max_in_flight)
+        self.requests_per_minute = max(0.0, requests_per_minute)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._lock = asyncio.Lock()
+        self._capacity = float(self.max_in_flight)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.in_flight = 0
+        self.waiting = 0
+        self.started = 0
+        self.throttled_seconds = 0.0
+        self.pauses = 0
+
+    def _refill(self, now: float):
+        if self.requests_per_minute:
+            rate = self.requests_per_minute / 60.0
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    async def _acquire_token(self):
+        # The lock is held while sleeping so waiters are served in arrival order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if not self.requests_per_minute:
+                        return
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / (self.requests_per_minute / 60.0)
+                self.throttled_seconds += wait
+                await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an in-flight slot and a rate token for the duration of one request"""
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            await self._acquire_token()
+            self.in_flight += 1
+            self.started += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+    def pause(self, seconds: float):
+        """Stop starting new requests for `seconds` (e.g. from a 429 Retry-After)"""
+        self.pauses += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        # Don't let a burst of saved-up tokens fire the moment the pause ends
+        self._tokens = min(self._tokens, 1.0)
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "requests_per_minute": self.requests_per_minute,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "started": self.started,
+            "pauses": self.pauses,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            "throttled_seconds": round(self.throttled_seconds, 3)
+        }
@@ -0,0 +1,104 @@
+"""
+Local reframing of one master render into other aspect ratios.
+
+A master image is cropped around its most salient region (edge energy with
+a centre prior) to each target ratio. When a crop would throw away too much
+of the master, the whole master is fitted instead and the bars are filled
+with a blurred, enlarged copy of itself. Runs inside image pool workers.
+"""
+import math
+from typing import Tuple
+
+# Crop when at least this fraction of the master's area survives, else pad
+MIN_CROP_COVERAGE = 0.5
+
+Box = Tuple[int, int, int, int]
+
+
+def crop_coverage(src_w: int, src_h: int, target_w: int, target_h: int) -> float:
+    """Fraction of the source area kept by the largest target-ratio crop"""
+    source_ratio = src_w / src_h
+    target_ratio = target_w / target_h
+    return min(source_ratio, target_ratio) / max(source_ratio, target_ratio)
+
+
+def crop_box(src_w: int, src_h: int, target_w: int, target_h: int,
+             focus: Tuple[float, float] = (0.5, 0.5)) -> Box:
+    """
+    Largest box with the target's aspect ratio inside the source, centred on focus.
+
+    focus is (x, y) as fractions of the source size; the box is clamped to the
+    source bounds. Returns (left, top, right, bottom).
+    """
+    if src_w * target_h >= src_h * target_w:
+        # Source is wider than the target: keep full height
+        crop_h = src_h
+        crop_w = round(src_h * target_w / target_h)
+    else:
+        crop_w = src_w
+        crop_h = round(src_w * target_h / target_w)
+
+    left = round(focus[0] * src_w - crop_w / 2)
+    top = round(focus[1] * src_h - crop_h / 2)
+    left = min(max(left, 0), src_w - crop_w)
+    top = min(max(top, 0), src_h - crop_h)
+    return left, top, left + crop_w, top + crop_h
+
+
+def fit_box(src_w: int, src_h: int, target_w: int, target_h: int) -> Box:
+    """Where the whole source lands, centred, when fitted inside the target"""
+    scale = min(target_w / src_w, target_h / src_h)
+    fitted_w = round(src_w * scale)
+    fitted_h = round(src_h * scale)
+    left = (target_w - fitted_w) // 2
+    top = (target_h - fitted_h) // 2
+    return left, top, left + fitted_w, top + fitted_h
+
+
+def focus_point(img, sample_size: int = 64, center_weight: float = 1.0) -> Tuple[float, float]:
+    """
+    Saliency-weighted focus of an image as (x, y) fractions.
+
+    Edge energy of a small greyscale thumbnail, multiplied by a Gaussian centre
+    prior so flat images (or ones with busy borders) stay centred.
+    """
+    from PIL import ImageFilter
+
+    thumb = img.convert("L")
+    thumb.thumbnail((sample_size, sample_size))
+    edges = thumb.filter(ImageFilter.FIND_EDGES)
+    width, height = edges.size
+    pixels = edges.load()
+
+    total = x_sum = y_sum = 0.0
+    for y in range(1, height - 1):  # FIND_EDGES leaves a bright 1px frame
+        fy = (y + 0.5) / height
+        for x in range(1, width - 1):
+            fx = (x + 0.5) / width
+            prior = math.exp(-((fx - 0.5) ** 2 + (fy - 0.5) ** 2) / (2 * 0.25 ** 2) * center_weight)
+            weight = pixels[x, y] * prior
+            total += weight
+            x_sum += weight * fx
+            y_sum += weight * fy
+    if total == 0:
+        return 0.5, 0.5
+    return x_sum / total, y_sum / total
+
+
+def reframe(img, target_w: int, target_h: int):
+    """Crop or pad a PIL image to exactly target_w x target_h"""
+    from PIL import Image, ImageFilter
+
+    src_w, src_h = img.size
+    if crop_coverage(src_w, src_h, target_w, target_h) >= MIN_CROP_COVERAGE:
+        box = crop_box(src_w, src_h, target_w, target_h, focus_point(img))
+        return img.resize((target_w, target_h), Image.Resampling.LANCZOS, box=box)
+
+    # Pad: blurred cover-scaled background with the whole master fitted on top
+    background = img.resize(
+        (target_w, target_h), Image.Resampling.BILINEAR,
+        box=crop_box(src_w, src_h, target_w, target_h)
+    ).filter(ImageFilter.GaussianBlur(max(target_w, target_h) // 40))
+    left, top, right, bottom = fit_box(src_w, src_h, target_w, target_h)
+    background.paste(img.resize((right - left, bottom - top), Image.Resampling.LANCZOS), (left, top))
+    return background
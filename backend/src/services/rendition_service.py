@@ -0,0 +1,157 @@
+"""
+Responsive renditions of generated creatives.
+
+After overlays, each creative's progressive JPEG master gets downscaled copies
+at CREATIVE_RENDITION_WIDTHS in AVIF (when Pillow can encode it), WebP and
+JPEG, written to renditions/<master stem>/ next to the master. The creative
+records them, and GET /creatives/{id}/media serves the smallest suitable one
+in the best format the browser's Accept header allows.
+"""
+import math
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .image_processor import image_processor, write_renditions, RENDITION_EXTENSIONS
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+_EXTENSION_FORMATS = {ext: fmt for fmt, ext in RENDITION_EXTENSIONS.items()}
+_RENDITION_NAME = re.compile(r"^(\d+)x(\d+)\.(\w+)$")
+# Smallest files first when the client accepts several formats equally
+_PREFERENCE = ("avif", "webp", "jpeg")
+
+
+def _encodable_formats() -> Tuple[str, ...]:
+    """Rendition formats this Pillow build can write"""
+    from PIL import Image, features
+
+    try:
+        # AVIF is built in from Pillow 11.2; older versions need the pillow-avif-plugin package
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+    Image.init()
+    available = {"jpeg"}
+    if features.check("webp"):
+        available.add("webp")
+    if "AVIF" in Image.SAVE:
+        available.add("avif")
+    return tuple(fmt for fmt in _PREFERENCE if fmt in available)
+
+
+class RenditionService:
+    """Writes, lists, deletes and negotiates creative renditions"""
+
+    def __init__(self):
+        widths = os.getenv("CREATIVE_RENDITION_WIDTHS", "320,640,1280")
+        self.widths = tuple(sorted({int(w) for w in widths.split(",") if w.strip()}))
+        requested = os.getenv("CREATIVE_RENDITION_FORMATS", "avif,webp,jpeg")
+        self.requested_formats = tuple(f.strip().lower() for f in requested.split(",") if f.strip())
+        self._formats: Optional[Tuple[str, ...]] = None
+
+    @property
+    def formats(self) -> Tuple[str, ...]:
+        if self._formats is None:
+            available = _encodable_formats()
+            self._formats = tuple(f for f in self.requested_formats if f in available)
+            skipped = [f for f in self.requested_formats if f not in available]
+            if skipped:
+                print(f"⚠️ Rendition formats not supported by this Pillow build, skipping: {skipped}")
+        return self._formats
+
+    @staticmethod
+    def directory(master_path: str) -> Path:
+        path = Path(master_path)
+        return path.parent / "renditions" / path.stem
+
+    async def generate(self, master_path: str):
+        """Write the renditions of a finished master (image process pool)"""
+        if not self.widths or not self.formats:
+            return
+        written = await image_processor.run(
+            write_renditions, str(master_path), str(self.directory(master_path)), self.widths, self.formats
+        )
+        print(f"🖼️ Wrote {written} renditions for {Path(master_path).name}")
+
+    def collect(self, master_path: str) -> List[Dict]:
+        """Renditions on disk for a master, smallest first"""
+        directory = self.directory(master_path)
+        if not directory.is_dir():
+            return []
+        renditions = []
+        for entry in directory.iterdir():
+            match = _RENDITION_NAME.match(entry.name)
+            if not match or match.group(3) not in _EXTENSION_FORMATS:
+                continue
+            fmt = _EXTENSION_FORMATS[match.group(3)]
+            renditions.append({
+                "format": fmt,
+                "width": int(match.group(1)),
+                "height": int(match.group(2)),
+                "file_path": str(entry),
+                "file_size": entry.stat().st_size,
+                "mime_type": MIME_TYPES[fmt]
+            })
+        renditions.sort(key=lambda r: (r["width"], _PREFERENCE.index(r["format"])))
+        return renditions
+
+    def delete(self, master_path: str):
+        """Remove a master's renditions directory"""
+        shutil.rmtree(self.directory(master_path), ignore_errors=True)
+
+    def choose(self, renditions: List[Dict], master: Dict, accept: Optional[str], width: Optional[int]) -> Dict:
+        """
+        Pick the file to serve: the best format the Accept header allows, then the
+        smallest rendition at least `width` wide. Without a width the master
+        ({file_path, mime_type}, the full-size JPEG, always acceptable) is served.
+        """
+        if width is None:
+            return master
+        
+        def size(candidate: Dict) -> float:
+            return candidate.get("width") or math.inf
+        
+        for fmt in self._accepted_formats(accept):
+            candidates = [r for r in renditions if r["format"] == fmt]
+            if fmt == "jpeg":
+                candidates.append(master)
+            if not candidates:
+                continue
+            wide_enough = [r for r in candidates if size(r) >= width] or candidates
+            return min(wide_enough, key=size)
+        return master
+
+    @staticmethod
+    def _accepted_formats(accept: Optional[str]) -> List[str]:
+        """Formats in the order the client prefers them (q-value, then file size)"""
+        quality: Dict[str, float] = {}
+        wildcard = 0.0
+        for part in (accept or "").split(","):
+            fields = [f.strip() for f in part.split(";")]
+            media_type = fields[0].lower()
+            q = 1.0
+            for param in fields[1:]:
+                if param.startswith("q="):
+                    try:
+                        q = float(param[2:])
+                    except ValueError:
+                        q = 0.0
+            if media_type in ("image/*", "*/*"):
+                wildcard = max(wildcard, q)
+            else:
+                quality[media_type] = q
+        scores = {}
+        for fmt in _PREFERENCE:
+            # Only serve AVIF/WebP when named explicitly; image/* covers JPEG
+            q = quality.get(MIME_TYPES[fmt], wildcard if fmt == "jpeg" else 0.0)
+            if q > 0:
+                scores[fmt] = q
+        if not accept:
+            scores["jpeg"] = 1.0
+        return sorted(scores, key=lambda fmt: (-scores[fmt], _PREFERENCE.index(fmt)))
+
+
+# Singleton instance
+rendition_service = RenditionService()
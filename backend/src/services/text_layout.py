@@ -0,0 +1,214 @@
+"""
+Pixel-width text layout for image overlays.
+
+Captions are wrapped by measured width rather than character count, so long
+German compounds stay inside the frame and Japanese/Chinese text (no spaces)
+wraps at all. Glyph advances are measured once per font and cached; a
+caption's font size is auto-fitted to its box by binary search over sizes.
+
+Line breaking is script-aware: space-separated scripts (Latin, Cyrillic,
+Hangul) break between words, CJK ideographs and kana may break between any two
+characters except where kinsoku rules forbid it (no closing punctuation or
+small kana at a line start, no opening bracket at a line end). A word wider
+than the line is broken between characters as a last resort.
+"""
+import math
+import weakref
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .font_registry import font_registry
+
+# Never start a line with these (closing punctuation, small kana, prolonged sound mark)
+NO_LINE_START = set(
+    "、。，．,.!?！？:;：；)]}）］｝〕〉》」』】〙〗〟’”»…‥・ー々〻"
+    "ぁぃぅぇぉっゃゅょゎゕゖァィゥェォッャュョヮヵヶㇰㇱㇲㇳㇴㇵㇶㇷㇸㇹㇺㇻㇼㇽㇾㇿ"
+)
+# Never end a line with these (opening brackets and quotes)
+NO_LINE_END = set("([{（［｛〔〈《「『【〘〖〝‘“«")
+
+
+def is_cjk_breakable(char: str) -> bool:
+    """Characters that may be broken between without a space (ideographs, kana, full-width forms)"""
+    code = ord(char)
+    return (0x3000 <= code <= 0x30FF          # CJK punctuation, Hiragana, Katakana
+            or 0x31F0 <= code <= 0x31FF       # Katakana phonetic extensions
+            or 0x3400 <= code <= 0x4DBF       # CJK Extension A
+            or 0x4E00 <= code <= 0x9FFF       # CJK Unified Ideographs
+            or 0xF900 <= code <= 0xFAFF       # CJK Compatibility Ideographs
+            or 0xFF00 <= code <= 0xFFEF)      # Full-width forms
+
+
+@dataclass(frozen=True)
+class TextLayout:
+    """Wrapped lines of a caption at one font size"""
+    font: object
+    size: int
+    lines: Tuple[str, ...]
+    line_widths: Tuple[int, ...]
+    line_height: int
+    width: int
+    height: int
+    # A word wider than the line had to be broken between characters
+    split_words: bool = False
+
+
+class TextLayoutEngine:
+    """Measures, wraps and fits overlay text; caches glyph advances per font"""
+
+    def __init__(self, line_spacing: float = 0.15):
+        self.line_spacing = line_spacing
+        # font -> {char: advance px}; weak so fonts dropped by the registry free their tables
+        self._advances: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def text_width(self, font, text: str) -> float:
+        """Width of text as the sum of cached glyph advances (kerning ignored, so never narrower)"""
+        advances = self._advances.get(font)
+        if advances is None:
+            advances = {}
+            self._advances[font] = advances
+        width = 0.0
+        for char in text:
+            advance = advances.get(char)
+            if advance is None:
+                self.misses += 1
+                advance = font.getlength(char)
+                advances[char] = advance
+            else:
+                self.hits += 1
+            width += advance
+        return width
+
+    def line_height(self, font, size: int) -> int:
+        try:
+            ascent, descent = font.getmetrics()
+        except AttributeError:
+            # Bitmap default font
+            bbox = font.getbbox("Ag")
+            ascent, descent = bbox[3], 0
+        return ascent + descent + int(size * self.line_spacing)
+
+    @staticmethod
+    def segments(text: str) -> List[Tuple[str, bool]]:
+        """
+        Split text into unbreakable segments, each with whether a space precedes
+        it. Lines may break between any two segments.
+        """
+        segments: List[Tuple[str, bool]] = []
+        space_before = False
+        for word in text.split():
+            current = ""
+            for char in word:
+                if not current:
+                    current = char
+                elif char in NO_LINE_START or current[-1] in NO_LINE_END:
+                    current += char
+                elif is_cjk_breakable(char) or is_cjk_breakable(current[-1]):
+                    segments.append((current, space_before))
+                    space_before = False
+                    current = char
+                else:
+                    current += char
+            segments.append((current, space_before))
+            space_before = True
+        return segments
+
+    def wrap(self, text: str, font, max_width: float) -> Tuple[List[str], bool]:
+        """Greedy line breaking by measured width; returns (lines, whether a word was split)"""
+        space = self.text_width(font, " ")
+        split_words = False
+        lines: List[str] = []
+        line, line_width = "", 0.0
+        for segment, space_before in self.segments(text):
+            segment_width = self.text_width(font, segment)
+            gap = space if line and space_before else 0.0
+            if line and line_width + gap + segment_width <= max_width:
+                line += (" " if gap else "") + segment
+                line_width += gap + segment_width
+                continue
+            if line:
+                lines.append(line)
+            line, line_width = "", 0.0
+            if segment_width > max_width:
+                # Wider than a whole line: break between characters
+                split_words = True
+                for char in segment:
+                    char_width = self.text_width(font, char)
+                    if line and line_width + char_width > max_width:
+                        lines.append(line)
+                        line, line_width = "", 0.0
+                    line += char
+                    line_width += char_width
+            else:
+                line, line_width = segment, segment_width
+        if line:
+            lines.append(line)
+        return lines, split_words
+
+    def layout(self, text: str, font, size: int, max_width: float) -> TextLayout:
+        lines, split_words = self.wrap(text, font, max_width)
+        # Exact widths for the few lines that are drawn (alignment)
+        line_widths = tuple(math.ceil(font.getlength(line)) for line in lines)
+        line_height = self.line_height(font, size)
+        return TextLayout(
+            font=font,
+            size=size,
+            lines=tuple(lines),
+            line_widths=line_widths,
+            line_height=line_height,
+            width=max(line_widths, default=0),
+            height=line_height * len(lines),
+            split_words=split_words
+        )
+
+    def fit(
+        self,
+        text: str,
+        family: str,
+        max_width: float,
+        max_height: float,
+        max_size: int,
+        min_size: int,
+        max_lines: Optional[int] = None
+    ) -> TextLayout:
+        """
+        Largest font size (binary search between min_size and max_size) whose
+        wrapped text fits max_width x max_height in at most max_lines lines,
+        preferring sizes that keep every word whole. Falls back to min_size,
+        still wrapped to max_width, if nothing fits.
+        """
+        def fits(candidate: TextLayout, whole_words: bool) -> bool:
+            return (candidate.width <= max_width
+                    and candidate.height <= max_height
+                    and (max_lines is None or len(candidate.lines) <= max_lines)
+                    and not (whole_words and candidate.split_words))
+
+        def layout_at(size: int) -> TextLayout:
+            return self.layout(text, font_registry.get_font(family, size), size, max_width)
+
+        min_size = max(1, int(min_size))
+        max_size = max(min_size, int(max_size))
+        smallest = layout_at(min_size)
+        for whole_words in (True, False):
+            if not fits(smallest, whole_words):
+                continue
+            best = smallest
+            low, high = min_size + 1, max_size
+            while low <= high:
+                size = (low + high) // 2
+                candidate = layout_at(size)
+                if fits(candidate, whole_words):
+                    best, low = candidate, size + 1
+                else:
+                    high = size - 1
+            return best
+        return smallest
+
+    def stats(self) -> Dict[str, int]:
+        return {"fonts": len(self._advances), "advance_hits": self.hits, "advance_misses": self.misses}
+
+
+# Singleton instance (one per process, including image pool workers)
+text_layout = TextLayoutEngine()
@@ -0,0 +1,206 @@
+"""
+Async campaign-message translation with an in-process LRU, a persistent DB cache
+and coalescing of concurrent identical lookups.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from .http_client import http_client
+
+
+class TranslationBackend(ABC):
+    """Interface for translation providers"""
+
+    name = "base"
+
+    @abstractmethod
+    async def translate(self, message: str, target_language: str) -> Optional[str]:
+        """Return the translated message, or None if translation failed"""
+
+
+class GoogleTranslateBackend(TranslationBackend):
+    """Google Translate free-tier endpoint, called through the shared HTTP pool"""
+
+    name = "google"
+
+    def __init__(self):
+        self.url = os.getenv("GOOGLE_TRANSLATE_URL", "https://translate.googleapis.com/translate_a/single")
+        self.timeout = 5.0
+
+    async def translate(self, message: str, target_language: str) -> Optional[str]:
+        params = {
+            "client": "gtx",
+            "sl": "en",
+            "tl": target_language,
+            "dt": "t",
+            "q": message
+        }
+        response = await http_client.client.get(
+            self.url, params=params, timeout=http_client.timeout(read=self.timeout)
+        )
+        if response.status_code != 200:
+            print(f"⚠️ Translation backend returned {response.status_code}")
+            return None
+        result = response.json()
+        # Long messages come back split into several sentence segments
+        return "".join(segment[0] for segment in result[0] if segment and segment[0])
+
+
+class PassthroughBackend(TranslationBackend):
+    """Returns messages untranslated (offline development)"""
+
+    name = "passthrough"
+
+    async def translate(self, message: str, target_language: str) -> Optional[str]:
+        return message
+
+
+TRANSLATION_BACKENDS = {
+    GoogleTranslateBackend.name: GoogleTranslateBackend,
+    PassthroughBackend.name: PassthroughBackend,
+}
+
+
+class TranslationService:
+    """Translates campaign messages, caching results by (message, target language)"""
+
+    # Region language prefix -> translation target language
+    LANGUAGE_MAP = {
+        "ja": "ja",  # Japanese
+        "zh": "zh-CN",  # Chinese Simplified
+        "ko": "ko",  # Korean
+        "de": "de",  # German
+        "fr": "fr",  # French
+        "es": "es",  # Spanish
+        "it": "it",  # Italian
+        "pt": "pt",  # Portuguese
+    }
+
+    def __init__(self):
+        backend_name = os.getenv("TRANSLATION_BACKEND", GoogleTranslateBackend.name)
+        self.backend: TranslationBackend = TRANSLATION_BACKENDS.get(backend_name, GoogleTranslateBackend)()
+        self.max_cache_entries = int(os.getenv("TRANSLATION_CACHE_SIZE", "1024"))
+        # Factory for sessions used by the persistent cache; None disables it
+        self.session_factory: Optional[Callable[[], Session]] = SessionLocal
+        self._cache: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    def set_backend(self, backend: TranslationBackend):
+        """Swap the translation provider (clears the in-process cache)"""
+        self.backend = backend
+        self._cache.clear()
+
+    def target_language(self, language_code: str) -> Optional[str]:
+        """Map a region language code (e.g. 'ja-JP') to a target, or None for English"""
+        lang = language_code.split('-')[0].lower()
+        if lang == "en":
+            return None
+        return self.LANGUAGE_MAP.get(lang, lang)
+
+    async def translate(self, message: str, language_code: str) -> str:
+        """
+        Translate message into the language for language_code.
+
+        Falls back to the original message if translation fails.
+        """
+        target = self.target_language(language_code)
+        if not message or target is None:
+            return message
+
+        key = (message, target)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._lookup(key))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        translated = await asyncio.shield(task)
+        return translated if translated is not None else message
+
+    def _remember(self, key: Tuple[str, str], translated: str):
+        self._cache[key] = translated
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    async def _lookup(self, key: Tuple[str, str]) -> Optional[str]:
+        """Resolve a cache miss: persistent cache first, then the backend"""
+        message, target = key
+
+        translated = await self._load_persistent(key)
+        if translated is None:
+            try:
+                translated = await self.backend.translate(message, target)
+            except Exception as e:
+                print(f"⚠️ Translation failed: {e}, using original message")
+                return None
+            if translated is None:
+                return None
+            print(f"🌍 Translated '{message}' to {target}: '{translated}'")
+            await self._store_persistent(key, translated)
+
+        self._remember(key, translated)
+        return translated
+
+    async def _load_persistent(self, key: Tuple[str, str]) -> Optional[str]:
+        if self.session_factory is None:
+            return None
+        return await asyncio.to_thread(self._load_persistent_sync, key)
+
+    def _load_persistent_sync(self, key: Tuple[str, str]) -> Optional[str]:
+        from ..models.translation import Translation
+
+        db = self.session_factory()
+        try:
+            row = db.query(Translation).filter(
+                Translation.source_text == key[0],
+                Translation.target_language == key[1]
+            ).first()
+            return row.translated_text if row else None
+        except Exception as e:
+            print(f"⚠️ Translation cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    async def _store_persistent(self, key: Tuple[str, str], translated: str):
+        if self.session_factory is None:
+            return
+        await asyncio.to_thread(self._store_persistent_sync, key, translated)
+
+    def _store_persistent_sync(self, key: Tuple[str, str], translated: str):
+        from ..models.translation import Translation
+
+        db = self.session_factory()
+        try:
+            db.add(Translation(
+                source_text=key[0],
+                target_language=key[1],
+                translated_text=translated,
+                backend=self.backend.name
+            ))
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same translation first
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ Failed to persist translation: {e}")
+        finally:
+            db.close()
+
+
+# Singleton instance
+translation_service = TranslationService()
@@ -0,0 +1,43 @@
+"""
+Standalone job worker process.
+
+Runs JOB_WORKERS workers against the shared jobs table without serving HTTP, so
+generation capacity can be scaled separately from the API:
+
+    python -m src.worker
+"""
+import asyncio
+import signal
+
+# Importing the API modules registers their job handlers
+from .api import assets, briefs, creatives, ideas  # noqa: F401
+from .services.firefly_jobs import firefly_job_poller
+from .services.http_client import http_client
+from .services.image_processor import image_processor
+from .services.job_worker import job_worker_pool
+from .services.provider_ledger import provider_ledger
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await http_client.start()
+    await job_worker_pool.start()
+    try:
+        await stop.wait()
+    finally:
+        # Running jobs are released back to the queue for another worker
+        await job_worker_pool.stop()
+        await firefly_job_poller.stop()
+        # Write provider calls still buffered in the ledger
+        await provider_ledger.stop()
+        await http_client.close()
+        # Joining the pool workers blocks; keep it off the event loop
+        await asyncio.to_thread(image_processor.shutdown)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
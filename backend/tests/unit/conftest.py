@@ -0,0 +1,12 @@
+"""
+Shared fixtures for unit tests.
+"""
+import pytest
+
+from src.services.provider_ledger import provider_ledger
+
+
+@pytest.fixture(autouse=True)
+def _no_provider_ledger(monkeypatch):
+    """Provider calls in unit tests are not written to the database unless a test opts in"""
+    monkeypatch.setattr(provider_ledger, "enabled", False)
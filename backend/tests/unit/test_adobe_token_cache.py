@@ -0,0 +1,151 @@
+"""
+Unit tests for the Adobe IMS token cache, run against a local IMS stand-in.
+"""
+import asyncio
+import io
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+from PIL import Image
+
+from src.api import settings as settings_api
+from src.schemas.key import SettingsRequest
+from src.services import key_service as key_service_module
+from src.services.adobe_token_cache import AdobeTokenCache, adobe_token_cache
+from src.services.firefly_service import FireflyService
+from src.services.http_client import http_client
+from src.services.image_providers import provider_registry
+from src.services.provider_limiter import ProviderLimiter
+
+
+class IMSStandIn:
+    """Minimal Adobe IMS + Firefly v3 stand-in served through httpx.MockTransport"""
+
+    def __init__(self, expires_in: int = 86400):
+        self.expires_in = expires_in
+        self.token_requests = []
+        self.generate_requests = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/ims/token/v3":
+            form = parse_qs(request.content.decode())
+            self.token_requests.append(form["client_id"][0])
+            # Slow enough that concurrent callers overlap with the in-flight refresh
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={
+                "access_token": f"token-{form['client_id'][0]}-{len(self.token_requests)}",
+                "expires_in": self.expires_in,
+            })
+        if request.url.path == "/v3/images/generate":
+            self.generate_requests += 1
+            return httpx.Response(200, json={
+                "id": f"job-{self.generate_requests}",
+                "outputs": [{"image": {"url": "https://firefly.test/image.jpg"}}],
+            })
+        if request.url.path == "/image.jpg":
+            buffer = io.BytesIO()
+            Image.new("RGB", (16, 16), "red").save(buffer, "JPEG")
+            return httpx.Response(200, content=buffer.getvalue(), headers={"content-type": "image/jpeg"})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def ims(monkeypatch):
+    stand_in = IMSStandIn()
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(stand_in)))
+    settings = {"adobe_client_id": "client-a", "adobe_client_secret": "secret-a"}
+    key_service = key_service_module.key_service
+    monkeypatch.setattr(key_service, "get_value", lambda db, key: settings.get(key))
+    monkeypatch.setattr(key_service, "set_multiple", lambda db, changes: settings.update(changes) or dict(settings))
+    monkeypatch.setattr(provider_registry.get("Adobe Firefly"), "limiter", ProviderLimiter(1000, 0))
+    stand_in.settings = settings
+    adobe_token_cache.invalidate()
+    yield stand_in
+    adobe_token_cache.invalidate()
+
+
+class TestAdobeTokenCache:
+    """Expiry-aware caching and single-flight refresh"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_refresh(self, ims):
+        cache = AdobeTokenCache()
+        tokens = await asyncio.gather(*(cache.get_token("client-a", "secret-a") for _ in range(25)))
+        assert len(ims.token_requests) == 1
+        assert set(tokens) == {"token-client-a-1"}
+
+    @pytest.mark.asyncio
+    async def test_cached_token_is_reused_until_refresh_margin(self, ims):
+        ims.expires_in = 10
+        cache = AdobeTokenCache()
+        cache.refresh_margin = 5
+        assert await cache.get_token("client-a", "secret-a") == "token-client-a-1"
+        assert await cache.get_token("client-a", "secret-a") == "token-client-a-1"
+        assert len(ims.token_requests) == 1
+
+        # Inside the refresh margin: fetch ahead of the real expiry
+        cache.refresh_margin = 20
+        assert await cache.get_token("client-a", "secret-a") == "token-client-a-2"
+        assert len(ims.token_requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_tokens_are_keyed_by_client_id(self, ims):
+        cache = AdobeTokenCache()
+        await cache.get_token("client-a", "secret-a")
+        await cache.get_token("client-b", "secret-b")
+        await cache.get_token("client-a", "secret-a")
+        assert ims.token_requests == ["client-a", "client-b"]
+
+    @pytest.mark.asyncio
+    async def test_rotated_secret_misses_without_invalidation(self, ims):
+        # e.g. a standalone worker the settings change did not reach
+        cache = AdobeTokenCache()
+        await cache.get_token("client-a", "secret-a")
+        await cache.get_token("client-a", "secret-rotated")
+        await cache.get_token("client-a", "secret-rotated")
+        assert ims.token_requests == ["client-a", "client-a"]
+
+    @pytest.mark.asyncio
+    async def test_failed_refresh_is_not_cached(self, ims, monkeypatch):
+        failing = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(401, text="nope")))
+        monkeypatch.setattr(http_client, "_client", failing)
+        cache = AdobeTokenCache()
+        assert await cache.get_token("client-a", "secret-a") is None
+        assert cache._tokens == {}
+
+    @pytest.mark.asyncio
+    async def test_concurrent_generations_trigger_one_token_request(self, ims, tmp_path):
+        service = FireflyService()
+        service.output_dir = tmp_path
+
+        results = await asyncio.gather(*(
+            service.generate_creative(
+                db=None,
+                idea_content=f"idea-{i}",
+                campaign_message="",
+                region="US",
+                demographic="18-25",
+                aspect_ratio="1:1",
+            )
+            for i in range(12)
+        ))
+
+        assert len(ims.token_requests) == 1
+        assert ims.generate_requests == 12
+        assert all(job_id is not None for _, _, _, job_id in results)
+
+    @pytest.mark.asyncio
+    async def test_settings_change_invalidates_cache(self, ims):
+        await adobe_token_cache.get_token("client-a", "secret-a")
+
+        # Unrelated or unchanged settings keep the cached token
+        settings_api.update_settings(
+            SettingsRequest(settings={"adobe_client_secret": "secret-a", "use_llm": "OpenAI"}), db=None
+        )
+        await adobe_token_cache.get_token("client-a", "secret-a")
+        assert len(ims.token_requests) == 1
+
+        settings_api.update_settings(SettingsRequest(settings={"adobe_client_secret": "secret-rotated"}), db=None)
+        await adobe_token_cache.get_token("client-a", "secret-rotated")
+        assert len(ims.token_requests) == 2
@@ -0,0 +1,123 @@
+"""
+Unit tests for incremental base64 field decoding.
+"""
+import base64
+import io
+import json
+import os
+import random
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src.services.base64_stream import Base64FieldWriter, stream_base64_field, stream_base64_fields
+
+
+def _feed_in_chunks(writer: Base64FieldWriter, body: bytes, seed: int = 0):
+    rng = random.Random(seed)
+    position = 0
+    while position < len(body):
+        size = rng.randint(1, 97)
+        writer.feed(body[position:position + size])
+        position += size
+
+
+class TestBase64FieldWriter:
+    """The decoded bytes match base64.b64decode for any chunking"""
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random_chunk_boundaries(self, seed):
+        image = os.urandom(5000 + seed)
+        body = json.dumps({
+            "created": 1,
+            "data": [{"revised_prompt": 'a "b64_json" mention', "b64_json": base64.b64encode(image).decode()}]
+        }).encode()
+        out = io.BytesIO()
+        writer = Base64FieldWriter("b64_json", out)
+        _feed_in_chunks(writer, body, seed)
+        assert writer.done
+        assert out.getvalue() == image
+        assert writer.head == image[:12]
+
+    def test_escaped_slashes_and_line_breaks(self):
+        image = bytes(range(256)) * 4
+        encoded = base64.encodebytes(image).decode()  # MIME style, with newlines
+        body = '{"data": [{"base64": "%s"}]}' % encoded.replace("/", "\\/").replace("\n", "\\n")
+        out = io.BytesIO()
+        writer = Base64FieldWriter("base64", out)
+        _feed_in_chunks(writer, body.encode(), seed=3)
+        assert out.getvalue() == image
+
+    def test_marker_as_value_is_skipped(self):
+        image = b"\x89PNG\r\n\x1a\n" + os.urandom(64)
+        body = json.dumps({"fields": ["b64_json"], "b64_json": base64.b64encode(image).decode()}).encode()
+        out = io.BytesIO()
+        writer = Base64FieldWriter("b64_json", out)
+        writer.feed(body)
+        assert out.getvalue() == image
+
+    def test_non_string_value_is_rejected(self):
+        writer = Base64FieldWriter("b64_json", io.BytesIO())
+        with pytest.raises(ValueError):
+            writer.feed(b'{"b64_json": null}')
+
+
+class TestStreamBase64Field:
+    """Streaming a response body into a file"""
+
+    @staticmethod
+    async def _response(body_chunks):
+        async def body():
+            for chunk in body_chunks:
+                yield chunk
+
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+        async with httpx.AsyncClient(transport=transport) as client:
+            request = client.build_request("POST", "https://images.test/v1")
+            return await client.send(request, stream=True)
+
+    @pytest.mark.asyncio
+    async def test_writes_decoded_image(self, tmp_path):
+        image = os.urandom(300_000)
+        body = json.dumps({"data": [{"b64_json": base64.b64encode(image).decode()}]}).encode()
+        response = await self._response([body[i:i + 65536] for i in range(0, len(body), 65536)])
+        path = await stream_base64_field(response, "b64_json", tmp_path)
+        assert path.read_bytes() == image
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("body", [
+        b'{"error": {"message": "no image"}}',
+        b'{"data": [{"b64_json": "iVBORw0KGgo',  # truncated
+        b'{"data": [{"b64_json": "abcde"}]}',  # bad padding
+    ])
+    async def test_missing_or_broken_field(self, tmp_path, body):
+        response = await self._response([body])
+        with pytest.raises(HTTPException) as error:
+            await stream_base64_field(response, "b64_json", tmp_path)
+        assert error.value.status_code == 500
+        assert list(tmp_path.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_memory_does_not_scale_with_image_size(self, tmp_path):
+        chunk = base64.b64encode(os.urandom(48 * 1024))  # 64KB of base64, no padding
+        chunks = [b'{"data": [{"b64_json": "'] + [chunk] * 256 + [b'"}]}']  # ~12MB decoded
+        response = await self._response(chunks)
+        tracemalloc.start()
+        try:
+            path = await stream_base64_field(response, "b64_json", tmp_path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert path.stat().st_size == 256 * 48 * 1024
+        assert peak < 2 * 1024 * 1024
+
+    @pytest.mark.asyncio
+    async def test_multiple_outputs(self, tmp_path):
+        images = [os.urandom(20_000 + i) for i in range(3)]
+        body = json.dumps({"data": [{"b64_json": base64.b64encode(image).decode()} for image in images]}).encode()
+        response = await self._response([body[i:i + 4096] for i in range(0, len(body), 4096)])
+        paths = await stream_base64_fields(response, "b64_json", tmp_path, limit=4)
+        assert [path.read_bytes() for path in paths] == images
+        assert len(list(tmp_path.iterdir())) == 3
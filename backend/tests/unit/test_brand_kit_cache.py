@@ -0,0 +1,124 @@
+"""
+Unit tests for the brand-kit cache.
+"""
+import asyncio
+import os
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from src.services import brand_kit_cache as brand_kit_module
+from src.services.brand_kit_cache import BrandKitCache
+from src.services.image_processor import image_processor, logo_max_size
+
+
+@pytest.fixture
+def logo_path(tmp_path):
+    path = tmp_path / "logo.png"
+    Image.new("RGBA", (400, 400), (255, 0, 0, 255)).save(path)
+    return str(path)
+
+
+@pytest.fixture
+def brand_asset(logo_path):
+    return SimpleNamespace(id=uuid.uuid4(), file_path=logo_path, brand_colors=["#FF0000"])
+
+
+@pytest.fixture
+def list_calls(monkeypatch, brand_asset):
+    """Count brand-asset queries against a stubbed asset service"""
+    calls = []
+
+    def list_assets(db, asset_type=None, skip=0, limit=100):
+        calls.append(asset_type)
+        return [brand_asset]
+
+    monkeypatch.setattr(brand_kit_module.asset_service, "list_assets", list_assets)
+    # Decode in a thread so the test does not spawn pool workers
+    monkeypatch.setattr(image_processor, "max_workers", 0)
+    return calls
+
+
+class TestBrandKitCache:
+    """Kit lookup caching, logo pre-scaling and invalidation"""
+
+    def test_current_kit_is_queried_once(self, list_calls, brand_asset):
+        cache = BrandKitCache()
+        kit = cache.get_current(db=None)
+        assert kit.asset_id == str(brand_asset.id)
+        assert kit.brand_colors == ["#FF0000"]
+        assert cache.get_current(db=None) is kit
+        assert list_calls == ["brand"]
+
+    def test_invalidate_requeries(self, list_calls):
+        cache = BrandKitCache()
+        cache.get_current(db=None)
+        cache.invalidate()
+        cache.get_current(db=None)
+        assert len(list_calls) == 2
+
+    def test_kit_is_reread_after_ttl(self, list_calls, brand_asset, monkeypatch):
+        cache = BrandKitCache()
+        kit = cache.get_current(db=None)
+        # Unchanged asset: same snapshot after the re-read
+        monkeypatch.setattr(cache, "ttl", 0)
+        assert cache.get_current(db=None) is kit
+        assert len(list_calls) == 2
+
+        # Colors changed by another process, which invalidated only its own cache
+        brand_asset.brand_colors = ["#00FF00"]
+        assert cache.get_current(db=None).brand_colors == ["#00FF00"]
+
+    @pytest.mark.asyncio
+    async def test_logo_decoded_once_for_all_ratios_and_ideas(self, list_calls, logo_path):
+        cache = BrandKitCache()
+        sizes = [logo_max_size(1920, 1080), logo_max_size(1080, 1920), logo_max_size(1080, 1080)]
+        # 3 ratios x 5 ideas, all in flight together
+        logos = await asyncio.gather(*(cache.get_logo(logo_path, size) for size in sizes * 5))
+        assert cache.logo_decodes == len(set(sizes))
+        width, height, data = logos[0]
+        assert (width, height) == (162, 162)
+        assert all(logo is logos[0] for logo in logos)
+
+    @pytest.mark.asyncio
+    async def test_replaced_logo_file_is_redecoded(self, list_calls, logo_path):
+        cache = BrandKitCache()
+        kit = cache.get_current(db=None)
+        await cache.get_logo(logo_path, 162)
+
+        Image.new("RGB", (400, 400), (0, 0, 255)).save(logo_path)
+        stat = os.stat(logo_path)
+        os.utime(logo_path, (stat.st_atime, stat.st_mtime + 10))
+
+        assert cache.get_current(db=None).mtime != kit.mtime
+        _, _, data = await cache.get_logo(logo_path, 162)
+        assert data[:3] == b"\x00\x00\xff"
+        assert cache.logo_decodes == 2
+        assert len(cache._logos) == 1
+
+    @pytest.mark.asyncio
+    async def test_missing_logo_returns_none(self, list_calls, tmp_path):
+        cache = BrandKitCache()
+        assert await cache.get_logo(str(tmp_path / "gone.png"), 162) is None
+        assert await cache.get_logo(None, 162) is None
+        assert cache.logo_decodes == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_decode_is_retried(self, list_calls, logo_path, monkeypatch):
+        cache = BrandKitCache()
+        original = brand_kit_module.image_processor.run
+        attempts = []
+
+        async def flaky_run(fn, *args):
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("transient read error")
+            return await original(fn, *args)
+
+        monkeypatch.setattr(brand_kit_module.image_processor, "run", flaky_run)
+        assert await cache.get_logo(logo_path, 162) is None
+        width, height, _ = await cache.get_logo(logo_path, 162)
+        assert (width, height) == (162, 162)
+        assert cache.logo_decodes == 2
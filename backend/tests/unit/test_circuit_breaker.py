@@ -0,0 +1,169 @@
+"""
+Unit tests for provider retries, circuit breaking and failover.
+"""
+import base64
+import io
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from src.services import key_service as key_service_module
+from src.services.circuit_breaker import CircuitBreaker, ProviderUnavailableError
+from src.services.firefly_service import FireflyService
+from src.services.http_client import http_client
+from src.services.image_providers import provider_registry
+from src.services.provider_limiter import ProviderLimiter
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "teal").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestCircuitBreaker:
+    """State transitions"""
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker("p", failure_threshold=2, recovery_timeout=60)
+        breaker.record_failure("HTTP 502")
+        assert breaker.allow_request()
+        breaker.record_failure("HTTP 502")
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow_request()
+        assert breaker.stats()["rejected"] == 1
+        assert breaker.stats()["last_error"] == "HTTP 502"
+
+    def test_half_open_allows_one_trial(self):
+        breaker = CircuitBreaker("p", failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+        breaker.recovery_timeout = 60
+        breaker._opened_at -= 61
+        assert breaker.allow_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow_request()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker("p", failure_threshold=3, recovery_timeout=60)
+        for _ in range(3):
+            breaker.record_failure()
+        breaker._opened_at -= 61
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.times_opened == 2
+
+
+class ProviderStandIn:
+    """Mock image API returning a scripted status per call, per provider host"""
+
+    def __init__(self):
+        self.scripts = {}
+        self.calls = {}
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.calls[host] = self.calls.get(host, 0) + 1
+        script = self.scripts.get(host, [200])
+        outcome = script[min(self.calls[host], len(script)) - 1]
+        if outcome == "timeout":
+            raise httpx.ReadTimeout("timed out", request=request)
+        if outcome != 200:
+            return httpx.Response(outcome, text="upstream error")
+        b64 = base64.b64encode(_png()).decode()
+        if host == "freepik.test":
+            return httpx.Response(200, json={"data": [{"base64": b64}]})
+        return httpx.Response(200, json={"data": [{"b64_json": b64}]})
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    stand_in = ProviderStandIn()
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(stand_in)))
+    for name, url in (("DALL-E", "https://dalle.test/v1"), ("Freepik", "https://freepik.test/v1")):
+        adapter = provider_registry.get(name)
+        monkeypatch.setattr(adapter, "limiter", ProviderLimiter(1000, 0))
+        monkeypatch.setattr(adapter, "breaker", CircuitBreaker(name, failure_threshold=2, recovery_timeout=60))
+        monkeypatch.setattr(adapter, "api_url", url)
+    settings = {"use_image_model": "DALL-E", "DALL-E": "dalle-key"}
+    monkeypatch.setattr(key_service_module.key_service, "get_value", lambda db, key: settings.get(key))
+    stand_in.settings = settings
+    return stand_in
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = FireflyService()
+    service.output_dir = tmp_path
+    service.retry_base_delay = 0.001
+    service.max_retries = 2
+    service.mock_on_failure = False
+    return service
+
+
+async def _generate(service):
+    return await service.generate_creative(
+        db=None, idea_content="Beach day", campaign_message="", region="US",
+        demographic="18-25", aspect_ratio="1:1", use_cache=False
+    )
+
+
+class TestRetriesAndFailover:
+    """Transient errors are retried; persistent ones fail fast or fail over, never a silent mock"""
+
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retried(self, service, provider):
+        provider.scripts["dalle.test"] = [502, "timeout", 200]
+        file_path, _, _, _ = await _generate(service)
+        assert provider.calls["dalle.test"] == 3
+        with open(file_path, "rb") as f:
+            assert f.read().startswith(b"\x89PNG")
+        assert provider_registry.get("DALL-E").breaker.state == CircuitBreaker.CLOSED
+
+    @pytest.mark.asyncio
+    async def test_client_errors_are_not_retried(self, service, provider):
+        provider.scripts["dalle.test"] = [400]
+        with pytest.raises(HTTPException):
+            await _generate(service)
+        assert provider.calls["dalle.test"] == 1
+        assert provider_registry.get("DALL-E").breaker.consecutive_failures == 0
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast_instead_of_mocking(self, service, provider):
+        provider.scripts["dalle.test"] = [503]
+        for _ in range(2):
+            with pytest.raises(HTTPException):
+                await _generate(service)
+        assert provider.calls["dalle.test"] == 6
+        assert provider_registry.get("DALL-E").breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(ProviderUnavailableError) as error:
+            await _generate(service)
+        assert error.value.status_code == 503
+        assert provider.calls["dalle.test"] == 6
+        # Nothing was written for the failed generations
+        assert list(service.output_dir.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_fails_over_to_secondary_provider(self, service, provider):
+        provider.settings.update({"image_provider_failover": "Freepik", "Freepik": "freepik-key"})
+        provider.scripts["dalle.test"] = [503]
+        file_path, _, _, _ = await _generate(service)
+        assert provider.calls["dalle.test"] == 3
+        assert provider.calls["freepik.test"] == 1
+        # Primary is skipped without a request once its breaker opens
+        await _generate(service)
+        await _generate(service)
+        assert provider.calls["dalle.test"] == 6
+        assert provider.calls["freepik.test"] == 3
+
+    @pytest.mark.asyncio
+    async def test_mock_fallback_is_opt_in(self, service, provider):
+        service.mock_on_failure = True
+        provider.scripts["dalle.test"] = [500]
+        file_path, mime_type, _, job_id = await _generate(service)
+        assert mime_type == "image/jpeg" and job_id is None
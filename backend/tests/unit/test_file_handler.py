@@ -0,0 +1,121 @@
+"""
+Unit tests for FileHandler atomic writes and moves.
+"""
+import errno
+import os
+
+import pytest
+from PIL import Image
+
+from src.services.file_handler import FileHandler
+from src.services.image_processor import image_processor
+
+
+class TestWriteBytesAtomic:
+    """Final files are written once, via temp name + rename"""
+
+    def test_writes_content_and_returns_size(self, tmp_path):
+        target = tmp_path / "creative.jpg"
+        assert FileHandler().write_bytes_atomic(target, b"\xff\xd8\xffdata") == 7
+        assert target.read_bytes() == b"\xff\xd8\xffdata"
+        assert os.listdir(tmp_path) == ["creative.jpg"]
+
+    def test_replaces_existing_file(self, tmp_path):
+        target = tmp_path / "creative.jpg"
+        target.write_bytes(b"old")
+        FileHandler().write_bytes_atomic(str(target), b"new")
+        assert target.read_bytes() == b"new"
+
+    def test_failure_leaves_no_temp_file(self, tmp_path, monkeypatch):
+        target = tmp_path / "creative.jpg"
+
+        def failing_replace(src, dst):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(os, "replace", failing_replace)
+        with pytest.raises(OSError):
+            FileHandler().write_bytes_atomic(target, b"data")
+        assert os.listdir(tmp_path) == []
+
+
+class TestMoveAtomic:
+    """Finished downloads are renamed into place, copied across filesystems"""
+
+    def test_cross_device_move_copies_and_removes_source(self, tmp_path, monkeypatch):
+        source = tmp_path / "download.part"
+        source.write_bytes(b"image")
+        target = tmp_path / "creative.jpg"
+        real_replace = os.replace
+
+        def replace(src, dst):
+            if str(src) == str(source):
+                raise OSError(errno.EXDEV, "Invalid cross-device link")
+            real_replace(src, dst)
+
+        monkeypatch.setattr(os, "replace", replace)
+        assert FileHandler().move_atomic(source, target) == 5
+        assert target.read_bytes() == b"image"
+        assert os.listdir(tmp_path) == ["creative.jpg"]
+
+    def test_other_errors_propagate(self, tmp_path, monkeypatch):
+        source = tmp_path / "download.part"
+        source.write_bytes(b"image")
+
+        def replace(src, dst):
+            raise OSError(errno.ENOSPC, "No space left on device")
+
+        monkeypatch.setattr(os, "replace", replace)
+        with pytest.raises(OSError):
+            FileHandler().move_atomic(source, tmp_path / "creative.jpg")
+        assert os.listdir(tmp_path) == ["download.part"]
+
+
+class TestThumbnails:
+    """Thumbnails are written next to the original and removed with it"""
+
+    @pytest.fixture(autouse=True)
+    def thread_mode(self, monkeypatch):
+        monkeypatch.setattr(image_processor, "max_workers", 0)
+
+    @pytest.mark.asyncio
+    async def test_fits_each_size_and_keeps_aspect(self, tmp_path):
+        original = tmp_path / "product.jpg"
+        Image.new("RGB", (2000, 1000), "navy").save(original, "JPEG")
+
+        thumbnails = await FileHandler().create_thumbnails(str(original))
+        assert thumbnails == {
+            "256": str(tmp_path / "thumbnails" / "product_256.jpg"),
+            "512": str(tmp_path / "thumbnails" / "product_512.jpg")
+        }
+        with Image.open(thumbnails["256"]) as img:
+            assert img.format == "JPEG" and img.size == (256, 128)
+        with Image.open(thumbnails["512"]) as img:
+            assert img.size == (512, 256)
+
+    @pytest.mark.asyncio
+    async def test_png_keeps_transparency(self, tmp_path):
+        original = tmp_path / "logo.png"
+        Image.new("RGBA", (600, 600), (0, 0, 0, 0)).save(original)
+
+        thumbnails = await FileHandler().create_thumbnails(str(original))
+        with Image.open(thumbnails["256"]) as img:
+            assert img.format == "PNG" and img.mode == "RGBA"
+            assert img.getpixel((10, 10))[3] == 0
+
+    @pytest.mark.asyncio
+    async def test_unreadable_image_gets_no_thumbnails(self, tmp_path):
+        original = tmp_path / "broken.jpg"
+        original.write_bytes(b"not an image")
+        handler = FileHandler()
+        assert await handler.create_thumbnails(str(original)) is None
+        assert handler.thumbnails_for(str(original)) is None
+
+    @pytest.mark.asyncio
+    async def test_delete_file_removes_thumbnails(self, tmp_path):
+        original = tmp_path / "creative.jpg"
+        Image.new("RGB", (800, 800), "navy").save(original, "JPEG")
+        handler = FileHandler()
+        await handler.create_thumbnails(str(original))
+
+        assert handler.delete_file(str(original))
+        assert list((tmp_path / "thumbnails").iterdir()) == []
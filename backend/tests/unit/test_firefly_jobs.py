@@ -0,0 +1,235 @@
+"""
+Unit tests for async Firefly job submission and the shared job poller.
+"""
+import asyncio
+import io
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from src.services import key_service as key_service_module
+from src.services.firefly_jobs import FireflyJobPoller
+from src.services.firefly_service import FireflyService
+from src.services.http_client import http_client
+from src.services.image_download import image_downloader
+from src.services.image_providers import FireflyAdapter, provider_registry
+from src.services.provider_limiter import ProviderLimiter
+from src.services import image_providers as image_providers_module
+
+SUBMIT_URL = "https://firefly.test/v3/images/generate-async"
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "purple").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class FireflyStandIn:
+    """Local Firefly v3 async API: jobs finish `latency` seconds after submission"""
+
+    def __init__(self, latency: float = 0.05, outcome: str = "succeeded"):
+        self.latency = latency
+        self.outcome = outcome
+        self.jobs = {}
+        self.status_calls = 0
+        self.image = _jpeg()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if request.method == "POST":
+            job_id = f"job-{len(self.jobs) + 1}"
+            self.jobs[job_id] = time.monotonic() + self.latency
+            return httpx.Response(202, json={
+                "jobId": job_id,
+                "statusUrl": f"https://firefly.test/v3/status/{job_id}",
+                "cancelUrl": f"https://firefly.test/v3/cancel/{job_id}"
+            })
+        if path.startswith("/v3/status/"):
+            self.status_calls += 1
+            job_id = path.rsplit("/", 1)[-1]
+            if time.monotonic() < self.jobs[job_id]:
+                return httpx.Response(200, json={"jobId": job_id, "status": "running", "progress": 50})
+            if self.outcome != "succeeded":
+                return httpx.Response(200, json={"jobId": job_id, "status": self.outcome, "message": "content policy"})
+            return httpx.Response(200, json={"jobId": job_id, "status": "succeeded", "result": {
+                "outputs": [{"seed": 1, "image": {"url": f"https://storage.test/{job_id}.jpg"}}]
+            }})
+        return httpx.Response(200, content=self.image, headers={"content-type": "image/jpeg"})
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    poller = FireflyJobPoller()
+    poller.initial_interval = 0.01
+    poller.max_interval = 0.05
+    poller.job_timeout = 5
+    monkeypatch.setattr(image_providers_module, "firefly_job_poller", poller)
+    return poller
+
+
+@pytest.fixture
+def stand_in(monkeypatch, tmp_path):
+    stand_in = FireflyStandIn()
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(stand_in)))
+    monkeypatch.setattr(image_downloader, "download_dir", tmp_path / "downloads")
+    return stand_in
+
+
+async def _submit(adapter: FireflyAdapter):
+    client = http_client.client
+    response = await client.post(SUBMIT_URL, json={"prompt": "p"})
+    return await adapter.decode_response(response.json(), client, {"x-api-key": "client"})
+
+
+class TestFireflyJobPoller:
+    """Submitted jobs are resolved by one background poll loop"""
+
+    @pytest.mark.asyncio
+    async def test_many_jobs_share_one_poller(self, poller, stand_in, monkeypatch):
+        adapter = FireflyAdapter()
+        tasks_started = []
+        original = poller._run
+
+        async def counted_run():
+            tasks_started.append(1)
+            await original()
+
+        monkeypatch.setattr(poller, "_run", counted_run)
+        results = await asyncio.gather(*(_submit(adapter) for _ in range(50)))
+
+        assert sorted(job_id for _, job_id in results) == sorted(stand_in.jobs)
+        assert all(paths[0].read_bytes() == stand_in.image for paths, _ in results)
+        assert len(tasks_started) == 1
+        # Adaptive backoff keeps polls per job small even at a 10ms starting interval
+        assert stand_in.status_calls <= 50 * 8
+        assert poller.stats()["succeeded"] == 50
+        assert poller.stats()["outstanding"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_job(self, poller, stand_in):
+        stand_in.outcome = "failed"
+        with pytest.raises(HTTPException) as error:
+            await _submit(FireflyAdapter())
+        assert error.value.status_code == 502
+        assert "content policy" in error.value.detail
+
+    @pytest.mark.asyncio
+    async def test_invalid_status_body_fails_only_that_job(self, poller, monkeypatch, tmp_path):
+        stand_in = FireflyStandIn()
+
+        def handler(request):
+            if request.url.path == "/v3/status/job-1":
+                return httpx.Response(200, content=b"<html>gateway error</html>")
+            return stand_in(request)
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(image_downloader, "download_dir", tmp_path)
+        broken, ok = await asyncio.gather(
+            _submit(FireflyAdapter()), _submit(FireflyAdapter()), return_exceptions=True
+        )
+        assert isinstance(broken, HTTPException) and broken.status_code == 502
+        assert ok[1] == "job-2"
+        assert poller.stats()["succeeded"] == 1 and poller.stats()["outstanding"] == 0
+
+    @pytest.mark.asyncio
+    async def test_slow_status_request_does_not_hold_up_other_jobs(self, poller, monkeypatch, tmp_path):
+        stand_in = FireflyStandIn(latency=0)
+
+        async def handler(request):
+            if request.url.path == "/v3/status/job-1":
+                await asyncio.sleep(0.5)
+            return stand_in(request)
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(image_downloader, "download_dir", tmp_path)
+        slow = asyncio.create_task(_submit(FireflyAdapter()))
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        await _submit(FireflyAdapter())
+        assert time.monotonic() - start < 0.4
+        await slow
+
+    @pytest.mark.asyncio
+    async def test_unexpected_error_fails_only_that_job(self, poller, stand_in, monkeypatch):
+        original = poller._poll
+
+        async def poll(job):
+            if job.job_id == "job-1":
+                raise RuntimeError("unexpected")
+            await original(job)
+
+        monkeypatch.setattr(poller, "_poll", poll)
+        broken, ok = await asyncio.gather(
+            _submit(FireflyAdapter()), _submit(FireflyAdapter()), return_exceptions=True
+        )
+        assert isinstance(broken, HTTPException) and broken.status_code == 502
+        assert ok[1] == "job-2"
+
+    @pytest.mark.asyncio
+    async def test_dead_loop_is_restarted(self, poller, stand_in, monkeypatch):
+        original = poller._run
+        runs = []
+
+        async def run():
+            runs.append(1)
+            if len(runs) == 1:
+                raise RuntimeError("poller bug")
+            await original()
+
+        monkeypatch.setattr(poller, "_run", run)
+        _, job_id = await asyncio.wait_for(_submit(FireflyAdapter()), timeout=2)
+        assert job_id == "job-1"
+        assert len(runs) == 2 and poller.stats()["restarts"] == 1
+
+    @pytest.mark.asyncio
+    async def test_job_timeout(self, poller, stand_in):
+        stand_in.latency = 10
+        poller.job_timeout = 0.1
+        with pytest.raises(HTTPException) as error:
+            await _submit(FireflyAdapter())
+        assert error.value.status_code == 504
+
+    @pytest.mark.asyncio
+    async def test_status_retry_after_is_honoured(self, poller, monkeypatch, tmp_path):
+        stand_in = FireflyStandIn(latency=0)
+        status_times = []
+
+        def handler(request):
+            if request.url.path.startswith("/v3/status/"):
+                status_times.append(time.monotonic())
+                if len(status_times) == 1:
+                    return httpx.Response(503, headers={"Retry-After": "0.2"})
+            return stand_in(request)
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(image_downloader, "download_dir", tmp_path)
+        await _submit(FireflyAdapter())
+        assert len(status_times) == 2
+        assert status_times[1] - status_times[0] >= 0.18
+
+
+class TestAsyncJobMode:
+    """FIREFLY_ASYNC_JOBS switches generation to submit-and-poll"""
+
+    def test_async_url_is_opt_in(self, monkeypatch):
+        assert FireflyAdapter().api_url.endswith("/generate")
+        monkeypatch.setenv("FIREFLY_ASYNC_JOBS", "true")
+        assert FireflyAdapter().api_url.endswith("/generate-async")
+
+    @pytest.mark.asyncio
+    async def test_generation_records_job_id(self, poller, stand_in, monkeypatch, tmp_path):
+        monkeypatch.setattr(key_service_module.key_service, "get_value", lambda db, key: "client")
+        monkeypatch.setattr(provider_registry.get("Adobe Firefly"), "limiter", ProviderLimiter(1000, 0))
+        service = FireflyService()
+        service.output_dir = tmp_path
+
+        file_path, mime_type, file_size, job_id = await service._call_firefly_api(
+            "prompt", "1:1", "token", SUBMIT_URL, "Adobe Firefly", use_cache=False
+        )
+        assert job_id == "job-1"
+        assert mime_type == "image/jpeg" and file_size > 0
+        assert stand_in.status_calls >= 1
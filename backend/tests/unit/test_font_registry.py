@@ -0,0 +1,64 @@
+"""
+Unit tests for the overlay font registry.
+"""
+import os
+
+import pytest
+from PIL import ImageFont
+
+from src.services import font_registry as font_registry_module
+from src.services.font_registry import FontRegistry
+
+DEJAVU = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    """Registry with only a DejaVu 'sans' face and no CJK face installed"""
+    monkeypatch.setattr(font_registry_module, "FONT_CANDIDATES", {
+        "sans": [str(tmp_path / "missing.ttf"), DEJAVU],
+        "cjk": [str(tmp_path / "missing-cjk.ttc")],
+    })
+    monkeypatch.delenv("OVERLAY_FONT_SANS", raising=False)
+    monkeypatch.delenv("OVERLAY_FONT_CJK", raising=False)
+    return FontRegistry()
+
+
+class TestFontRegistry:
+    """Font selection and (family, size) caching"""
+
+    @pytest.mark.parametrize("language_code", ["ja-JP", "zh-CN", "ko-KR"])
+    def test_cjk_languages_use_cjk_family(self, registry, language_code):
+        assert registry.family_for(language_code, "Run Faster") == "cjk"
+
+    def test_latin_languages_use_sans(self, registry):
+        assert registry.family_for("de-DE", "Schneller laufen") == "sans"
+
+    def test_cjk_text_detected_without_language(self, registry):
+        assert registry.family_for(text="速く走れ") == "cjk"
+        assert registry.family_for(text="ACME") == "sans"
+
+    @pytest.mark.skipif(not os.path.exists(DEJAVU), reason="DejaVu font not installed")
+    def test_fonts_are_cached_by_family_and_size(self, registry):
+        first = registry.get_font("sans", 64.8)
+        assert isinstance(first, ImageFont.FreeTypeFont)
+        assert registry.get_font("sans", 64) is first
+        assert registry.get_font("sans", 43) is not first
+        assert registry.loads == 2
+
+    @pytest.mark.skipif(not os.path.exists(DEJAVU), reason="DejaVu font not installed")
+    def test_missing_cjk_face_falls_back_to_sans(self, registry):
+        font = registry.get_font("cjk", 40)
+        assert isinstance(font, ImageFont.FreeTypeFont)
+        assert registry._font_data["cjk"] is registry._font_data["sans"]
+
+    def test_configured_font_takes_precedence(self, registry, monkeypatch, tmp_path):
+        configured = tmp_path / "brand.ttf"
+        configured.write_bytes(b"x")
+        monkeypatch.setenv("OVERLAY_FONT_CJK", str(configured))
+        assert registry._candidates("cjk")[0] == str(configured)
+
+    def test_no_font_files_uses_default_font(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(font_registry_module, "FONT_CANDIDATES", {"sans": [str(tmp_path / "none.ttf")]})
+        registry = FontRegistry()
+        assert registry.get_font("sans", 30) is registry.get_font("sans", 30)
@@ -0,0 +1,166 @@
+"""
+Unit tests for concurrent aspect-ratio generation in /ideas/{idea_id}/generate-creative.
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.api import ideas as ideas_api
+from src.services import job_worker
+
+
+PROVIDER_LATENCY = 0.2
+
+
+@pytest.fixture
+def patched_services(monkeypatch):
+    """Replace DB-backed services and the image provider with in-memory fakes"""
+    idea = SimpleNamespace(
+        id=uuid.uuid4(),
+        brief_id=uuid.uuid4(),
+        content="Idea",
+        region="US",
+        demographic="18-25",
+        language_code="en-US",
+    )
+    brief = SimpleNamespace(campaign_message="Run Faster", brand="Acme")
+    latencies = {"16:9": PROVIDER_LATENCY * 2, "9:16": PROVIDER_LATENCY, "1:1": PROVIDER_LATENCY * 1.5}
+
+    async def fake_generate_creative(db, idea_content, campaign_message, region, demographic,
+                                     aspect_ratio, *args, **kwargs):
+        await asyncio.sleep(latencies[aspect_ratio])
+        if aspect_ratio == "1:1" and getattr(fake_generate_creative, "fail_square", False):
+            raise RuntimeError("provider exploded")
+        return f"uploads/creatives/{aspect_ratio}.jpg", "image/jpeg", 100, None
+
+    def fake_create_creative(db, idea_id, file_path, mime_type, file_size, aspect_ratio, firefly_job_id,
+                             perceptual_hash=None):
+        now = datetime.utcnow()
+        return SimpleNamespace(
+            id=uuid.uuid4(), idea_id=idea_id, file_path=file_path, mime_type=mime_type,
+            file_size=file_size, aspect_ratio=aspect_ratio, firefly_job_id=firefly_job_id,
+            created_at=now, updated_at=now,
+        )
+
+    monkeypatch.setattr(ideas_api.idea_service, "get_idea_or_404", lambda db, idea_id: idea)
+    monkeypatch.setattr(ideas_api.brief_service, "get_brief_or_404", lambda db, brief_id: brief)
+    monkeypatch.setattr(ideas_api.brand_kit_cache, "get_current", lambda db: None)
+    monkeypatch.setattr(ideas_api.firefly_service, "generate_creative", fake_generate_creative)
+    monkeypatch.setattr(ideas_api.creative_service, "create_creative", fake_create_creative)
+    monkeypatch.setattr(ideas_api.firefly_service, "generation_concurrency", 3)
+    # Run inline in the request; the queued path is covered in test_job_queue
+    monkeypatch.setattr(ideas_api.job_queue, "enabled", False)
+    return fake_generate_creative
+
+
+async def _collect_events(idea_id, **params):
+    response = await ideas_api.generate_creative(idea_id, db=None, **params)
+    events = []
+    async for chunk in response.body_iterator:
+        header, data = chunk.strip().split("\n", 1)
+        events.append((header[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+class TestConcurrentAspectRatios:
+    """The three aspect ratios run in parallel and stream in completion order"""
+
+    @pytest.mark.asyncio
+    async def test_wall_clock_is_roughly_one_provider_call(self, patched_services):
+        start = time.perf_counter()
+        events = await _collect_events(uuid.uuid4())
+        elapsed = time.perf_counter() - start
+
+        # Slowest ratio takes 2x latency; sequential would be 4.5x
+        assert elapsed < PROVIDER_LATENCY * 3
+        assert [e for e, _ in events].count("creative") == 3
+        assert events[-1] == ("complete", {"total": 3})
+
+    @pytest.mark.asyncio
+    async def test_creatives_stream_in_completion_order(self, patched_services):
+        events = await _collect_events(uuid.uuid4())
+        creative_order = [data["aspect_ratio"] for event, data in events if event == "creative"]
+        assert creative_order == ["9:16", "1:1", "16:9"]
+
+    @pytest.mark.asyncio
+    async def test_progress_counter_is_monotonic(self, patched_services):
+        events = await _collect_events(uuid.uuid4())
+        progress = [data for event, data in events if event == "progress"]
+        assert [p["current"] for p in progress] == [1, 2, 3]
+        assert all(p["total"] == 3 for p in progress)
+
+    @pytest.mark.asyncio
+    async def test_concurrency_bound_is_respected(self, patched_services, monkeypatch):
+        monkeypatch.setattr(ideas_api.firefly_service, "generation_concurrency", 1)
+        start = time.perf_counter()
+        await _collect_events(uuid.uuid4())
+        elapsed = time.perf_counter() - start
+        assert elapsed >= PROVIDER_LATENCY * 4.5
+
+    @pytest.mark.asyncio
+    async def test_one_failure_does_not_block_other_ratios(self, patched_services):
+        patched_services.fail_square = True
+        events = await _collect_events(uuid.uuid4())
+        assert [e for e, _ in events].count("creative") == 2
+        errors = [data for event, data in events if event == "error"]
+        assert errors == [{"error": "provider exploded", "aspect_ratio": "1:1"}]
+
+
+class TestVariants:
+    """variants=K stores K sibling creatives per aspect ratio from one provider call"""
+
+    @pytest.fixture
+    def variant_calls(self, patched_services, monkeypatch):
+        calls = []
+
+        async def fake_generate_creative_variants(db, idea_content, campaign_message, region, demographic,
+                                                  aspect_ratio, *args, variants=1, **kwargs):
+            calls.append((aspect_ratio, variants))
+            await asyncio.sleep(PROVIDER_LATENCY)
+            return [(f"uploads/creatives/{aspect_ratio}-{i}.jpg", "image/jpeg", 100, "job") for i in range(variants)]
+
+        monkeypatch.setattr(ideas_api.firefly_service, "generate_creative_variants", fake_generate_creative_variants)
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_one_call_per_ratio(self, variant_calls):
+        events = await _collect_events(uuid.uuid4(), variants=3)
+
+        assert sorted(variant_calls) == [("16:9", 3), ("1:1", 3), ("9:16", 3)]
+        creatives = [data for event, data in events if event == "creative"]
+        assert len(creatives) == 9
+        assert sorted(c["variant"] for c in creatives if c["aspect_ratio"] == "1:1") == [0, 1, 2]
+        assert events[-1] == ("complete", {"total": 3, "variants": 3})
+
+    @pytest.mark.asyncio
+    async def test_resumed_job_requests_only_missing_variants(self, variant_calls):
+        def stored(aspect_ratio, variant):
+            return {"id": str(uuid.uuid4()), "aspect_ratio": aspect_ratio, "variant": variant}
+
+        # An earlier attempt stored every 16:9 variant and two of the 1:1 ones
+        job_worker._earlier_events.set({"creative": [
+            stored("16:9", 0), stored("16:9", 1), stored("16:9", 2), stored("1:1", 0), stored("1:1", 2)
+        ]})
+        events = []
+
+        async def emit(event_type, data):
+            events.append((event_type, data))
+
+        result = await ideas_api.run_generate_creative(None, {"idea_id": str(uuid.uuid4()), "variants": 3}, emit)
+
+        assert sorted(variant_calls) == [("1:1", 1), ("9:16", 3)]
+        creatives = [data for event, data in events if event == "creative"]
+        assert [c["variant"] for c in creatives if c["aspect_ratio"] == "1:1"] == [1]
+        assert len(creatives) == 4 and len(result["creative_ids"]) == 9
+
+    @pytest.mark.asyncio
+    async def test_variant_count_is_bounded(self, variant_calls):
+        with pytest.raises(HTTPException) as error:
+            await ideas_api.generate_creative(uuid.uuid4(), variants=99, db=None)
+        assert error.value.status_code == 400
@@ -0,0 +1,151 @@
+"""
+Unit tests for the content-addressed generation cache.
+"""
+import asyncio
+import base64
+import io
+import os
+import time
+
+import httpx
+import pytest
+from PIL import Image
+
+from src.services import firefly_service as firefly_module
+from src.services.firefly_service import FireflyService
+from src.services.generation_cache import GenerationCache
+from src.services.http_client import http_client
+from src.services.image_providers import provider_registry
+from src.services.provider_limiter import ProviderLimiter
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GenerationCache()
+    cache.enabled = True
+    cache.cache_dir = tmp_path / "cache"
+    cache.max_bytes = 1000
+    cache.ttl = 3600
+    return cache
+
+
+class TestGenerationCache:
+    """Keying, hits/misses, bypass, TTL and LRU eviction"""
+
+    def test_key_covers_all_inputs(self):
+        base = GenerationCache.make_key("DALL-E", "dall-e-3", "prompt", "1024x1024", ())
+        assert base == GenerationCache.make_key("DALL-E", "dall-e-3", "prompt", "1024x1024", ())
+        assert base != GenerationCache.make_key("Freepik", "dall-e-3", "prompt", "1024x1024", ())
+        assert base != GenerationCache.make_key("DALL-E", "dall-e-3", "prompt!", "1024x1024", ())
+        assert base != GenerationCache.make_key("DALL-E", "dall-e-3", "prompt", "1792x1024", ())
+        assert base != GenerationCache.make_key("DALL-E", "dall-e-3", "prompt", "1024x1024", ("vibrant",))
+        # Preset order does not matter
+        assert (GenerationCache.make_key("Adobe Firefly", None, "p", {"width": 1, "height": 1}, ["a", "b"])
+                == GenerationCache.make_key("Adobe Firefly", None, "p", {"height": 1, "width": 1}, ["b", "a"]))
+
+    @pytest.mark.asyncio
+    async def test_disabled_cache_is_a_no_op(self, cache):
+        cache.enabled = False
+        await cache.put("k", b"image")
+        assert await cache.get("k") is None
+        assert not cache.cache_dir.exists()
+        assert (await cache.stats())["misses"] == 0
+
+    @pytest.mark.asyncio
+    async def test_hit_miss_and_bypass_counters(self, cache):
+        assert await cache.get("k") is None
+        await cache.put("k", b"image")
+        assert await cache.get("k") == b"image"
+        assert await cache.get("k", bypass=True) is None
+        stats = await cache.stats()
+        assert (stats["hits"], stats["misses"], stats["bypassed"]) == (1, 1, 1)
+        assert stats["entries"] == 1 and stats["bytes"] == 5
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_are_dropped(self, cache):
+        await cache.put("k", b"image")
+        path = cache.cache_dir / "k.bin"
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+        assert await cache.get("k") is None
+        assert not path.exists()
+        assert (await cache.stats())["expired"] == 1
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_entries_are_evicted(self, cache):
+        await cache.put("a", b"x" * 400)
+        await cache.put("b", b"x" * 400)
+        await cache.get("a")
+        await cache.put("c", b"x" * 400)
+        assert await cache.get("b") is None
+        assert await cache.get("a") is not None and await cache.get("c") is not None
+        stats = await cache.stats()
+        assert stats["evictions"] == 1 and stats["bytes"] == 800
+
+    @pytest.mark.asyncio
+    async def test_concurrent_puts_of_one_key_count_once(self, cache):
+        await asyncio.gather(*(cache.put("k", b"image") for _ in range(5)))
+        assert await asyncio.gather(cache.get("k"), cache.get("k")) == [b"image", b"image"]
+        stats = await cache.stats()
+        assert stats["entries"] == 1 and stats["bytes"] == 5
+
+    @pytest.mark.asyncio
+    async def test_index_is_rebuilt_from_disk(self, cache, tmp_path):
+        await cache.put("k", b"image")
+        reopened = GenerationCache()
+        reopened.enabled = True
+        reopened.cache_dir = cache.cache_dir
+        assert await reopened.get("k") == b"image"
+        assert (await reopened.stats())["bytes"] == 5
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "teal").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestProviderCalls:
+    """Cache hits skip the provider but still produce a fresh overlaid creative"""
+
+    @pytest.fixture
+    def service(self, monkeypatch, tmp_path, cache):
+        service = FireflyService()
+        service.output_dir = tmp_path
+        service.requests = 0
+
+        def provider(request: httpx.Request) -> httpx.Response:
+            service.requests += 1
+            return httpx.Response(200, json={"data": [{"b64_json": base64.b64encode(_png()).decode()}]})
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(provider)))
+        monkeypatch.setattr(
+            service, "_get_provider_config",
+            lambda db: ("test-key", "https://images.test/v1/generate", "DALL-E")
+        )
+        # Behaviour tests, not throttling tests
+        monkeypatch.setattr(provider_registry.get("DALL-E"), "limiter", ProviderLimiter(1000, 0))
+        monkeypatch.setattr(firefly_module, "generation_cache", cache)
+        return service
+
+    async def _generate(self, service, **kwargs):
+        return await service.generate_creative(
+            db=None, idea_content="Beach day", campaign_message="Sun's out",
+            region="US", demographic="18-25", aspect_ratio="1:1", **kwargs
+        )
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_call_provider_once(self, service, cache):
+        first = await self._generate(service)
+        second = await self._generate(service)
+        assert service.requests == 1
+        assert first[0] != second[0]
+        assert os.path.exists(second[0])
+        assert (await cache.stats())["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_regenerate_bypasses_cache(self, service, cache):
+        await self._generate(service)
+        await self._generate(service, use_cache=False)
+        assert service.requests == 2
+        assert (await cache.stats())["bypassed"] == 1
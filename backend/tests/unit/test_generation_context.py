@@ -0,0 +1,138 @@
+"""
+Stress test: concurrent FireflyService generations must never mix up each other's inputs.
+"""
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import random
+import re
+
+import httpx
+import pytest
+from PIL import Image
+
+from src.services.firefly_service import FireflyService, GenerationContext
+from src.services.http_client import http_client
+from src.services.image_providers import provider_registry
+from src.services.provider_limiter import ProviderLimiter
+
+
+CONCURRENT_GENERATIONS = 200
+
+
+def _color_for(index: int) -> tuple:
+    """Distinct, JPEG-stable color per request index"""
+    return ((index * 37) % 256, (index * 91) % 256, (index * 53) % 256)
+
+
+def _png_bytes(color: tuple) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+async def _mock_provider(request: httpx.Request) -> httpx.Response:
+    """DALL-E stand-in that paints each image with a color derived from the prompt"""
+    prompt = json.loads(request.content)["prompt"]
+    index = int(re.search(r"Campaign message: \"message-(\d+)\"", prompt).group(1))
+    # Random latency so responses complete out of submission order
+    await asyncio.sleep(random.uniform(0, 0.05))
+    b64 = base64.b64encode(_png_bytes(_color_for(index))).decode()
+    return httpx.Response(200, json={"data": [{"b64_json": b64}]})
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    service = FireflyService()
+    service.output_dir = tmp_path
+    monkeypatch.setattr(
+        http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(_mock_provider))
+    )
+    monkeypatch.setattr(
+        service, "_get_provider_config",
+        lambda db: ("test-key", "https://images.test/v1/generate", "DALL-E")
+    )
+    # Behaviour tests, not throttling tests
+    monkeypatch.setattr(provider_registry.get("DALL-E"), "limiter", ProviderLimiter(1000, 0))
+
+    overlays = {}
+    real_overlay = service._add_text_overlays
+
+    async def recording_overlay(image_content, context):
+        result = await real_overlay(image_content, context)
+        overlays[hashlib.sha1(result).hexdigest()] = context
+        return result
+
+    monkeypatch.setattr(service, "_add_text_overlays", recording_overlay)
+    service.recorded_overlays = overlays
+    return service
+
+
+class TestGenerationContext:
+    """GenerationContext is immutable and keeps concurrent requests isolated"""
+
+    def test_context_is_frozen(self):
+        context = GenerationContext(campaign_message="hello")
+        with pytest.raises(AttributeError):
+            context.campaign_message = "other"
+
+    def test_prompt_is_built_from_context(self):
+        context = GenerationContext(
+            idea_content="Beach day",
+            campaign_message="Sun's out",
+            region="JP",
+            demographic="18-25",
+            brand_colors=("#ff0000",),
+            language_code="ja-JP",
+            brand_name="Acme",
+        )
+        prompt = FireflyService()._build_firefly_prompt(context)
+        assert "Beach day" in prompt
+        assert 'Campaign message: "Sun\'s out"' in prompt
+        assert "18-25 in JP" in prompt
+        assert "#ff0000" in prompt
+        assert "Text language: JA" in prompt
+        assert "'Acme'" in prompt
+
+    @pytest.mark.asyncio
+    async def test_concurrent_generations_keep_their_own_inputs(self, service):
+        async def generate(index: int):
+            result = await service.generate_creative(
+                db=None,
+                idea_content=f"idea-{index}",
+                campaign_message=f"message-{index}",
+                region=f"region-{index}",
+                demographic="18-25",
+                aspect_ratio="1:1",
+                language_code="en-US",
+                brand_name=f"brand-{index}",
+                brand_logo_path=f"/nonexistent/logo-{index}.png",
+            )
+            return index, result
+
+        results = await asyncio.gather(*(generate(i) for i in range(CONCURRENT_GENERATIONS)))
+
+        file_paths = [file_path for _, (file_path, _, _, _) in results]
+        assert len(set(file_paths)) == CONCURRENT_GENERATIONS
+        # No temp files are left behind next to the finals
+        assert sorted(str(p) for p in service.output_dir.iterdir() if p.is_file()) == sorted(file_paths)
+
+        for index, (file_path, mime_type, file_size, _) in results:
+            assert mime_type == "image/jpeg"
+            assert file_size > 0
+
+            # Overlay stage saw this request's own context
+            with open(file_path, "rb") as f:
+                context = service.recorded_overlays[hashlib.sha1(f.read()).hexdigest()]
+            assert context.campaign_message == f"message-{index}"
+            assert context.brand_name == f"brand-{index}"
+            assert context.brand_logo_path == f"/nonexistent/logo-{index}.png"
+            assert context.region == f"region-{index}"
+
+            # Output pixels came from the provider response for this request's prompt
+            with Image.open(file_path) as img:
+                pixel = img.convert("RGB").getpixel((8, 8))
+            expected = _color_for(index)
+            assert all(abs(a - b) <= 8 for a, b in zip(pixel, expected)), (index, pixel, expected)
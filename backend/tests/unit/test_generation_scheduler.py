@@ -0,0 +1,151 @@
+"""
+Unit tests for the fair-share generation scheduler.
+"""
+import asyncio
+
+import pytest
+
+from src.services.generation_scheduler import GenerationScheduler, generation_scheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = GenerationScheduler()
+    scheduler.max_concurrency = 1
+    scheduler.initial_service_seconds = 1.0
+    return scheduler
+
+
+async def _call(scheduler, order, label, hold=0.01, **context):
+    with scheduler.context(**context):
+        async with scheduler.slot("image"):
+            order.append(label)
+            await asyncio.sleep(hold)
+
+
+async def _blocked(scheduler):
+    """Occupy the only slot until the returned event is set"""
+    release = asyncio.Event()
+    held = asyncio.Event()
+
+    async def hold():
+        async with scheduler.slot("image"):
+            held.set()
+            await release.wait()
+
+    task = asyncio.create_task(hold())
+    await held.wait()
+    return release, task
+
+
+class TestGlobalCap:
+    """No more than max_concurrency provider calls run at once"""
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_capped(self, scheduler):
+        scheduler.max_concurrency = 3
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with scheduler.slot("llm"):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(12)))
+        assert peak == 3
+        assert scheduler.stats()["in_use"] == 0
+        assert scheduler.stats()["granted"] == 12
+
+
+class TestOrdering:
+    """Interactive calls jump the queue; bulk flows share it fairly"""
+
+    @pytest.mark.asyncio
+    async def test_interactive_lane_runs_before_queued_bulk(self, scheduler):
+        release, holder = await _blocked(scheduler)
+        order = []
+        bulk = [asyncio.create_task(_call(scheduler, order, f"bulk{n}", flow="brief:a")) for n in range(5)]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(_call(scheduler, order, "click", flow="brief:b", lane="interactive"))
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(holder, interactive, *bulk)
+        assert order[0] == "click"
+
+    @pytest.mark.asyncio
+    async def test_flows_interleave_instead_of_queueing_behind_each_other(self, scheduler):
+        release, holder = await _blocked(scheduler)
+        order = []
+        big = [asyncio.create_task(_call(scheduler, order, "big", flow="brief:big")) for _ in range(8)]
+        await asyncio.sleep(0)
+        small = [asyncio.create_task(_call(scheduler, order, "small", flow="brief:small")) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(holder, *big, *small)
+        # FIFO would run all 8 "big" calls first
+        assert order[:4] == ["big", "small", "big", "small"]
+
+    @pytest.mark.asyncio
+    async def test_weight_buys_a_larger_share(self, scheduler):
+        release, holder = await _blocked(scheduler)
+        order = []
+        heavy = [asyncio.create_task(_call(scheduler, order, "heavy", flow="brief:heavy", weight=2.0)) for _ in range(6)]
+        light = [asyncio.create_task(_call(scheduler, order, "light", flow="brief:light")) for _ in range(6)]
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(holder, *heavy, *light)
+        assert order[:6].count("heavy") == 4
+
+
+class TestQueueReporting:
+    """Waiting calls report their position and an ETA as the queue drains"""
+
+    @pytest.mark.asyncio
+    async def test_positions_count_down(self, scheduler):
+        release, holder = await _blocked(scheduler)
+        reports = []
+
+        async def on_queue(position):
+            reports.append(position)
+
+        order = []
+        ahead = [asyncio.create_task(_call(scheduler, order, n, flow=f"brief:{n}")) for n in range(2)]
+        await asyncio.sleep(0)
+        tracked = asyncio.create_task(_call(scheduler, order, "tracked", flow="brief:t", on_queue=on_queue))
+        await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(holder, tracked, *ahead)
+        assert [r["position"] for r in reports] == [3, 2, 1]
+        assert all(r["stage"] == "provider" and r["lane"] == "bulk" for r in reports)
+        assert reports[0]["eta_seconds"] == 3.0  # three calls of the initial estimate, one slot
+        assert reports[-1]["eta_seconds"] < reports[0]["eta_seconds"]
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_the_queue(self, scheduler):
+        release, holder = await _blocked(scheduler)
+        order = []
+        waiting = asyncio.create_task(_call(scheduler, order, "gone"))
+        await asyncio.sleep(0)
+        assert scheduler.stats()["waiting"]["bulk"] == 1
+
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        release.set()
+        await holder
+        stats = scheduler.stats()
+        assert stats["waiting"]["bulk"] == 0 and stats["in_use"] == 0
+        assert order == []
+
+    def test_unknown_lane_is_rejected(self):
+        with pytest.raises(ValueError):
+            with generation_scheduler.context(lane="vip"):
+                pass
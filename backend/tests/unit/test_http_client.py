@@ -0,0 +1,82 @@
+"""
+Unit tests for the shared pooled HTTP client.
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from src.services.http_client import HTTPClientPool, _HostLimitedTransport
+
+
+class _CountingTransport(httpx.AsyncBaseTransport):
+    """Records peak in-flight requests per host"""
+
+    def __init__(self):
+        self.in_flight = {}
+        self.peak = {}
+
+    async def handle_async_request(self, request):
+        host = request.url.host
+        self.in_flight[host] = self.in_flight.get(host, 0) + 1
+        self.peak[host] = max(self.peak.get(host, 0), self.in_flight[host])
+        await asyncio.sleep(0.01)
+        self.in_flight[host] -= 1
+        return httpx.Response(200, content=b"ok")
+
+
+class TestHTTPClientPool:
+    """Pool configuration and lifecycle"""
+
+    def test_timeout_phases_are_separate(self, monkeypatch):
+        monkeypatch.setenv("HTTP_CONNECT_TIMEOUT", "2")
+        monkeypatch.setenv("HTTP_POOL_TIMEOUT", "3")
+        pool = HTTPClientPool()
+        timeout = pool.timeout(read=120.0)
+        assert timeout.connect == 2.0
+        assert timeout.pool == 3.0
+        assert timeout.read == 120.0
+
+    @pytest.mark.asyncio
+    async def test_start_close_reuses_one_client(self):
+        pool = HTTPClientPool()
+        await pool.start()
+        client = pool.client
+        await pool.start()
+        assert pool.client is client
+        await pool.close()
+        assert client.is_closed
+
+    @pytest.mark.asyncio
+    async def test_http2_can_be_disabled(self, monkeypatch):
+        monkeypatch.setenv("HTTP_ENABLE_HTTP2", "false")
+        pool = HTTPClientPool()
+        assert pool._http2_available() is False
+        await pool.close()
+
+
+class TestHostLimitedTransport:
+    """Per-host in-flight caps"""
+
+    @pytest.mark.asyncio
+    async def test_per_host_limit_is_enforced_independently(self):
+        inner = _CountingTransport()
+        async with httpx.AsyncClient(transport=_HostLimitedTransport(inner, max_per_host=3)) as client:
+            await asyncio.gather(
+                *(client.get("https://a.test/") for _ in range(20)),
+                *(client.get("https://b.test/") for _ in range(20)),
+            )
+        assert inner.peak == {"a.test": 3, "b.test": 3}
+
+    @pytest.mark.asyncio
+    async def test_slot_released_when_request_fails(self):
+        class FailingTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                raise httpx.ConnectError("boom", request=request)
+
+        transport = _HostLimitedTransport(FailingTransport(), max_per_host=1)
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(3):
+                with pytest.raises(httpx.ConnectError):
+                    await client.get("https://a.test/")
+        assert transport._semaphores["a.test"]._value == 1
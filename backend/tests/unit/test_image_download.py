@@ -0,0 +1,132 @@
+"""
+Unit tests for streaming image downloads.
+"""
+import io
+import tracemalloc
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from src.services.http_client import http_client
+from src.services.image_download import ImageDownloader, sniff_image_type
+
+URL = "https://storage.test/presigned/image.jpg"
+
+
+def _jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "orange").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    downloader = ImageDownloader()
+    downloader.download_dir = tmp_path / "downloads"
+    downloader.retries = 2
+    return downloader
+
+
+def _serve(monkeypatch, handler):
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+
+class TestSniffImageType:
+    def test_magic_bytes(self):
+        assert sniff_image_type(_jpeg()[:12]) == "image/jpeg"
+        assert sniff_image_type(b"\x89PNG\r\n\x1a\n\x00\x00\x00\r") == "image/png"
+        assert sniff_image_type(b"RIFF\x00\x00\x00\x00WEBP") == "image/webp"
+        assert sniff_image_type(b"<html><body>") is None
+
+
+class TestImageDownloader:
+    """Chunked download to disk with validation and truncation retries"""
+
+    @pytest.mark.asyncio
+    async def test_streams_image_to_file(self, downloader, monkeypatch):
+        image = _jpeg()
+        _serve(monkeypatch, lambda request: httpx.Response(200, content=image, headers={"content-type": "image/jpeg"}))
+        path = await downloader.download(URL)
+        assert path.read_bytes() == image
+        assert path.parent == downloader.download_dir
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("response", [
+        httpx.Response(403, text="expired signature"),
+        httpx.Response(200, content=b"<html>not an image</html>", headers={"content-type": "text/html"}),
+        httpx.Response(200, content=b"<html>not an image</html>", headers={"content-type": "application/octet-stream"}),
+    ])
+    async def test_rejects_bad_downloads(self, downloader, monkeypatch, response):
+        _serve(monkeypatch, lambda request: response)
+        with pytest.raises(HTTPException) as error:
+            await downloader.download(URL)
+        assert error.value.status_code == 502
+        assert list(downloader.download_dir.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_size_cap(self, downloader, monkeypatch):
+        downloader.max_bytes = 1024
+        downloader.chunk_size = 256
+
+        async def body():
+            yield _jpeg()[:12]
+            for _ in range(10):
+                yield b"\x00" * 256
+
+        # No Content-Length: the cap is enforced while streaming
+        _serve(monkeypatch, lambda request: httpx.Response(200, content=body(), headers={"content-type": "image/jpeg"}))
+        with pytest.raises(HTTPException):
+            await downloader.download(URL)
+        assert list(downloader.download_dir.iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_truncated_transfer_is_retried(self, downloader, monkeypatch):
+        image = _jpeg()
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if len(calls) == 1:
+                return httpx.Response(200, content=image[:100], headers={
+                    "content-type": "image/jpeg", "content-length": str(len(image))
+                })
+            return httpx.Response(200, content=image, headers={"content-type": "image/jpeg"})
+
+        _serve(monkeypatch, handler)
+        path = await downloader.download(URL)
+        assert len(calls) == 2
+        assert path.read_bytes() == image
+        assert downloader.truncated == 1
+
+    @pytest.mark.asyncio
+    async def test_gives_up_when_always_truncated(self, downloader, monkeypatch):
+        image = _jpeg()
+        _serve(monkeypatch, lambda request: httpx.Response(200, content=image[:100], headers={
+            "content-type": "image/jpeg", "content-length": str(len(image))
+        }))
+        with pytest.raises(HTTPException) as error:
+            await downloader.download(URL)
+        assert error.value.status_code == 502
+        assert downloader.truncated == 3
+
+    @pytest.mark.asyncio
+    async def test_memory_stays_bounded_for_large_images(self, downloader, monkeypatch):
+        chunk = b"\x00" * (64 * 1024)
+        total_chunks = 512  # 32MB
+
+        async def body():
+            yield _jpeg()[:12]
+            for _ in range(total_chunks):
+                yield chunk
+
+        _serve(monkeypatch, lambda request: httpx.Response(200, content=body(), headers={"content-type": "image/jpeg"}))
+        tracemalloc.start()
+        try:
+            path = await downloader.download(URL)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        assert path.stat().st_size == 12 + total_chunks * len(chunk)
+        assert peak < 4 * 1024 * 1024
@@ -0,0 +1,159 @@
+"""
+Unit tests for the image post-processing pool.
+"""
+import asyncio
+import io
+import os
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from PIL import Image
+
+from src.services.font_registry import font_registry
+from src.services.image_processor import ImageProcessor, compose_overlays, overlay_layer, prepare_logo
+
+
+def _jpeg(width: int, height: int, color="navy") -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def _png_rgba(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGBA", (width, height), (10, 200, 10, 128)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestComposeOverlays:
+    """The pool worker function: bytes in, JPEG bytes out"""
+
+    def test_returns_jpeg_of_same_size(self):
+        result = compose_overlays(_jpeg(1080, 1080), "Run Faster", "Acme", None, 1080, 1080)
+        with Image.open(io.BytesIO(result)) as img:
+            assert img.format == "JPEG"
+            assert img.size == (1080, 1080)
+
+    def test_accepts_rgba_png_from_provider(self):
+        result = compose_overlays(_png_rgba(256, 256), "Run Faster", None, None, 1080, 1080)
+        assert result.startswith(b"\xff\xd8\xff")
+
+    def test_accepts_file_path(self, tmp_path):
+        image_path = tmp_path / "download.jpg"
+        image_path.write_bytes(_jpeg(1920, 1080))
+        result = compose_overlays(str(image_path), "Run Faster", None, None, 1920, 1080)
+        with Image.open(io.BytesIO(result)) as img:
+            assert img.size == (1920, 1080)
+
+    def test_composites_logo(self, tmp_path):
+        logo_path = tmp_path / "logo.png"
+        Image.new("RGB", (400, 400), (255, 0, 0)).save(logo_path)
+        logo = prepare_logo(str(logo_path), 162)
+        result = compose_overlays(_jpeg(1080, 1080, "black"), "Msg", None, logo, 1080, 1080)
+        with Image.open(io.BytesIO(result)) as img:
+            r, g, b = img.getpixel((60, 60))
+        assert r > 200 and g < 60 and b < 60
+
+    def test_caption_box_is_translucent(self):
+        result = compose_overlays(_jpeg(1080, 1080, (0, 0, 250)), "Run Faster", None, None, 1080, 1080)
+        family = font_registry.family_for("en-US", "Run Faster")
+        (x, y), _ = overlay_layer(message="Run Faster", brand_name=None, message_family=family,
+                                  brand_family=font_registry.family_for(text=""), width=1080, height=1080)[0]
+        with Image.open(io.BytesIO(result)) as img:
+            # Just inside the box corner, away from the text: the blue base shows through
+            r, g, b = img.getpixel((x + 3, y + 3))
+        assert r < 20 and g < 20
+        assert 50 < b < 120
+
+    def test_overlay_layer_is_cached_per_message_and_size(self):
+        overlay_layer.cache_clear()
+        for _ in range(3):
+            compose_overlays(_jpeg(640, 640), "Run Faster", "Acme", None, 640, 640)
+        compose_overlays(_jpeg(640, 360), "Run Faster", "Acme", None, 640, 360)
+        info = overlay_layer.cache_info()
+        assert (info.misses, info.hits) == (2, 2)
+
+    def test_prepare_logo_flattens_transparency_and_fits_box(self, tmp_path):
+        logo_path = tmp_path / "logo.png"
+        Image.new("RGBA", (400, 200), (0, 0, 0, 0)).save(logo_path)
+        width, height, data = prepare_logo(str(logo_path), 162)
+        assert (width, height) == (162, 81)
+        assert len(data) == width * height * 3
+        # Fully transparent pixels become white
+        assert data[:3] == b"\xff\xff\xff"
+
+    def test_prepare_logo_missing_file(self, tmp_path):
+        assert prepare_logo(str(tmp_path / "missing.png"), 162) is None
+
+
+class TestImageProcessor:
+    """Pool execution, queue-depth metric and event-loop responsiveness"""
+
+    @pytest.mark.asyncio
+    async def test_runs_in_process_pool_and_tracks_queue_depth(self):
+        processor = ImageProcessor()
+        processor.max_workers = 2
+        try:
+            image = _jpeg(1080, 1080)
+            results = await asyncio.gather(*(
+                processor.run(compose_overlays, image, "Msg", "Acme", None, 1080, 1080) for _ in range(6)
+            ))
+            assert all(r.startswith(b"\xff\xd8\xff") for r in results)
+            stats = processor.stats()
+            assert stats["mode"] == "process"
+            assert stats["completed"] == 6
+            assert stats["queue_depth"] == 0
+            assert stats["peak_queue_depth"] == 6
+        finally:
+            processor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_pool_is_replaced_after_a_worker_dies(self):
+        processor = ImageProcessor()
+        processor.max_workers = 1
+        try:
+            # The worker exits mid-task; the retry on a fresh pool dies the same way
+            with pytest.raises(BrokenProcessPool):
+                await processor.run(os._exit, 1)
+            result = await processor.run(compose_overlays, _jpeg(1080, 1080), "Msg", None, None, 1080, 1080)
+            assert result.startswith(b"\xff\xd8\xff")
+            assert processor.stats()["restarts"] == 2
+        finally:
+            await asyncio.to_thread(processor.shutdown)
+
+    @pytest.mark.asyncio
+    async def test_failures_are_counted(self):
+        processor = ImageProcessor()
+        processor.max_workers = 0
+        with pytest.raises(Exception):
+            await processor.run(compose_overlays, b"not an image", "Msg", None, None, 1080, 1080)
+        assert processor.stats()["failed"] == 1
+        assert processor.stats()["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive_during_composites(self):
+        processor = ImageProcessor()
+        processor.max_workers = 1
+        try:
+            image = _jpeg(1920, 1080)
+            await processor.run(compose_overlays, image, "warm up", None, None, 1920, 1080)
+
+            lags = []
+
+            async def ticker():
+                while True:
+                    start = time.perf_counter()
+                    await asyncio.sleep(0.005)
+                    lags.append(time.perf_counter() - start - 0.005)
+
+            tick = asyncio.create_task(ticker())
+            await asyncio.gather(*(
+                processor.run(compose_overlays, image, "Msg", "Acme", None, 1920, 1080) for _ in range(8)
+            ))
+            tick.cancel()
+
+            # Compositing never ran on the loop, so no tick was held up for a whole composite
+            assert lags and max(lags) < 0.05
+        finally:
+            processor.shutdown()
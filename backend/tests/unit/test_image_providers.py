@@ -0,0 +1,245 @@
+"""
+Unit tests for image provider adapters and per-provider throttling.
+"""
+import asyncio
+import base64
+import io
+import json
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from src.services.firefly_service import FireflyService, redact_headers
+from src.services.generation_scheduler import generation_scheduler
+from src.services.http_client import http_client
+from src.services.image_providers import (
+    FireflyAdapter, FreepikAdapter, OpenAIAdapter, provider_registry
+)
+from src.services.key_service import key_service
+from src.services.provider_limiter import ProviderLimiter, parse_retry_after
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "teal").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestRegistry:
+    """Provider names resolve to adapters that own their request format"""
+
+    def test_aliases_share_one_adapter(self):
+        assert provider_registry.get("OpenAI") is provider_registry.get("DALL-E")
+        assert isinstance(provider_registry.get("DALL-E"), OpenAIAdapter)
+        assert isinstance(provider_registry.get("Freepik"), FreepikAdapter)
+
+    def test_unknown_provider_uses_firefly(self):
+        assert isinstance(provider_registry.get("Something Else"), FireflyAdapter)
+
+    def test_payloads(self):
+        dimensions = {"width": 1920, "height": 1080}
+        dalle = provider_registry.get("DALL-E").build_payload("p", "16:9", dimensions)
+        assert dalle["size"] == "1792x1024" and dalle["response_format"] == "b64_json"
+        freepik = provider_registry.get("Freepik").build_payload("p", "16:9", dimensions)
+        assert freepik["size"] == dimensions and "style" not in freepik
+        assert provider_registry.get("Freepik").build_headers("k")["x-freepik-api-key"] == "k"
+
+    def test_firefly_sends_the_full_token(self, monkeypatch):
+        monkeypatch.setattr(key_service, "get_value", lambda db, key: "client-id")
+        token = "eyJ" + "a" * 900
+        headers = FireflyAdapter().build_headers(token, db=None)
+        assert headers["Authorization"] == f"Bearer {token}"
+        assert headers["x-api-key"] == "client-id"
+
+    def test_logged_headers_hide_credentials(self):
+        headers = {"Authorization": "Bearer secret", "x-freepik-api-key": "secret", "Content-Type": "application/json"}
+        assert "secret" not in str(redact_headers(headers))
+        assert redact_headers(headers)["Content-Type"] == "application/json"
+
+    def test_limits_are_configurable(self, monkeypatch):
+        monkeypatch.setenv("IMAGE_PROVIDER_FREEPIK_MAX_IN_FLIGHT", "2")
+        monkeypatch.setenv("IMAGE_PROVIDER_FREEPIK_RPM", "6")
+        adapter = FreepikAdapter()
+        assert adapter.limiter.max_in_flight == 2
+        assert adapter.limiter.requests_per_minute == 6
+
+    def test_stats_list_each_adapter_once(self):
+        stats = provider_registry.stats()
+        assert "OpenAI" in stats and "DALL-E" not in stats
+
+
+class TestProviderLimiter:
+    """In-flight cap, token-bucket pacing and Retry-After pauses"""
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("7") == 7.0
+        assert parse_retry_after(None) is None
+        assert parse_retry_after("soon") is None
+        assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+    @pytest.mark.asyncio
+    async def test_in_flight_cap(self):
+        limiter = ProviderLimiter(max_in_flight=2, requests_per_minute=0)
+        peak = 0
+
+        async def request():
+            nonlocal peak
+            async with limiter.slot():
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(request() for _ in range(10)))
+        assert peak == 2
+        assert limiter.stats()["started"] == 10
+
+    @pytest.mark.asyncio
+    async def test_requests_are_paced_to_rpm(self):
+        # 3000 rpm = 50/s after an initial burst of max_in_flight
+        limiter = ProviderLimiter(max_in_flight=2, requests_per_minute=3000)
+
+        async def request():
+            async with limiter.slot():
+                pass
+
+        start = time.monotonic()
+        await asyncio.gather(*(request() for _ in range(20)))
+        assert time.monotonic() - start >= 18 / 50 * 0.9
+
+    @pytest.mark.asyncio
+    async def test_pause_delays_next_request(self):
+        limiter = ProviderLimiter(max_in_flight=4, requests_per_minute=0)
+        limiter.pause(0.1)
+        start = time.monotonic()
+        async with limiter.slot():
+            pass
+        assert time.monotonic() - start >= 0.09
+
+
+class TestRetryAfter:
+    """A 429 pauses the provider for Retry-After and the request is retried"""
+
+    @pytest.fixture
+    def service(self, monkeypatch, tmp_path):
+        service = FireflyService()
+        service.output_dir = tmp_path
+        monkeypatch.setattr(
+            service, "_get_provider_config",
+            lambda db: ("test-key", "https://images.test/v1/generate", "DALL-E")
+        )
+        monkeypatch.setattr(provider_registry.get("DALL-E"), "limiter", ProviderLimiter(4, 0))
+        return service
+
+    def _provider(self, monkeypatch, statuses):
+        calls = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            calls.append(time.monotonic())
+            status = statuses[min(len(calls), len(statuses)) - 1]
+            if status == 429:
+                return httpx.Response(429, headers={"Retry-After": "0.1"}, json={"error": "slow down"})
+            return httpx.Response(200, json={"data": [{"b64_json": base64.b64encode(_png()).decode()}]})
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_request_is_retried(self, service, monkeypatch):
+        calls = self._provider(monkeypatch, [429, 429, 200])
+        file_path, _, _, _ = await service._call_firefly_api(
+            "prompt", "1:1", "test-key", "https://images.test/v1/generate", "DALL-E"
+        )
+        assert len(calls) == 3
+        assert calls[1] - calls[0] >= 0.09
+        assert provider_registry.get("DALL-E").limiter.stats()["pauses"] == 2
+
+    @pytest.mark.asyncio
+    async def test_paused_provider_holds_no_global_slots(self, service, monkeypatch):
+        calls = self._provider(monkeypatch, [200])
+        monkeypatch.setattr(generation_scheduler, "max_concurrency", 2)
+        provider_registry.get("DALL-E").limiter.pause(0.2)
+        waiting = [asyncio.create_task(service._call_firefly_api(
+            "prompt", "1:1", "test-key", "https://images.test/v1/generate", "DALL-E", use_cache=False
+        )) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        # Every image call is parked in the provider limiter; LLM calls still get slots
+        assert generation_scheduler.stats()["in_use"] == 0
+        async def llm_call():
+            async with generation_scheduler.slot("llm"):
+                return len(calls)
+
+        assert await asyncio.wait_for(llm_call(), timeout=1) == 0
+        await asyncio.gather(*waiting)
+        assert len(calls) == 3
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_configured_retries(self, service, monkeypatch):
+        service.max_retries = 1
+        calls = self._provider(monkeypatch, [429])
+        with pytest.raises(HTTPException) as error:
+            await service._call_firefly_api(
+                "prompt", "1:1", "test-key", "https://images.test/v1/generate", "DALL-E"
+            )
+        assert len(calls) == 2
+        assert error.value.status_code == 429
+
+
+class TestVariants:
+    """Several outputs per provider request, each overlaid and stored separately"""
+
+    @pytest.fixture
+    def firefly(self, monkeypatch, tmp_path):
+        from src.services import key_service as key_service_module
+        from src.services.image_download import image_downloader
+
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "POST":
+                requests.append(request)
+                count = json.loads(request.content).get("numVariations", 1)
+                return httpx.Response(200, json={"outputs": [
+                    {"seed": i, "image": {"url": f"https://storage.test/{i}.png"}} for i in range(count)
+                ]})
+            return httpx.Response(200, content=_png(), headers={"content-type": "image/png"})
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(key_service_module.key_service, "get_value", lambda db, key: "client")
+        monkeypatch.setattr(image_downloader, "download_dir", tmp_path / "downloads")
+        adapter = provider_registry.get("Adobe Firefly")
+        monkeypatch.setattr(adapter, "limiter", ProviderLimiter(1000, 0))
+        service = FireflyService()
+        service.output_dir = tmp_path / "creatives"
+        service.output_dir.mkdir()
+        return service, adapter, requests
+
+    def test_payload_requests_variations(self):
+        dimensions = {"width": 1080, "height": 1080}
+        assert "numVariations" not in provider_registry.get("Adobe Firefly").build_payload("p", "1:1", dimensions)
+        assert provider_registry.get("Adobe Firefly").build_payload("p", "1:1", dimensions, 3)["numVariations"] == 3
+        assert provider_registry.get("Freepik").build_payload("p", "1:1", dimensions, 2)["num_images"] == 2
+
+    @pytest.mark.asyncio
+    async def test_variants_share_one_request(self, firefly):
+        service, _, requests = firefly
+        results = await service._call_firefly_api_variants(
+            "prompt", "1:1", "token", "https://firefly.test/v3/images/generate", "Adobe Firefly",
+            use_cache=False, variants=3
+        )
+        assert len(requests) == 1
+        assert len({file_path for file_path, _, _, _ in results}) == 3
+        assert list((service.output_dir.parent / "downloads").iterdir()) == []
+
+    @pytest.mark.asyncio
+    async def test_batches_follow_provider_limit(self, firefly, monkeypatch):
+        service, adapter, requests = firefly
+        monkeypatch.setattr(adapter, "max_variants", 2)
+        results = await service._call_firefly_api_variants(
+            "prompt", "1:1", "token", "https://firefly.test/v3/images/generate", "Adobe Firefly",
+            use_cache=False, variants=3
+        )
+        assert sorted(json.loads(r.content).get("numVariations", 1) for r in requests) == [1, 2]
+        assert len(results) == 3
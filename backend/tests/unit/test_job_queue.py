@@ -0,0 +1,416 @@
+"""
+Unit tests for the persistent job queue and its worker pool.
+
+Runs against a file-backed SQLite database: SQLite ignores FOR UPDATE SKIP
+LOCKED, so concurrent claims are only exercised on PostgreSQL.
+"""
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from src.api import briefs as briefs_api
+from src.api import ideas as ideas_api
+from src.models.job import Job, JobEvent
+from src.services.job_queue import INTERACTIVE_PRIORITY, job_queue
+from src.services.job_worker import JobWorkerPool, earlier_events
+
+
+@compiles(UUID, "sqlite")
+def _compile_uuid_for_sqlite(type_, compiler, **kw):
+    return "CHAR(36)"
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_for_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Job.__table__.create(engine)
+    JobEvent.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(job_queue, "session_factory", factory)
+    monkeypatch.setattr(job_queue, "event_poll_interval", 0.05)
+    monkeypatch.setattr(job_queue, "retry_base_delay", 5)
+    monkeypatch.setattr(job_queue, "lease_seconds", 60)
+    return factory
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def pool():
+    pool = JobWorkerPool()
+    pool.poll_interval = 0.05
+    pool.heartbeat_interval = 0.05
+    return pool
+
+
+def _format(event_id, event_type, data):
+    return json.dumps({"id": event_id, "type": event_type, **data})
+
+
+async def _events(job_id, after_id=0):
+    return [json.loads(m) async for m in job_queue.stream(job_id, _format, after_id=after_id)]
+
+
+class TestClaim:
+    """Claims honour priority, due time and leases"""
+
+    def test_higher_priority_is_claimed_first(self, db):
+        bulk = job_queue.enqueue(db, "execute_brief", {"n": 1})
+        interactive = job_queue.enqueue(db, "regenerate_creative", {"n": 2}, priority=10)
+
+        first = job_queue.claim(db, "w1")
+        second = job_queue.claim(db, "w1")
+
+        assert (first.id, second.id) == (interactive.id, bulk.id)
+        assert first.status == "running" and first.attempts == 1 and first.lease_owner == "w1"
+        assert job_queue.claim(db, "w1") is None
+
+    def test_claim_filters_job_types_and_due_time(self, db):
+        job_queue.enqueue(db, "execute_brief", {})
+        later = job_queue.enqueue(db, "regenerate_asset", {})
+        later.run_after = datetime.utcnow() + timedelta(minutes=5)
+        db.commit()
+
+        assert job_queue.claim(db, "w1", job_types=["regenerate_asset"]) is None
+        assert job_queue.claim(db, "w1", job_types=["execute_brief"]).job_type == "execute_brief"
+
+    def test_interactive_workers_leave_bulk_jobs_alone(self, db):
+        job_queue.enqueue(db, "execute_brief", {})
+        assert job_queue.claim(db, "w-interactive", min_priority=INTERACTIVE_PRIORITY) is None
+
+        click = job_queue.enqueue(db, "regenerate_creative", {}, priority=INTERACTIVE_PRIORITY)
+        assert job_queue.claim(db, "w-interactive", min_priority=INTERACTIVE_PRIORITY).id == click.id
+
+    def test_expired_lease_is_reclaimed_by_another_worker(self, db, monkeypatch):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        monkeypatch.setattr(job_queue, "lease_seconds", -1)
+        job_queue.claim(db, "dead-worker")
+        monkeypatch.setattr(job_queue, "lease_seconds", 60)
+
+        reclaimed = job_queue.claim(db, "w2")
+
+        assert reclaimed.id == job.id
+        assert reclaimed.lease_owner == "w2" and reclaimed.attempts == 2
+        # The old owner can no longer renew or finish it
+        assert job_queue.heartbeat(db, job.id, "dead-worker") is False
+        assert job_queue.complete(db, job.id, "dead-worker", {}) is False
+        assert job_queue.heartbeat(db, job.id, "w2") is True
+
+    def test_expired_lease_on_final_attempt_fails_the_job(self, db, monkeypatch):
+        job = job_queue.enqueue(db, "execute_brief", {}, max_attempts=1)
+        monkeypatch.setattr(job_queue, "lease_seconds", -1)
+        job_queue.claim(db, "dead-worker")
+
+        assert job_queue.claim(db, "w2") is None
+        db.refresh(job)
+        assert job.status == "failed" and "lease expired" in job.error
+        [event] = job_queue.events_after(db, job.id)
+        assert event.event_type == "job_failed" and event.data == {"error": job.error, "attempt": 1}
+
+
+class TestRetries:
+    """Failed attempts back off exponentially until max_attempts"""
+
+    def test_backoff_then_failure(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {}, max_attempts=3)
+        delays = []
+        for _ in range(3):
+            job.run_after = datetime.utcnow()
+            db.commit()
+            job_queue.claim(db, "w1")
+            delays.append(job_queue.fail(db, job.id, "w1", "provider down"))
+
+        assert delays == [5, 10, None]
+        db.refresh(job)
+        assert job.status == "failed" and job.error == "provider down" and job.finished_at
+
+    def test_non_retryable_failure_is_final(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        job_queue.claim(db, "w1")
+
+        assert job_queue.fail(db, job.id, "w1", "not found", retryable=False) is None
+        db.refresh(job)
+        assert job.status == "failed" and job.attempts == 1
+
+    def test_release_does_not_spend_an_attempt(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        job_queue.claim(db, "w1")
+        job_queue.release(db, job.id, "w1")
+
+        db.refresh(job)
+        assert job.status == "queued" and job.attempts == 0 and job.lease_owner is None
+
+
+class TestEventStream:
+    """Subscribers replay events in order and stop when the job finishes"""
+
+    @pytest.mark.asyncio
+    async def test_stream_replays_and_resumes(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        job_queue.claim(db, "w1")
+        for n in range(3):
+            await job_queue.record_event(job.id, "progress", {"n": n})
+        job_queue.complete(db, job.id, "w1", {"ok": True})
+
+        events = await _events(job.id)
+        assert [e["n"] for e in events] == [0, 1, 2]
+        resumed = await _events(job.id, after_id=events[0]["id"])
+        assert [e["n"] for e in resumed] == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_framed_brief_events_parse_like_campaign_tab(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        job_queue.claim(db, "w1")
+        await job_queue.record_event(job.id, "idea", {"region": "US"})
+        job_queue.complete(db, job.id, "w1", None)
+        body = "".join([m async for m in job_queue.stream(job.id, briefs_api._brief_event)])
+
+        # CampaignTab.jsx: split on blank lines, JSON.parse the "data: " line of each message
+        messages = body.split("\n\n")[:-1]
+        parsed = [
+            json.loads(next(line for line in message.split("\n") if line.startswith("data: "))[6:])
+            for message in messages
+        ]
+        assert parsed == [{"type": "idea", "region": "US"}]
+        assert messages[0].startswith("id: ")
+
+    def test_position_counts_higher_priority_and_older_jobs(self, db):
+        first = job_queue.enqueue(db, "execute_brief", {})
+        second = job_queue.enqueue(db, "execute_brief", {})
+        click = job_queue.enqueue(db, "regenerate_creative", {}, priority=INTERACTIVE_PRIORITY)
+
+        assert job_queue.position(db, click.id)["position"] == 1
+        assert job_queue.position(db, second.id) == {"position": 3, "eta_seconds": None, "stage": "job"}
+
+        job_queue.claim(db, "w1")
+        job_queue.complete(db, click.id, "w1", None)
+        job_queue.claim(db, "w1")
+        assert job_queue.position(db, first.id) is None
+        assert job_queue.position(db, second.id)["position"] == 1
+        # ETAs come from jobs of the same type; the finished regenerate doesn't count
+        assert job_queue.position(db, second.id)["eta_seconds"] is None
+
+    @pytest.mark.asyncio
+    async def test_queued_job_streams_its_position_first(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        subscriber = asyncio.create_task(_events(job.id))
+        await asyncio.sleep(0.1)
+
+        await asyncio.to_thread(job_queue._with_session, job_queue.claim, "w1")
+        await job_queue.record_event(job.id, "init", {})
+        await asyncio.to_thread(job_queue._with_session, job_queue.complete, job.id, "w1", None)
+
+        events = await asyncio.wait_for(subscriber, timeout=2)
+        assert events[0] == {"id": None, "type": "queue", "position": 1, "eta_seconds": None, "stage": "job"}
+        assert [e["type"] for e in events[1:]] == ["init"]
+
+    @pytest.mark.asyncio
+    async def test_live_events_reach_a_waiting_subscriber(self, db):
+        job = job_queue.enqueue(db, "execute_brief", {})
+        job_queue.claim(db, "w1")
+        subscriber = asyncio.create_task(_events(job.id))
+        await asyncio.sleep(0.1)
+
+        await job_queue.record_event(job.id, "idea", {"n": 1})
+        await asyncio.to_thread(job_queue._with_session, job_queue.complete, job.id, "w1", None)
+
+        events = await asyncio.wait_for(subscriber, timeout=2)
+        assert [e["type"] for e in events] == ["idea"]
+
+
+class TestWorkerPool:
+    """Workers run registered handlers, retry failures and give work back on shutdown"""
+
+    @pytest.mark.asyncio
+    async def test_handler_runs_and_result_is_stored(self, db, pool):
+        @pool.handler("echo")
+        async def echo(handler_db, payload, emit):
+            await emit("progress", {"step": 1})
+            return {"echo": payload["value"]}
+
+        job = job_queue.enqueue(db, "echo", {"value": 42})
+        await pool.start(1, interactive=0)
+        try:
+            finished = await asyncio.wait_for(job_queue.wait(job.id), timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "succeeded" and finished.result == {"echo": 42}
+        assert [e["type"] for e in await _events(job.id)] == ["progress"]
+        assert pool.stats()["succeeded"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_attempt_is_retried(self, db, pool, monkeypatch):
+        monkeypatch.setattr(job_queue, "retry_base_delay", 0)
+        calls = []
+
+        @pool.handler("flaky")
+        async def flaky(handler_db, payload, emit):
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("provider timeout")
+            return {"ok": True}
+
+        job = job_queue.enqueue(db, "flaky", {})
+        await pool.start(1, interactive=0)
+        try:
+            finished = await asyncio.wait_for(job_queue.wait(job.id), timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "succeeded" and finished.attempts == 2
+        retry = [e for e in await _events(job.id) if e["type"] == "job_retry"]
+        assert retry[0]["error"] == "provider timeout"
+
+    @pytest.mark.asyncio
+    async def test_provider_failure_is_not_retried(self, db, pool, monkeypatch):
+        monkeypatch.setattr(job_queue, "retry_base_delay", 0)
+
+        @pool.handler("rejected")
+        async def rejected(handler_db, payload, emit):
+            raise HTTPException(status_code=429, detail="Firefly generation failed: quota exceeded")
+
+        job = job_queue.enqueue(db, "rejected", {})
+        await pool.start(1, interactive=0)
+        try:
+            finished = await asyncio.wait_for(job_queue.wait(job.id), timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "failed" and finished.attempts == 1
+        # Kept so a caller waiting on the job answers with the provider's status
+        assert finished.error_status == 429
+
+    @pytest.mark.asyncio
+    async def test_retry_resumes_from_earlier_events(self, db, pool, monkeypatch):
+        monkeypatch.setattr(job_queue, "retry_base_delay", 0)
+        generated = []
+
+        @pool.handler("batch")
+        async def batch(handler_db, payload, emit):
+            done = {event["item"] for event in earlier_events("item")}
+            for item in range(3):
+                if item in done:
+                    continue
+                if item == 2 and not done:
+                    raise RuntimeError("database connection lost")
+                generated.append(item)
+                await emit("item", {"item": item})
+            return {"items": 3}
+
+        job = job_queue.enqueue(db, "batch", {})
+        await pool.start(1, interactive=0)
+        try:
+            finished = await asyncio.wait_for(job_queue.wait(job.id), timeout=5)
+        finally:
+            await pool.stop()
+
+        assert finished.status == "succeeded" and finished.attempts == 2
+        assert generated == [0, 1, 2]
+        assert [e["item"] for e in await _events(job.id) if e["type"] == "item"] == [0, 1, 2]
+        # Outside a worker there is nothing to resume from
+        assert earlier_events("item") == []
+
+    @pytest.mark.asyncio
+    async def test_cancelled_job_stops_at_next_heartbeat(self, db, pool):
+        started = asyncio.Event()
+        stopped = asyncio.Event()
+
+        @pool.handler("slow")
+        async def slow(handler_db, payload, emit):
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            finally:
+                stopped.set()
+
+        job = job_queue.enqueue(db, "slow", {})
+        await pool.start(1, interactive=0)
+        try:
+            await asyncio.wait_for(started.wait(), timeout=5)
+            job_queue.cancel(db, job.id)
+            await asyncio.wait_for(stopped.wait(), timeout=2)
+        finally:
+            await pool.stop()
+
+        db.refresh(job)
+        assert job.status == "cancelled"
+
+    @pytest.mark.asyncio
+    async def test_stop_releases_running_job(self, db, pool):
+        started = asyncio.Event()
+
+        @pool.handler("slow")
+        async def slow(handler_db, payload, emit):
+            started.set()
+            await asyncio.sleep(30)
+
+        job = job_queue.enqueue(db, "slow", {})
+        await pool.start(1, interactive=0)
+        await asyncio.wait_for(started.wait(), timeout=5)
+        await pool.stop()
+
+        db.refresh(job)
+        assert job.status == "queued" and job.attempts == 0 and job.lease_owner is None
+
+
+class TestQueuedGenerateCreative:
+    """generate-creative enqueues a job and streams its events to the client"""
+
+    @pytest.mark.asyncio
+    async def test_stream_starts_with_job_id(self, db, pool, monkeypatch):
+        idea = SimpleNamespace(id=uuid.uuid4(), brief_id=uuid.uuid4(), content="Idea", region="US",
+                               demographic="18-25", language_code="en-US")
+        brief = SimpleNamespace(campaign_message="Run Faster", brand="Acme")
+
+        async def fake_generate_creative(handler_db, content, message, region, demographic, aspect_ratio, *args, **kwargs):
+            return f"uploads/creatives/{aspect_ratio}.jpg", "image/jpeg", 100, None
+
+        def fake_create_creative(handler_db, idea_id, file_path, mime_type, file_size, aspect_ratio, firefly_job_id,
+                                 perceptual_hash=None):
+            now = datetime.utcnow()
+            return SimpleNamespace(id=uuid.uuid4(), idea_id=idea_id, file_path=file_path, mime_type=mime_type,
+                                   file_size=file_size, aspect_ratio=aspect_ratio, firefly_job_id=firefly_job_id,
+                                   created_at=now, updated_at=now)
+
+        monkeypatch.setattr(ideas_api.idea_service, "get_idea_or_404", lambda handler_db, idea_id: idea)
+        monkeypatch.setattr(ideas_api.brief_service, "get_brief_or_404", lambda handler_db, brief_id: brief)
+        monkeypatch.setattr(ideas_api.brand_kit_cache, "get_current", lambda handler_db: None)
+        monkeypatch.setattr(ideas_api.firefly_service, "generate_creative", fake_generate_creative)
+        monkeypatch.setattr(ideas_api.creative_service, "create_creative", fake_create_creative)
+        monkeypatch.setattr(ideas_api.job_queue, "enabled", True)
+        pool.handler("generate_creative")(ideas_api.run_generate_creative)
+
+        await pool.start(1, interactive=0)
+        try:
+            response = await ideas_api.generate_creative(idea.id, reframe=False, db=db)
+            chunks = [chunk async for chunk in response.body_iterator]
+        finally:
+            await pool.stop()
+
+        fields = [dict(line.split(": ", 1) for line in c.strip().split("\n")) for c in chunks]
+        events = [(f["event"], json.loads(f["data"])) for f in fields]
+        assert events[0] == ("job", {"job_id": response.headers["X-Job-Id"]})
+        assert [e for e, _ in events].count("creative") == 3
+        assert events[-1] == ("complete", {"total": 3})
+        job = job_queue.get_job_or_404(db, uuid.UUID(response.headers["X-Job-Id"]))
+        assert job.status == "succeeded" and len(job.result["creative_ids"]) == 3
@@ -0,0 +1,82 @@
+"""
+Unit tests for perceptual hashing and near-duplicate lookup.
+"""
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+from src.services.perceptual_hash import HammingIndex, PerceptualHashService, dhash, hamming
+
+
+def _creative(path, shift=0, color="navy"):
+    img = Image.new("RGB", (1080, 1080), color)
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((200 + shift, 300, 700 + shift, 800), fill="orange")
+    draw.rectangle((600, 100, 1000, 400), fill="white")
+    img.save(path, "JPEG", quality=90)
+    return str(path)
+
+
+class TestDHash:
+    """Re-encodes and small shifts stay close; different images do not"""
+
+    def test_near_identical_images_are_close(self, tmp_path):
+        original = dhash(_creative(tmp_path / "a.jpg"))
+        retry = dhash(_creative(tmp_path / "b.jpg", shift=6))
+        other = dhash(_creative(tmp_path / "c.jpg", shift=300, color="darkgreen"))
+        assert hamming(original, retry) <= 6
+        assert hamming(original, other) > 6
+
+    def test_fits_signed_bigint(self, tmp_path):
+        value = dhash(_creative(tmp_path / "a.jpg"))
+        assert -(1 << 63) <= value < (1 << 63)
+
+
+class TestHammingIndex:
+    """Radius queries return exactly what a linear scan would"""
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(7)
+        index = HammingIndex()
+        hashes = [rng.getrandbits(64) for _ in range(5000)]
+        for position, value in enumerate(hashes):
+            index.add(value, position)
+        # Plant near neighbours of one hash at each distance up to 8
+        base = hashes[0]
+        for distance in range(1, 9):
+            near = base
+            for bit in rng.sample(range(64), distance):
+                near ^= 1 << bit
+            index.add(near, f"near{distance}")
+            hashes.append(near)
+
+        for max_distance in (0, 3, 6, 8):
+            expected = sorted(hamming(value, base) for value in hashes if hamming(value, base) <= max_distance)
+            assert [distance for distance, _ in index.search(base, max_distance)] == expected
+
+    def test_accepts_signed_hashes(self):
+        index = HammingIndex()
+        index.add(-1, "all ones")
+        assert index.search((1 << 64) - 2, 1) == [(1, "all ones")]
+
+
+class TestFindDuplicates:
+    """Later near-duplicates point at the earliest creative of their group"""
+
+    @pytest.fixture
+    def service(self):
+        service = PerceptualHashService()
+        service.max_distance = 4
+        return service
+
+    def test_flags_later_copies_within_a_group(self, service):
+        entries = [
+            ("idea:1:1", "first", 0b1111),
+            ("idea:1:1", "retry", 0b1110),
+            ("idea:1:1", "fallback", 0b0111),
+            ("idea:16:9", "other ratio", 0b1111),
+            ("idea:1:1", "different", (1 << 40) - 1),
+            ("idea:1:1", "unhashed", None),
+        ]
+        assert service.find_duplicates(entries) == {"retry": "first", "fallback": "first"}
@@ -0,0 +1,216 @@
+"""
+Unit tests for the provider call ledger: batched writes, outcome classification,
+per-phase timings from real call sites and daily percentiles.
+"""
+import asyncio
+import base64
+import io
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.models.provider_call import ProviderCall
+from src.services.circuit_breaker import ProviderUnavailableError
+from src.services.firefly_service import FireflyService
+from src.services.generation_scheduler import generation_scheduler
+from src.services.http_client import http_client
+from src.services.image_providers import provider_registry
+from src.services.llm_service import LLMService
+from src.services.provider_ledger import CallRecord, percentile, provider_ledger
+from src.services.provider_limiter import ProviderLimiter
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ledger.db'}", connect_args={"check_same_thread": False})
+    ProviderCall.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(provider_ledger, "enabled", True)
+    monkeypatch.setattr(provider_ledger, "session_factory", factory)
+    monkeypatch.setattr(provider_ledger, "flush_interval", 0.05)
+    monkeypatch.setattr(provider_ledger, "_pending", [])
+    monkeypatch.setattr(provider_ledger, "_task", None)
+    for counter in ("recorded", "written", "dropped", "failed", "batches"):
+        monkeypatch.setattr(provider_ledger, counter, 0)
+    return factory
+
+
+def _rows(session_factory):
+    db = session_factory()
+    try:
+        return db.query(ProviderCall).order_by(ProviderCall.id).all()
+    finally:
+        db.close()
+
+
+class TestWriter:
+    """Records are buffered and written in batches off the event loop"""
+
+    @pytest.mark.asyncio
+    async def test_batches_and_interval_flush(self, session_factory, monkeypatch):
+        monkeypatch.setattr(provider_ledger, "batch_size", 100)
+        for _ in range(250):
+            provider_ledger.record(CallRecord(kind="image", provider="Freepik"))
+        await provider_ledger.stop()
+        assert len(_rows(session_factory)) == 250
+        assert provider_ledger.stats()["batches"] == 3
+
+        # A lone record is written after flush_interval without stop()
+        provider_ledger.record(CallRecord(kind="llm", provider="OpenAI"))
+        await asyncio.sleep(0.2)
+        assert provider_ledger.written == 251 and provider_ledger.stats()["pending"] == 0
+        await provider_ledger.stop()
+
+    def test_full_buffer_drops_instead_of_growing(self, session_factory, monkeypatch):
+        monkeypatch.setattr(provider_ledger, "max_pending", 2)
+        for _ in range(3):
+            provider_ledger.record(CallRecord(kind="llm", provider="OpenAI"))
+        assert provider_ledger.stats()["pending"] == 2
+        assert provider_ledger.dropped == 1
+
+    @pytest.mark.asyncio
+    async def test_database_errors_are_counted_not_raised(self, session_factory, monkeypatch):
+        def broken():
+            raise RuntimeError("database is down")
+
+        monkeypatch.setattr(provider_ledger, "session_factory", broken)
+        provider_ledger.record(CallRecord(kind="llm", provider="OpenAI"))
+        await provider_ledger.stop()
+        assert (provider_ledger.written, provider_ledger.failed) == (0, 1)
+
+
+class TestOutcomes:
+    """Exceptions leaving a call are classified; scheduling context is captured"""
+
+    @pytest.mark.parametrize("error, status", [
+        (HTTPException(status_code=429, detail="quota"), "rate_limited"),
+        (ProviderUnavailableError("Freepik", 30), "unavailable"),
+        (RuntimeError("boom"), "error"),
+    ])
+    def test_status_from_exception(self, session_factory, error, status):
+        with pytest.raises(type(error)):
+            with provider_ledger.call("image", "Freepik"):
+                raise error
+        assert provider_ledger._pending[-1]["status"] == status
+
+    def test_wrapped_timeout(self, session_factory):
+        with pytest.raises(HTTPException):
+            with provider_ledger.call("llm", "OpenAI"):
+                try:
+                    raise httpx.ReadTimeout("slow")
+                except httpx.HTTPError as e:
+                    raise HTTPException(status_code=500, detail="LLM API error") from e
+        assert provider_ledger._pending[-1]["status"] == "timeout"
+
+    def test_flow_and_lane(self, session_factory):
+        with generation_scheduler.context(flow="brief:1", lane="interactive"):
+            provider_ledger.event("image", "Freepik", status="cache_hit")
+        row = provider_ledger._pending[-1]
+        assert (row["flow"], row["lane"], row["status"]) == ("brief:1", "interactive", "cache_hit")
+        assert row["total_ms"] is not None
+
+
+def _png() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), "teal").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class TestCallSites:
+    """Provider calls record their phases, retries and usage"""
+
+    @pytest.mark.asyncio
+    async def test_image_call_with_retry_and_overlay(self, session_factory, monkeypatch, tmp_path):
+        statuses = [429, 200]
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if statuses.pop(0) == 429:
+                return httpx.Response(429, headers={"Retry-After": "0.05"}, json={"error": "slow down"})
+            return httpx.Response(200, content=body())
+
+        async def body():
+            # Streamed like a real response, so downloaded bytes are counted
+            yield json.dumps({"data": [{"b64_json": base64.b64encode(_png()).decode()}]}).encode()
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(provider_registry.get("DALL-E"), "limiter", ProviderLimiter(4, 0))
+        service = FireflyService()
+        service.output_dir = tmp_path
+        await service._call_firefly_api(
+            "prompt", "1:1", "test-key", "https://images.test/v1/generate", "DALL-E", use_cache=False
+        )
+        await provider_ledger.stop()
+
+        [row] = _rows(session_factory)
+        assert (row.kind, row.provider, row.model, row.status) == ("image", "DALL-E", "dall-e-3", "success")
+        assert (row.attempts, row.http_status, row.images) == (2, 200, 1)
+        # The 429's Retry-After pause is spent waiting for the limiter
+        assert row.queue_ms >= 40
+        assert row.ttfb_ms is not None and row.download_ms is not None and row.overlay_ms is not None
+        assert row.total_ms >= row.queue_ms + row.ttfb_ms
+        assert row.request_bytes > 0 and row.response_bytes > row.image_bytes > 0
+
+    @pytest.mark.asyncio
+    async def test_llm_call_records_tokens(self, session_factory, monkeypatch):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={
+                "choices": [{"message": {"content": "Run further"}}],
+                "usage": {"prompt_tokens": 120, "completion_tokens": 30}
+            })
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        content = await LLMService()._call_llm_api(
+            "prompt", "key", "https://api.openai.com/v1/chat/completions", "gpt-4"
+        )
+        await provider_ledger.stop()
+
+        assert content == "Run further"
+        [row] = _rows(session_factory)
+        assert (row.kind, row.provider, row.model, row.status) == ("llm", "OpenAI", "gpt-4", "success")
+        assert (row.prompt_tokens, row.completion_tokens, row.attempts) == (120, 30, 1)
+        assert row.ttfb_ms is not None and row.overlay_ms is None
+
+
+class TestDailyStats:
+    """Percentiles per provider per day, excluding calls that never reached it"""
+
+    def test_percentiles_and_status_counts(self, session_factory):
+        today = datetime.utcnow().replace(hour=12)
+        rows = [
+            dict(created_at=today, kind="image", provider="Freepik", status="success", total_ms=float(ms), images=1)
+            for ms in range(1, 101)
+        ]
+        rows += [
+            dict(created_at=today, kind="image", provider="Freepik", status="mock", total_ms=0.1, images=1),
+            dict(created_at=today, kind="image", provider="Freepik", status="timeout", total_ms=30000.0),
+            dict(created_at=today - timedelta(days=1), kind="llm", provider="OpenAI", status="success",
+                 total_ms=800.0, prompt_tokens=100, completion_tokens=20),
+            dict(created_at=today - timedelta(days=30), kind="llm", provider="OpenAI", status="success",
+                 total_ms=1.0),
+        ]
+        db = session_factory()
+        db.bulk_insert_mappings(ProviderCall, [{"attempts": 1, **row} for row in rows])
+        db.commit()
+
+        stats = provider_ledger.daily_stats(db, days=7)
+        db.close()
+        assert [(entry["kind"], entry["provider"]) for entry in stats] == [("llm", "OpenAI"), ("image", "Freepik")]
+        openai, freepik = stats
+        assert openai["calls"] == 1 and openai["prompt_tokens"] == 100 and openai["p99_ms"] == 800.0
+        assert freepik["calls"] == 102 and freepik["images"] == 101
+        assert freepik["statuses"] == {"success": 100, "mock": 1, "timeout": 1}
+        samples = sorted([float(ms) for ms in range(1, 101)] + [30000.0])
+        assert freepik["p50_ms"] == 51.0
+        assert freepik["p95_ms"] == round(percentile(samples, 0.95), 1)
+        assert freepik["p99_ms"] == round(percentile(samples, 0.99), 1)
+
+    def test_percentile_matches_percentile_cont(self):
+        assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+        assert percentile([10.0], 0.99) == 10.0
+        assert percentile([], 0.5) is None
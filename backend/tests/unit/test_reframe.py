@@ -0,0 +1,154 @@
+"""
+Unit and golden-image tests for master + reframe generation.
+
+Golden images live in tests/unit/golden/. After an intentional change to the
+reframing geometry, regenerate them with:
+    UPDATE_GOLDEN=1 python -m pytest tests/unit/test_reframe.py
+"""
+import io
+import os
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image, ImageChops, ImageDraw, ImageStat
+
+from src.services import key_service as key_service_module
+from src.services.firefly_service import FireflyService
+from src.services.http_client import http_client
+from src.services.image_download import image_downloader
+from src.services.image_providers import provider_registry
+from src.services.provider_limiter import ProviderLimiter
+from src.services.reframe import crop_box, crop_coverage, fit_box, focus_point, reframe
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+
+
+def _master(width: int = 2048, height: int = 2048, subject=(0.7, 0.4)) -> Image.Image:
+    """Flat backdrop with a detailed subject (checkerboard disc) at `subject`"""
+    img = Image.new("RGB", (width, height), (40, 90, 140))
+    draw = ImageDraw.Draw(img)
+    cx, cy, r = subject[0] * width, subject[1] * height, min(width, height) * 0.12
+    step = max(4, int(r // 6))
+    for y in range(int(cy - r), int(cy + r), step):
+        for x in range(int(cx - r), int(cx + r), step):
+            if (x - cx) ** 2 + (y - cy) ** 2 <= r * r and ((x // step) + (y // step)) % 2 == 0:
+                draw.rectangle([x, y, x + step - 1, y + step - 1], fill=(250, 220, 60))
+    return img
+
+
+class TestCropGeometry:
+    """Golden crop boxes from the default 2048px 1:1 master to each _get_dimensions target"""
+
+    GOLDEN_BOXES = {
+        # target: (centred box, box for focus (0.7, 0.4))
+        "16:9": ((0, 448, 2048, 1600), (0, 243, 2048, 1395)),
+        "9:16": ((448, 0, 1600, 2048), (858, 0, 2010, 2048)),
+        "1:1": ((0, 0, 2048, 2048), (0, 0, 2048, 2048)),
+    }
+
+    @pytest.mark.parametrize("aspect_ratio", ["16:9", "9:16", "1:1"])
+    def test_boxes_match_golden(self, aspect_ratio):
+        service = FireflyService()
+        master = service._get_master_dimensions("1:1")
+        target = service._get_dimensions(aspect_ratio)
+        centred, focused = self.GOLDEN_BOXES[aspect_ratio]
+        args = (master["width"], master["height"], target["width"], target["height"])
+        assert crop_box(*args) == centred
+        assert crop_box(*args, focus=(0.7, 0.4)) == focused
+
+    @pytest.mark.parametrize("aspect_ratio", ["16:9", "9:16", "1:1"])
+    def test_box_keeps_target_ratio(self, aspect_ratio):
+        target = FireflyService()._get_dimensions(aspect_ratio)
+        for focus in [(0, 0), (1, 1), (0.3, 0.9)]:
+            left, top, right, bottom = crop_box(2048, 2048, target["width"], target["height"], focus)
+            assert 0 <= left < right <= 2048 and 0 <= top < bottom <= 2048
+            assert abs((right - left) / (bottom - top) - target["width"] / target["height"]) < 0.002
+
+    def test_master_dimensions(self):
+        service = FireflyService()
+        assert service._get_master_dimensions("1:1") == {"width": 2048, "height": 2048}
+        assert service._get_master_dimensions("16:9") == {"width": 2048, "height": 1152}
+
+    def test_coverage_and_fit(self):
+        assert crop_coverage(2048, 2048, 1920, 1080) == pytest.approx(0.5625)
+        assert crop_coverage(1920, 1080, 1080, 1920) == pytest.approx(0.3164, abs=1e-4)
+        assert fit_box(1920, 1080, 1080, 1920) == (0, 656, 1080, 1264)
+
+
+class TestFocus:
+    def test_flat_image_stays_centred(self):
+        assert focus_point(Image.new("RGB", (500, 500), "white")) == (0.5, 0.5)
+
+    def test_focus_moves_toward_subject(self):
+        fx, fy = focus_point(_master(512, 512, subject=(0.7, 0.4)))
+        assert 0.6 < fx < 0.75
+        assert 0.35 < fy < 0.5
+
+
+class TestGoldenImages:
+    """Reframed outputs compared to checked-in 96px references"""
+
+    CASES = {
+        "crop_square_to_16x9": ((2048, 2048), (1920, 1080)),
+        "crop_square_to_9x16": ((2048, 2048), (1080, 1920)),
+        "pad_16x9_to_9x16": ((2048, 1152), (1080, 1920)),
+    }
+
+    @pytest.mark.parametrize("case", sorted(CASES))
+    def test_matches_golden(self, case):
+        (src_w, src_h), (target_w, target_h) = self.CASES[case]
+        result = reframe(_master(src_w, src_h), target_w, target_h)
+        assert result.size == (target_w, target_h)
+
+        thumb = result.copy()
+        thumb.thumbnail((96, 96))
+        golden_path = GOLDEN_DIR / f"reframe_{case}.png"
+        if os.getenv("UPDATE_GOLDEN"):
+            GOLDEN_DIR.mkdir(exist_ok=True)
+            thumb.save(golden_path)
+        golden = Image.open(golden_path).convert("RGB")
+        assert golden.size == thumb.size
+        # Allow resampling differences between Pillow versions, not geometry changes
+        diff = ImageStat.Stat(ImageChops.difference(thumb, golden)).mean
+        assert max(diff) < 3.0
+
+
+class TestReframedGeneration:
+    """One provider call produces every aspect ratio"""
+
+    @pytest.mark.asyncio
+    async def test_one_master_three_creatives(self, monkeypatch, tmp_path):
+        posts = []
+        buffer = io.BytesIO()
+        _master(1024, 1024).save(buffer, "PNG")
+        master_png = buffer.getvalue()
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.method == "POST":
+                posts.append(request)
+                return httpx.Response(200, json={"id": "job-1", "outputs": [{"image": {"url": "https://storage.test/m.png"}}]})
+            return httpx.Response(200, content=master_png, headers={"content-type": "image/png"})
+
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(key_service_module.key_service, "get_value", lambda db, key: {
+            "use_image_model": "Stable Diffusion", "Stable Diffusion": "sd-key"
+        }.get(key))
+        monkeypatch.setattr(image_downloader, "download_dir", tmp_path / "downloads")
+        monkeypatch.setattr(provider_registry.get("Stable Diffusion"), "limiter", ProviderLimiter(1000, 0))
+        service = FireflyService()
+        service.output_dir = tmp_path / "creatives"
+        service.output_dir.mkdir()
+        service.master_size = 1024
+
+        aspect_ratios = ["16:9", "9:16", "1:1"]
+        results = await service.generate_reframed_creatives(
+            None, "Idea", "", "US", "18-25", aspect_ratios
+        )
+
+        assert len(posts) == 1
+        assert b'"width": 1024' in posts[0].content or b'"width":1024' in posts[0].content
+        sizes = [Image.open(file_path).size for file_path, _, _, _ in results]
+        assert sizes == [(1920, 1080), (1080, 1920), (1080, 1080)]
+        assert all(job_id == "job-1" for _, _, _, job_id in results)
+        assert list((tmp_path / "downloads").iterdir()) == []
@@ -0,0 +1,102 @@
+"""
+Unit tests for creative renditions and Accept negotiation.
+"""
+import io
+
+import pytest
+from PIL import Image
+
+from src.services.image_processor import compose_overlays, write_renditions
+from src.services.rendition_service import RenditionService
+
+
+@pytest.fixture
+def master(tmp_path):
+    path = tmp_path / "creative_1_1.jpg"
+    Image.new("RGB", (1080, 1080), "navy").save(path, "JPEG")
+    return str(path)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("CREATIVE_RENDITION_WIDTHS", "320,640,1280")
+    monkeypatch.setenv("CREATIVE_RENDITION_FORMATS", "webp,jpeg")
+    return RenditionService()
+
+
+def _rendition(fmt, width):
+    return {"format": fmt, "width": width, "file_path": f"{width}.{fmt}", "mime_type": f"image/{fmt}"}
+
+
+MASTER = {"file_path": "master.jpg", "mime_type": "image/jpeg", "width": None}
+RENDITIONS = [_rendition(fmt, w) for w in (320, 640) for fmt in ("webp", "jpeg")] + [_rendition("webp", 1080)]
+
+
+class TestWriteRenditions:
+    """The pool worker function: one downscaled file per width and format"""
+
+    def test_writes_each_width_and_format(self, master, tmp_path):
+        out_dir = tmp_path / "renditions"
+        written = write_renditions(master, str(out_dir), (320, 640, 1280), ("webp", "jpeg"))
+
+        # 1280 collapses to the 1080 source, where the JPEG master is reused
+        names = sorted(p.name for p in out_dir.iterdir())
+        assert names == ["1080x1080.webp", "320x320.jpg", "320x320.webp", "640x640.jpg", "640x640.webp"]
+        assert written == 5
+        with Image.open(out_dir / "640x640.webp") as img:
+            assert img.format == "WEBP" and img.size == (640, 640)
+        with Image.open(out_dir / "320x320.jpg") as img:
+            assert img.info.get("progressive")
+
+    def test_master_is_progressive_jpeg(self):
+        source = io.BytesIO()
+        Image.new("RGB", (640, 640), "navy").save(source, "JPEG")
+        result = compose_overlays(source.getvalue(), "Run Faster", None, None, 640, 640)
+        with Image.open(io.BytesIO(result)) as img:
+            assert img.info.get("progressive")
+
+
+class TestCollect:
+    """Renditions on disk are recorded smallest first"""
+
+    @pytest.mark.asyncio
+    async def test_generate_then_collect_and_delete(self, master, service, monkeypatch):
+        from src.services.image_processor import image_processor
+        monkeypatch.setattr(image_processor, "max_workers", 0)
+
+        await service.generate(master)
+        renditions = service.collect(master)
+        assert [(r["width"], r["format"]) for r in renditions] == [
+            (320, "webp"), (320, "jpeg"), (640, "webp"), (640, "jpeg"), (1080, "webp")
+        ]
+        assert all(r["file_size"] > 0 for r in renditions)
+        assert renditions[0]["mime_type"] == "image/webp"
+
+        service.delete(master)
+        assert service.collect(master) == []
+
+
+class TestChoose:
+    """Format comes from the Accept header, size from the requested width"""
+
+    def test_webp_when_accepted(self, service):
+        chosen = service.choose(RENDITIONS, MASTER, "image/avif,image/webp,image/*,*/*;q=0.8", 500)
+        assert (chosen["format"], chosen["width"]) == ("webp", 640)
+
+    def test_wildcard_gets_jpeg(self, service):
+        chosen = service.choose(RENDITIONS, MASTER, "image/*", 300)
+        assert (chosen["format"], chosen["width"]) == ("jpeg", 320)
+
+    def test_no_accept_header_gets_jpeg(self, service):
+        assert service.choose(RENDITIONS, MASTER, None, 640)["format"] == "jpeg"
+
+    def test_q_value_can_refuse_webp(self, service):
+        chosen = service.choose(RENDITIONS, MASTER, "image/webp;q=0,image/*", 640)
+        assert chosen["format"] == "jpeg"
+
+    def test_wider_than_any_jpeg_rendition_serves_master(self, service):
+        assert service.choose(RENDITIONS, MASTER, "image/*", 1000) is MASTER
+        assert service.choose(RENDITIONS, MASTER, "image/*", None) is MASTER
+
+    def test_master_without_width(self, service):
+        assert service.choose(RENDITIONS, MASTER, "image/webp,image/*", None) is MASTER
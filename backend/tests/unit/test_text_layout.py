@@ -0,0 +1,99 @@
+"""
+Unit tests for pixel-width caption layout.
+"""
+import pytest
+from PIL import ImageFont
+
+from src.services import text_layout as text_layout_module
+from src.services.text_layout import NO_LINE_END, NO_LINE_START, TextLayoutEngine
+
+DEJAVU = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+
+
+@pytest.fixture
+def engine():
+    return TextLayoutEngine()
+
+
+@pytest.fixture
+def font():
+    return ImageFont.truetype(DEJAVU, 40)
+
+
+class TestWrap:
+    """Lines break by measured width at script-appropriate points"""
+
+    def test_lines_fit_pixel_width(self, engine, font):
+        lines, split = engine.wrap("Run faster, go further and feel lighter in every single stride", font, 400)
+        assert len(lines) > 1 and not split
+        assert all(font.getlength(line) <= 400 for line in lines)
+        assert " ".join(lines) == "Run faster, go further and feel lighter in every single stride"
+
+    def test_overlong_word_is_split_between_characters(self, engine, font):
+        word = "Laufschuhgeschwindigkeitsoptimierung"
+        lines, split = engine.wrap(f"Die {word}", font, 300)
+        assert split
+        assert lines[0] == "Die"
+        assert "".join(lines[1:]) == word
+        assert all(font.getlength(line) <= 300 for line in lines)
+
+    def test_japanese_wraps_without_spaces(self, engine, font):
+        text = "今すぐ走り出そう。新しいシューズで、もっと速く、もっと遠くへ！"
+        lines, split = engine.wrap(text, font, 300)
+        assert len(lines) > 1 and not split
+        assert "".join(lines) == text
+        assert not any(line[0] in NO_LINE_START for line in lines)
+
+    def test_kinsoku_keeps_brackets_and_small_kana_attached(self, engine):
+        segments = [segment for segment, _ in engine.segments("「速く」走れっ。")]
+        assert segments == ["「速", "く」", "走", "れっ。"]
+        assert not any(segment[-1] in NO_LINE_END for segment in segments)
+
+    def test_mixed_latin_and_cjk(self, engine):
+        assert engine.segments("ACME 靴で走ろう") == [
+            ("ACME", False), ("靴", True), ("で", False), ("走", False), ("ろ", False), ("う", False)
+        ]
+
+
+class TestFit:
+    """Binary search picks the largest size that fits the box"""
+
+    @pytest.fixture
+    def sizes_loaded(self, monkeypatch):
+        loaded = []
+
+        def get_font(family, size):
+            loaded.append(size)
+            return ImageFont.truetype(DEJAVU, size)
+
+        monkeypatch.setattr(text_layout_module.font_registry, "get_font", get_font)
+        return loaded
+
+    def test_largest_fitting_size(self, engine, sizes_loaded):
+        text = "Run faster, go further and feel lighter in every stride"
+        layout = engine.fit(text, "sans", max_width=600, max_height=200, max_size=120, min_size=10)
+        assert layout.width <= 600 and layout.height <= 200
+        bigger = engine.layout(text, ImageFont.truetype(DEJAVU, layout.size + 1), layout.size + 1, 600)
+        assert bigger.height > 200 or bigger.width > 600
+        # log2(110) probes plus the minimum, not one per size
+        assert len(sizes_loaded) <= 9
+
+    def test_prefers_whole_words(self, engine, sizes_loaded):
+        layout = engine.fit("Laufschuhgeschwindigkeit", "sans", max_width=300, max_height=400, max_size=80, min_size=8)
+        assert not layout.split_words
+        assert layout.lines == ("Laufschuhgeschwindigkeit",)
+
+    def test_max_lines(self, engine, sizes_loaded):
+        layout = engine.fit("ACME RUNNING CO", "sans", max_width=200, max_height=400, max_size=80, min_size=8,
+                            max_lines=1)
+        assert len(layout.lines) == 1 and layout.width <= 200
+
+
+class TestAdvanceCache:
+    """Glyph advances are measured once per font"""
+
+    def test_repeat_measurements_hit_the_cache(self, engine, font):
+        engine.text_width(font, "abcabc")
+        assert (engine.misses, engine.hits) == (3, 3)
+        assert engine.text_width(font, "cab") == pytest.approx(sum(font.getlength(c) for c in "abc"))
+        assert engine.stats() == {"fonts": 1, "advance_hits": 6, "advance_misses": 3}
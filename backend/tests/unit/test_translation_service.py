@@ -0,0 +1,117 @@
+"""
+Unit tests for the cached, coalescing campaign-message translation service.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from src.models.translation import Translation
+from src.services.translation_service import TranslationBackend, TranslationService
+
+
+@compiles(UUID, "sqlite")
+def _compile_uuid_for_sqlite(type_, compiler, **kw):
+    """Let the Postgres UUID primary key run on an in-memory SQLite engine"""
+    return "CHAR(36)"
+
+
+class StandInBackend(TranslationBackend):
+    """Local translation stand-in that records every backend call"""
+
+    name = "stand-in"
+
+    def __init__(self, latency: float = 0.02, fail: bool = False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = []
+
+    async def translate(self, message, target_language):
+        self.calls.append((message, target_language))
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError("backend down")
+        return f"[{target_language}] {message}"
+
+
+@pytest.fixture
+def backend():
+    return StandInBackend()
+
+
+@pytest.fixture
+def service(backend):
+    service = TranslationService()
+    service.session_factory = None
+    service.set_backend(backend)
+    return service
+
+
+@pytest.fixture
+def session_factory():
+    # One shared in-memory database, reachable from the to_thread worker threads
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Translation.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+class TestTranslationService:
+    """In-process LRU, persistent cache and request coalescing"""
+
+    @pytest.mark.asyncio
+    async def test_english_is_not_translated(self, service, backend):
+        assert await service.translate("Run Faster", "en-GB") == "Run Faster"
+        assert backend.calls == []
+
+    @pytest.mark.asyncio
+    async def test_language_code_maps_to_target(self, service, backend):
+        assert await service.translate("Run Faster", "zh-CN") == "[zh-CN] Run Faster"
+        assert await service.translate("Run Faster", "ja-JP") == "[ja] Run Faster"
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_lookups_are_coalesced(self, service, backend):
+        results = await asyncio.gather(*(service.translate("Run Faster", "de-DE") for _ in range(30)))
+        assert set(results) == {"[de] Run Faster"}
+        assert backend.calls == [("Run Faster", "de")]
+
+    @pytest.mark.asyncio
+    async def test_lru_evicts_least_recently_used(self, service, backend):
+        service.max_cache_entries = 2
+        await service.translate("a", "de-DE")
+        await service.translate("b", "de-DE")
+        await service.translate("a", "de-DE")  # refresh "a"
+        await service.translate("c", "de-DE")  # evicts "b"
+        await service.translate("a", "de-DE")
+        await service.translate("b", "de-DE")
+        assert [message for message, _ in backend.calls] == ["a", "b", "c", "b"]
+
+    @pytest.mark.asyncio
+    async def test_failure_falls_back_to_original_and_is_not_cached(self, service, backend):
+        backend.fail = True
+        assert await service.translate("Run Faster", "fr-FR") == "Run Faster"
+        backend.fail = False
+        assert await service.translate("Run Faster", "fr-FR") == "[fr] Run Faster"
+        assert len(backend.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_persistent_cache_survives_process_restart(self, backend, session_factory):
+        first = TranslationService()
+        first.session_factory = session_factory
+        first.set_backend(backend)
+        assert await first.translate("Run Faster", "es-MX") == "[es] Run Faster"
+
+        # A fresh service (empty LRU) is served from the DB table
+        second = TranslationService()
+        second.session_factory = session_factory
+        second.set_backend(StandInBackend())
+        assert await second.translate("Run Faster", "es-MX") == "[es] Run Faster"
+        assert second.backend.calls == []
+
+        db = session_factory()
+        rows = db.query(Translation).all()
+        db.close()
+        assert [(r.source_text, r.target_language, r.backend) for r in rows] == [("Run Faster", "es", "stand-in")]
@@ -42,7 +42,7 @@ export default function AssetThumbnail({ asset, onDelete, onRegenerate }) {
     <div className="relative group w-32">
       <div className="w-32 h-32 border rounded overflow-hidden">
         <img
-          src={`http://localhost:8002/${asset.file_path}?t=${Date.now()}`}
+          src={`http://localhost:8002/${asset.thumbnails?.['256'] ?? asset.file_path}?t=${Date.now()}`}
           alt={asset.filename}
           className="w-full h-full object-cover"
           onError={(e) => {
@@ -133,9 +133,11 @@ export default function CampaignTab({ tabId }) {
         buffer = messages.pop() || ''; // Keep incomplete message in buffer
         
         for (const message of messages) {
-          if (message.startsWith('data: ')) {
+          // Job streams also send an "id:" line; parse only the data line
+          const dataLine = message.split('\n').find((line) => line.startsWith('data: '));
+          if (dataLine) {
             try {
-              const data = JSON.parse(message.substring(6));
+              const data = JSON.parse(dataLine.substring(6));
               console.log('SSE message:', data);
               
               if (data.type === 'init') {
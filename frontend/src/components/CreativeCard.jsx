@@ -101,10 +101,22 @@ export default function CreativeCard({ creative, onUpdate }) {
         <span className="inline-block bg-purple-100 text-purple-800 text-xs px-2 py-1 rounded font-semibold">
           {creative.aspect_ratio}
         </span>
+        {creative.duplicate_of && (
+          <span
+            className="inline-block bg-yellow-100 text-yellow-800 text-xs px-2 py-1 rounded font-semibold"
+            title={`Near-duplicate of creative ${creative.duplicate_of}`}
+          >
+            Near-duplicate
+          </span>
+        )}
       </div>
       <div className="bg-gray-200 rounded mb-3 overflow-hidden h-64 flex items-center justify-center">
         <img
-          src={`http://localhost:8002/${creative.file_path}`}
+          src={`http://localhost:8002/creatives/${creative.id}/media?width=640&v=${creative.generation_count}`}
+          srcSet={[320, 640, 1280]
+            .map((w) => `http://localhost:8002/creatives/${creative.id}/media?width=${w}&v=${creative.generation_count} ${w}w`)
+            .join(', ')}
+          sizes="(max-width: 768px) 100vw, 33vw"
           alt={`Creative ${creative.aspect_ratio}`}
           className={`${
             creative.aspect_ratio === '16:9' ? 'w-full h-auto' :